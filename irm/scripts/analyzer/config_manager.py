@@ -1,12 +1,9 @@
 import os
 import json
-import redis
 import argparse
-import falkordb
 import sys
 from pathlib import Path
 from datetime import datetime, timedelta
-from urllib.parse import urlparse
 import unicodedata
 
 # Ensure /app is in sys.path so 'scripts' package can be found
@@ -14,6 +11,7 @@ app_root = str(Path(__file__).resolve().parent.parent.parent)
 if app_root not in sys.path:
     sys.path.append(app_root)
 
+from scripts.common.db import get_graph, get_redis
 from scripts.providers import get_provider, PROVIDER_REGISTRY
 
 def get_display_width(s):
@@ -45,19 +43,10 @@ def format_cell(s, width, align='left'):
         return ' ' * padding + truncated_s
 
 def get_redis_client():
-    redis_url = os.getenv("REDIS_URL", "redis://redis:6379")
-    parsed = urlparse(redis_url)
-    host = parsed.hostname or "localhost"
-    port = parsed.port or 6379
-    return redis.Redis(host=host, port=port, decode_responses=True)
+    return get_redis()
 
 def get_falkordb_graph(graph_name="Graph-001"):
-    redis_url = os.getenv("REDIS_URL", "redis://redis:6379")
-    parsed = urlparse(redis_url)
-    host = parsed.hostname or "localhost"
-    port = parsed.port or 6379
-    db = falkordb.FalkorDB(host=host, port=port)
-    return db.select_graph(graph_name)
+    return get_graph(graph_name)
 
 def list_sources():
     r = get_redis_client()
@@ -136,41 +125,51 @@ def query_source(target_ticker=None):
 
     print("-" * 75)
 
-    for ticker, data_str in sorted(to_test.items()):
+    # 按 provider 分组，一次批量拉取 (fetch_many)
+    sources = {}
+    groups = {}
+    for ticker, data_str in to_test.items():
         try:
             data = json.loads(data_str)
-            symbol = data.get("symbol")
-            provider = data.get("provider")
-            
-            status = "WAIT"
-            details = "Unknown"
-            
-            try:
-                # Use the provider registry instead of hardcoded if/else
-                provider_inst = get_provider(provider)
-                df = provider_inst.fetch(symbol, start_date)
-                value_col = provider_inst.get_value_column(df)
-
-                if not df.empty and value_col in df.columns:
-                    status = "\033[92mPASS\033[0m"
-                    details = f"Value: {df[value_col].iloc[-1]:.2f} ({symbol})"
-                else:
-                    status = "\033[91mFAIL\033[0m"
-                    details = "Empty dataset"
-            except Exception as e:
-                status = "\033[91mFAIL\033[0m"
-                details = str(e).split('\n')[0][:45]
-                
-            cols = [
-                (ticker, 10, 'left'),
-                (provider, 12, 'left'),
-                (status, 10, 'left'),
-                (details, 50, 'left')
-            ]
-            print(" | ".join(format_cell(c[0], c[1], c[2]) for c in cols))
-            
         except Exception as e:
-            print(f"{ticker:<10} | {'-':<10} | \033[91mERROR\033[0m | {e}")
+            sources[ticker] = e
+            continue
+        sources[ticker] = data
+        groups.setdefault(data.get("provider"), []).append(data.get("symbol"))
+
+    frames = {}
+    for provider, symbols in groups.items():
+        try:
+            frames[provider] = get_provider(provider).fetch_many(symbols, start_date)
+        except Exception as e:
+            frames[provider] = e
+
+    for ticker, data in sorted(sources.items()):
+        if isinstance(data, Exception):
+            print(f"{ticker:<10} | {'-':<10} | \033[91mERROR\033[0m | {data}")
+            continue
+
+        symbol = data.get("symbol")
+        provider = data.get("provider")
+        wide = frames.get(provider)
+
+        if isinstance(wide, Exception):
+            status = "\033[91mFAIL\033[0m"
+            details = str(wide).split('\n')[0][:45]
+        elif symbol in wide.columns and wide[symbol].notna().any():
+            status = "\033[92mPASS\033[0m"
+            details = f"Value: {wide[symbol].dropna().iloc[-1]:.2f} ({symbol})"
+        else:
+            status = "\033[91mFAIL\033[0m"
+            details = wide.attrs.get('errors', {}).get(symbol, "Empty dataset")[:45]
+
+        cols = [
+            (ticker, 10, 'left'),
+            (provider, 12, 'left'),
+            (status, 10, 'left'),
+            (details, 50, 'left')
+        ]
+        print(" | ".join(format_cell(c[0], c[1], c[2]) for c in cols))
 
     print("-" * 88 + "\n")
 
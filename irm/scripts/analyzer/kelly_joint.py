@@ -0,0 +1,119 @@
+"""
+Correlation-aware multi-asset Kelly allocation.
+
+The single-asset advisor sizes each position as f_i = p_i - q_i / b_i. Under the
+Gaussian approximation of the Kelly growth rate, g(w) = mu'w - 1/2 w'Sigma w, that
+sizing is exactly recovered with mu_i = b_i p_i - q_i and Sigma_ii = b_i. The joint
+mode keeps that per-asset calibration and only borrows the *dependence* structure
+from data: Sigma = D R D with D = diag(sqrt(b)) and R a shrunk correlation matrix of
+weekly returns. With R = I it reduces to the independent advisor; correlated
+holdings (QQQM / NVDA / AAPL) share one risk budget instead of stacking.
+"""
+import numpy as np
+
+
+def shrunk_correlation(returns):
+    """
+    Ledoit-Wolf shrinkage of the sample correlation towards the identity.
+
+    :param returns: array (T, N) of returns, NaN where an asset has no observation.
+    :return: (R, delta) with R the (N, N) shrunk correlation and delta the intensity.
+             Assets with fewer than 3 observations are treated as uncorrelated.
+    """
+    x = np.asarray(returns, dtype=float)
+    t, n = x.shape
+    if n == 0:
+        return np.zeros((0, 0)), 1.0
+
+    valid = ~np.isnan(x)
+    counts = valid.sum(axis=0)
+    mean = np.where(counts > 0, np.nansum(x, axis=0) / np.maximum(counts, 1), 0.0)
+    centered = np.where(valid, x - mean, 0.0)
+    std = np.sqrt((centered ** 2).sum(axis=0) / np.maximum(counts - 1, 1))
+    usable = (counts >= 3) & (std > 0)
+
+    # Standardize; missing observations contribute zero (pairwise shrink towards 0)
+    z = np.where(usable, centered / np.where(std > 0, std, 1.0), 0.0)
+    if t == 0 or not usable.any():
+        return np.eye(n), 1.0
+
+    sample = z.T @ z / t
+    target = np.eye(n)
+
+    # d^2 = ||S - F||^2 ; b^2 = 1/T^2 * sum_t ||z_t z_t' - S||^2 = (sum_t ||z_t||^4 - T ||S||^2) / T^2
+    d2 = ((sample - target) ** 2).sum()
+    b2_bar = ((z ** 2).sum(axis=1) ** 2).sum() / t ** 2 - (sample ** 2).sum() / t
+    b2 = min(max(b2_bar, 0.0), d2)
+    delta = float(b2 / d2) if d2 > 0 else 1.0
+
+    corr = delta * target + (1.0 - delta) * sample
+    corr[~usable, :] = 0.0
+    corr[:, ~usable] = 0.0
+    corr[np.diag_indices(n)] = 1.0
+    return corr, delta
+
+
+def project_capped_simplex(w, cap):
+    """Euclidean projection onto {w >= 0, sum(w) <= cap}."""
+    w = np.maximum(w, 0.0)
+    if w.sum() <= cap:
+        return w
+    # Project onto {w >= 0, sum(w) = cap} (sort-based, Duchi et al. 2008)
+    u = np.sort(w)[::-1]
+    css = np.cumsum(u) - cap
+    idx = np.arange(1, len(u) + 1)
+    rho = np.nonzero(u - css / idx > 0)[0][-1]
+    theta = css[rho] / (rho + 1.0)
+    return np.maximum(w - theta, 0.0)
+
+
+def solve_joint_kelly(mu, sigma, cap=1.0, max_iter=2000, tol=1e-10):
+    """
+    Maximize mu'w - 1/2 w'Sigma w subject to w >= 0 and sum(w) <= cap.
+
+    Accelerated projected gradient (FISTA) with step 1/L, L = largest eigenvalue of Sigma.
+    """
+    mu = np.asarray(mu, dtype=float)
+    sigma = np.asarray(sigma, dtype=float)
+    n = len(mu)
+    if n == 0:
+        return np.zeros(0)
+
+    lipschitz = float(np.linalg.eigvalsh(sigma)[-1])
+    step = 1.0 / lipschitz if lipschitz > 0 else 1.0
+
+    w = np.zeros(n)
+    y = w.copy()
+    t_k = 1.0
+    for _ in range(max_iter):
+        w_next = project_capped_simplex(y + step * (mu - sigma @ y), cap)
+        t_next = (1.0 + np.sqrt(1.0 + 4.0 * t_k ** 2)) / 2.0
+        y = w_next + ((t_k - 1.0) / t_next) * (w_next - w)
+        if np.max(np.abs(w_next - w)) < tol:
+            w = w_next
+            break
+        w, t_k = w_next, t_next
+    return w
+
+
+def joint_kelly_weights(new_p, b, corr, kelly_fraction=0.5, max_gross=1.0):
+    """
+    Joint fractional-Kelly weights for all assets at once.
+
+    :param new_p: array (A,) impact-adjusted win rates.
+    :param b: array (A,) payoff ratios (upside / max_dd).
+    :param corr: array (A, A) correlation matrix (identity = independent sizing).
+    :param max_gross: cap on the sum of final (fractional) weights.
+    :return: array (A,) recommended weights after the Kelly fraction.
+    """
+    new_p = np.asarray(new_p, dtype=float)
+    b = np.asarray(b, dtype=float)
+    b = np.where(b > 0, b, 1e-9)
+
+    mu = b * new_p - (1.0 - new_p)
+    scale = np.sqrt(b)
+    sigma = corr * np.outer(scale, scale)
+
+    # Solve full Kelly with the budget scaled up, then shrink by the fraction
+    full = solve_joint_kelly(mu, sigma, cap=max_gross / kelly_fraction if kelly_fraction > 0 else max_gross)
+    return full * kelly_fraction
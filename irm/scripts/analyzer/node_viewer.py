@@ -1,22 +1,23 @@
 import argparse
-import os
 import unicodedata
-from urllib.parse import urlparse
-from falkordb import FalkorDB
+import sys
+from pathlib import Path
+
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.common.db import get_graph, redis_address
 
 class IRMNodeViewer:
     def __init__(self, graph_name="Graph-001"):
         self.graph_name = graph_name
         
-        # Priority: REDIS_URL env var > default
-        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-        parsed = urlparse(redis_url)
-        host = parsed.hostname or "localhost"
-        port = parsed.port or 6379
+        host, port = redis_address()
         
         try:
-            self.db = FalkorDB(host=host, port=port)
-            self.graph = self.db.select_graph(graph_name)
+            self.graph = get_graph(graph_name)
         except Exception as e:
             print(f"[!] Failed to connect to FalkorDB at {host}:{port}: {e}")
             self.graph = None
@@ -1,30 +1,60 @@
 import argparse
 import json
-import os
-from urllib.parse import urlparse
-from falkordb import FalkorDB
+import sys
+import time
+from pathlib import Path
+import numpy as np
+
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.analyzer.kelly_joint import shrunk_correlation, joint_kelly_weights
+from scripts.common.db import get_graph, get_redis
+
+DEFAULT_ASSUMPTIONS = {"base_win_rate": 0.55, "upside": 0.30, "max_dd": 0.20}
+ACTIONS = np.array(["HOLD", "ADD", "REDUCE", "LIQUIDATE"])
+
+
+def classify_actions(recommended_weight, current_weights):
+    """Map recommended vs current weights to ACTIONS (5pp dead band, <=1% means liquidate)."""
+    weight_diff = recommended_weight - current_weights
+    action_idx = np.where(
+        weight_diff > 0.05, 1,
+        np.where(weight_diff < -0.05, np.where(recommended_weight <= 0.01, 3, 2), 0)
+    )
+    return weight_diff, ACTIONS[action_idx]
 
 class KellyAdvisor:
-    def __init__(self, kelly_fraction=0.5, graph_name="Graph-001"):
+    def __init__(self, kelly_fraction=0.5, graph_name="Graph-001", graph=None):
         """
         :param kelly_fraction: 0.5 for Half-Kelly, 0.25 for Quarter-Kelly.
                                Essential for long-term investments to avoid ruin.
+        :param graph: Optional already-selected FalkorDB graph to reuse (e.g. the tracer's).
         """
         self.kelly_fraction = kelly_fraction
         self.graph_name = graph_name
+        self.graph = graph
+        self.redis_client = None
         
         # Assumptions are now stored in ontology graph under :Investable nodes.
 
+    def _get_graph(self):
+        """Graph handle on the process-wide connection pool (scripts.common.db)."""
+        if self.graph is None:
+            self.graph = get_graph(self.graph_name)
+        return self.graph
+
+    def _get_redis(self):
+        if self.redis_client is None:
+            self.redis_client = get_redis()
+        return self.redis_client
+
     def fetch_current_weights(self, owner="Admin"):
         """Fetch current weights and denominations directly from FalkorDB [:HOLDS] edges."""
-        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-        parsed = urlparse(redis_url)
-        host = parsed.hostname or "localhost"
-        port = parsed.port or 6379
-        
         try:
-            db = FalkorDB(host=host, port=port)
-            graph = db.select_graph(self.graph_name)
+            graph = self._get_graph()
             cypher = f"MATCH (p:Portfolio {{owner: '{owner}'}})-[r:HOLDS]->(a:Investable) RETURN a.ticker, r.weight_pct, r.denomination"
             result = graph.query(cypher)
             
@@ -43,14 +73,8 @@ class KellyAdvisor:
 
     def fetch_assumptions(self, tickers):
         """Fetch base assumptions for a list of tickers from :Investable nodes."""
-        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-        parsed = urlparse(redis_url)
-        host = parsed.hostname or "localhost"
-        port = parsed.port or 6379
-        
         try:
-            db = FalkorDB(host=host, port=port)
-            graph = db.select_graph(self.graph_name)
+            graph = self._get_graph()
             cypher_list = json.dumps(list(tickers))
             cypher = f"MATCH (a:Investable) WHERE a.ticker IN {cypher_list} RETURN a.ticker, a.base_win_rate, a.expected_upside, a.expected_max_dd"
             result = graph.query(cypher)
@@ -68,67 +92,338 @@ class KellyAdvisor:
             print(f"[!] Warning: Failed to fetch assumptions from DB: {e}")
             return {}
 
-    def evaluate_position(self, asset, current_weight, impact_score, asset_assumptions):
+    def evaluate_matrix(self, impacts, current_weights, base_p, upside, max_dd):
         """
-        Evaluate optimal position size based on ontology impact score.
+        Vectorized Kelly evaluation of a (scenarios x assets) impact matrix.
+
+        :param impacts: array (S, A) of impact scores in percent.
+        :param current_weights: array (A,) of current portfolio weights.
+        :param base_p, upside, max_dd: arrays (A,) of per-asset prior assumptions.
+        :return: dict of arrays; per-asset arrays have shape (A,), the rest (S, A).
         """
-        base_p = asset_assumptions.get("base_win_rate", 0.55)
-        upside = asset_assumptions.get("upside", 0.30)
-        max_dd = asset_assumptions.get("max_dd", 0.20)
-        
-        b = upside / max_dd if max_dd > 0 else 1.0
+        impacts = np.atleast_2d(np.asarray(impacts, dtype=float))
+        current_weights = np.asarray(current_weights, dtype=float)
+        base_p = np.asarray(base_p, dtype=float)
+        upside = np.asarray(upside, dtype=float)
+        max_dd = np.asarray(max_dd, dtype=float)
 
-        # 1. Update Bayesian Probability based on Impact Score
-        if impact_score < 0:
-            probability_adj = impact_score * 0.005  # e.g., -100% impact -> -0.5 to win rate
-        else:
-            probability_adj = impact_score * 0.002  # e.g., +100% impact -> +0.2 to win rate
-            
-        new_p = max(0.01, min(0.99, base_p + probability_adj)) 
+        safe_dd = np.where(max_dd > 0, max_dd, 1.0)
+        b = np.where(max_dd > 0, upside / safe_dd, 1.0)
+
+        # 1. Update Bayesian Probability based on Impact Score (asymmetric: bad news weighs more)
+        probability_adj = np.where(impacts < 0, impacts * 0.005, impacts * 0.002)
+        new_p = np.clip(base_p + probability_adj, 0.01, 0.99)
         new_q = 1.0 - new_p
 
         # 2. Raw Kelly Formula: f* = (bp - q) / b
-        raw_kelly = new_p - (new_q / b) if b > 0 else 0
-        raw_kelly = max(0.0, raw_kelly)
+        safe_b = np.where(b > 0, b, 1.0)
+        raw_kelly = np.where(b > 0, new_p - new_q / safe_b, 0.0)
+        raw_kelly = np.maximum(raw_kelly, 0.0)
 
         # 3. Apply Fractional Kelly
         recommended_weight = raw_kelly * self.kelly_fraction
 
         # 4. Generate Actionable Suggestion
-        weight_diff = recommended_weight - current_weight
-        action = "HOLD"
-        if weight_diff > 0.05:
-            action = "ADD"
-        elif weight_diff < -0.05:
-            action = "REDUCE"
-            if recommended_weight <= 0.01:
-                action = "LIQUIDATE"
+        weight_diff, action = classify_actions(recommended_weight, current_weights)
+
+        return {
+            "b_ratio": b,
+            "new_p": new_p,
+            "raw_kelly": raw_kelly,
+            "recommended_weight": recommended_weight,
+            "weight_diff": weight_diff,
+            "action": action
+        }
+
+    def assumption_arrays(self, tickers, assumptions):
+        """Lay out per-asset assumptions as aligned arrays (defaults for unknown tickers)."""
+        rows = [assumptions.get(t, DEFAULT_ASSUMPTIONS) for t in tickers]
+        base_p = np.array([r.get("base_win_rate", 0.55) for r in rows], dtype=float)
+        upside = np.array([r.get("upside", 0.30) for r in rows], dtype=float)
+        max_dd = np.array([r.get("max_dd", 0.20) for r in rows], dtype=float)
+        return base_p, upside, max_dd
+
+    def evaluate_scenarios(self, scenarios, weights, assumptions=None):
+        """
+        Evaluate many impact scenarios against the whole portfolio in one pass.
+
+        :param scenarios: dict {label: {ticker: impact}} (e.g. tracer batch/sweep output).
+        :param weights: dict {ticker: {"weight": w, "denomination": ccy}} or {ticker: w}.
+        :param assumptions: optional pre-fetched assumptions; fetched once if omitted.
+        :return: dict with labels, tickers and the (S, A) result arrays of evaluate_matrix.
+        """
+        labels = list(scenarios.keys())
+        tickers = sorted(set(weights.keys()).union(*[set(v.keys()) for v in scenarios.values()]))
+        if assumptions is None:
+            assumptions = self.fetch_assumptions(tickers)
+
+        ticker_idx = {t: j for j, t in enumerate(tickers)}
+        impacts = np.zeros((len(labels), len(tickers)))
+        for i, label in enumerate(labels):
+            for ticker, impact in scenarios[label].items():
+                impacts[i, ticker_idx[ticker]] = float(impact)
+
+        current = np.array([
+            w["weight"] if isinstance(w, dict) else float(w)
+            for w in (weights.get(t, 0.0) for t in tickers)
+        ], dtype=float)
+        base_p, upside, max_dd = self.assumption_arrays(tickers, assumptions)
+
+        result = self.evaluate_matrix(impacts, current, base_p, upside, max_dd)
+        result.update({
+            "labels": labels,
+            "tickers": tickers,
+            "impacts": impacts,
+            "current_weight": current,
+            "base_p": base_p
+        })
+        return result
+
+    def fetch_return_panel(self, tickers):
+        """Load the cached weekly return panel (built by calc_betas.py) for tickers."""
+        from scripts.providers.returns import ReturnPanelCache, load_return_panel
+
+        r = self._get_redis()
+        cache = ReturnPanelCache(r, freq="W")
+        asset_config = {}
+        for ticker, data_str in r.hgetall("irm:config:sources").items():
+            asset_config[ticker] = json.loads(data_str)
+
+        metric_types = {}
+        result = self._get_graph().query(
+            f"MATCH (a:Asset) WHERE a.ticker IN {json.dumps(list(tickers))} RETURN a.ticker, a.metric_type"
+        )
+        if result and result.result_set:
+            metric_types = {row[0]: row[1] for row in result.result_set}
+        return load_return_panel(list(tickers), metric_types, asset_config, cache)
+
+    def allocate_joint(self, impacts, weights, assumptions, panel, max_gross=1.0):
+        """
+        Correlation-aware allocation: size all assets together on one Kelly budget.
+
+        :param impacts: dict {ticker: impact}.
+        :param weights: dict {ticker: {"weight": w, ...}} current weights.
+        :param panel: DataFrame (dates x tickers) of weekly returns.
+        :return: dict with tickers, independent and joint arrays, actions and shrinkage.
+        """
+        result = self.evaluate_scenarios({"joint": impacts}, weights, assumptions=assumptions)
+        tickers = result["tickers"]
+
+        returns = np.full((len(panel.index), len(tickers)), np.nan)
+        for j, ticker in enumerate(tickers):
+            if ticker in panel.columns:
+                returns[:, j] = panel[ticker].to_numpy(dtype=float)
+        corr, delta = shrunk_correlation(returns)
+
+        joint = joint_kelly_weights(
+            result["new_p"][0], result["b_ratio"], corr,
+            kelly_fraction=self.kelly_fraction, max_gross=max_gross
+        )
+        weight_diff, action = classify_actions(joint, result["current_weight"])
+        return {
+            "tickers": tickers,
+            "impacts": result["impacts"][0],
+            "base_p": result["base_p"],
+            "new_p": result["new_p"][0],
+            "current_weight": result["current_weight"],
+            "independent_weight": result["recommended_weight"][0],
+            "joint_weight": joint,
+            "weight_diff": weight_diff,
+            "action": action,
+            "shrinkage": delta,
+            "history": [ticker in panel.columns for ticker in tickers]
+        }
+
+    def advise(self, impacts, weights, assumptions):
+        """
+        Per-asset advice for one impact vector over the union of impacted and held assets.
+
+        :param impacts: dict {ticker: impact}; missing tickers default to 0 impact.
+        :param weights: dict {ticker: {"weight": w, "denomination": ccy}} or {ticker: w}.
+        :return: list of evaluate_position() dicts (sorted by ticker) with a denomination key.
+        """
+        rows = []
+        for asset in sorted(set(impacts.keys()) | set(weights.keys())):
+            impact = impacts.get(asset, 0.0) # Default 0 impact if not specified
+            w_info = weights.get(asset, {"weight": 0.0, "denomination": "USD"})
+            curr_weight = w_info["weight"] if isinstance(w_info, dict) else float(w_info)
+            denom = w_info.get("denomination", "USD") if isinstance(w_info, dict) else "USD"
+            asset_assumptions = assumptions.get(asset, DEFAULT_ASSUMPTIONS)
+
+            res = self.evaluate_position(asset, curr_weight, impact, asset_assumptions)
+            res["denomination"] = denom
+            rows.append(res)
+        return rows
+
+    def evaluate_position(self, asset, current_weight, impact_score, asset_assumptions):
+        """
+        Evaluate optimal position size based on ontology impact score.
+        """
+        base_p = asset_assumptions.get("base_win_rate", 0.55)
+        upside = asset_assumptions.get("upside", 0.30)
+        max_dd = asset_assumptions.get("max_dd", 0.20)
+
+        res = self.evaluate_matrix([[impact_score]], [current_weight], [base_p], [upside], [max_dd])
 
         return {
             "asset": asset,
             "impact_score": round(impact_score, 2),
             "original_P_win": base_p,
-            "new_P_win": round(new_p, 4),
-            "b_ratio": round(b, 2),
-            "raw_full_kelly_weight": round(raw_kelly, 4),
-            "recommended_weight": round(recommended_weight, 4),
+            "new_P_win": round(float(res["new_p"][0, 0]), 4),
+            "b_ratio": round(float(res["b_ratio"][0]), 2),
+            "raw_full_kelly_weight": round(float(res["raw_kelly"][0, 0]), 4),
+            "recommended_weight": round(float(res["recommended_weight"][0, 0]), 4),
             "current_weight": round(current_weight, 4),
-            "action": action,
-            "suggested_delta": round(weight_diff, 4)
+            "action": str(res["action"][0, 0]),
+            "suggested_delta": round(float(res["weight_diff"][0, 0]), 4)
         }
 
+
+def print_advice_table(rows, fraction, owner):
+    """Render advise() rows as the classic per-asset Kelly advisor table."""
+    print("\n" + "="*20 + " KELLY CRITERION POSITION ADVISOR " + "="*20)
+    print(f"Mode: {fraction}-Kelly | Owner: {owner}")
+    print("-" * 80)
+    print(f"{'Asset':<6} | {'Denom':<5} | {'Impact':<8} | {'WinRate':<7} | {'Curr Wt':<8} | {'Rec Wt':<8} | {'ACTION':<10}")
+    print("-" * 80)
+
+    for res in rows:
+        # Color coding Actions (ANSI codes)
+        color = ""
+        if res['action'] in ['REDUCE', 'LIQUIDATE']: color = "\033[91m"
+        elif res['action'] == 'ADD': color = "\033[92m"
+        reset = "\033[0m"
+
+        curr_w_str = f"{res['current_weight']*100:>5.1f}%"
+        rec_w_str = f"{res['recommended_weight']*100:>5.1f}%"
+
+        print(f"{res['asset']:<6} | {res['denomination']:<5} | {res['impact_score']:>7.2f}% | {res['original_P_win']:>3.2f}->{res['new_P_win']:<4.2f} | {curr_w_str:<8} | {rec_w_str:<8} | {color}{res['action']:<10}{reset}")
+
+    print("=" * 80 + "\n")
+
+
+def load_scenarios(args):
+    """Parse --scenarios / --scenarios-file into an ordered {label: {ticker: impact}} dict."""
+    raw = args.scenarios
+    if args.scenarios_file:
+        with open(args.scenarios_file, "r", encoding="utf-8") as f:
+            raw = f.read()
+    data = json.loads(raw)
+    if isinstance(data, list):
+        scenarios = {}
+        for i, item in enumerate(data):
+            if isinstance(item, dict) and "impacts" in item:
+                scenarios[str(item.get("label", i))] = item["impacts"]
+            else:
+                scenarios[str(i)] = item
+        return scenarios
+    return {str(k): v for k, v in data.items()}
+
+
+def print_scenario_table(result, elapsed_ms):
+    """Render the per-scenario action grid: one row per scenario, one column per asset."""
+    tickers = result["tickers"]
+    labels = result["labels"]
+    short = {"HOLD": "HLD", "ADD": "ADD", "REDUCE": "RED", "LIQUIDATE": "LIQ"}
+    label_w = max([10] + [len(l) for l in labels])
+    cell_w = 11
+
+    header = f"{'Scenario':<{label_w}} | " + " | ".join(f"{t:^{cell_w}}" for t in tickers)
+    width = len(header)
+    print("\n" + "=" * width)
+    print(f" KELLY SCENARIO GRID: {len(labels)} scenarios x {len(tickers)} assets ({elapsed_ms:.2f} ms)")
+    print("=" * width)
+    print(header)
+    print(f"{'(current)':<{label_w}} | " + " | ".join(f"{w*100:>{cell_w-1}.1f}%" for w in result["current_weight"]))
+    print("-" * width)
+
+    for i, label in enumerate(labels):
+        cells = []
+        for j in range(len(tickers)):
+            action = str(result["action"][i, j])
+            cell = f"{short[action]} {result['recommended_weight'][i, j]*100:>5.1f}%"
+            color = "\033[91m" if action in ("REDUCE", "LIQUIDATE") else "\033[92m" if action == "ADD" else ""
+            reset = "\033[0m" if color else ""
+            cells.append(f"{color}{cell:>{cell_w}}{reset}")
+        print(f"{label:<{label_w}} | " + " | ".join(cells))
+
+    print("-" * width)
+    counts = {a: (result["action"] == a).sum(axis=0) for a in ACTIONS}
+    for a in ACTIONS:
+        print(f"{'#' + a:<{label_w}} | " + " | ".join(f"{int(c):>{cell_w}}" for c in counts[a]))
+    print("=" * width + "\n")
+
+
+def print_joint_table(res, args, elapsed_ms):
+    """Render independent vs correlation-aware joint Kelly weights side by side."""
+    width = 88
+    print("\n" + "=" * 18 + " JOINT (CORRELATION-AWARE) KELLY ADVISOR " + "=" * 18)
+    print(f"Mode: {args.fraction}-Kelly | Owner: {args.owner} | Max Gross: {args.max_gross*100:.0f}% | "
+          f"Shrinkage: {res['shrinkage']:.2f} | Solve: {elapsed_ms:.1f} ms")
+    print("-" * width)
+    print(f"{'Asset':<6} | {'Impact':<8} | {'WinRate':<10} | {'Curr Wt':<8} | {'Indep Wt':<8} | {'Joint Wt':<8} | {'ACTION':<10} | Hist")
+    print("-" * width)
+    for j, asset in enumerate(res["tickers"]):
+        action = str(res["action"][j])
+        color = "\033[91m" if action in ("REDUCE", "LIQUIDATE") else "\033[92m" if action == "ADD" else ""
+        reset = "\033[0m" if color else ""
+        hist = "Y" if res["history"][j] else "-"
+        print(f"{asset:<6} | {res['impacts'][j]:>7.2f}% | {res['base_p'][j]:>3.2f}->{res['new_p'][j]:<4.2f} | "
+              f"{res['current_weight'][j]*100:>7.1f}% | {res['independent_weight'][j]*100:>7.1f}% | "
+              f"{res['joint_weight'][j]*100:>7.1f}% | {color}{action:<10}{reset} | {hist}")
+    print("-" * width)
+    print(f"{'TOTAL':<6} | {'':<8} | {'':<10} | {res['current_weight'].sum()*100:>7.1f}% | "
+          f"{res['independent_weight'].sum()*100:>7.1f}% | {res['joint_weight'].sum()*100:>7.1f}% |")
+    print("=" * width + "\n")
+
+
+def scenario_result_to_json(result):
+    rows = []
+    for i, label in enumerate(result["labels"]):
+        for j, ticker in enumerate(result["tickers"]):
+            rows.append({
+                "scenario": label,
+                "asset": ticker,
+                "impact_score": round(float(result["impacts"][i, j]), 2),
+                "original_P_win": float(result["base_p"][j]),
+                "new_P_win": round(float(result["new_p"][i, j]), 4),
+                "raw_full_kelly_weight": round(float(result["raw_kelly"][i, j]), 4),
+                "recommended_weight": round(float(result["recommended_weight"][i, j]), 4),
+                "current_weight": round(float(result["current_weight"][j]), 4),
+                "action": str(result["action"][i, j]),
+                "suggested_delta": round(float(result["weight_diff"][i, j]), 4)
+            })
+    return rows
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="IRM Kelly Position Advisor")
-    parser.add_argument("--impacts", type=str, required=True, help="JSON impacts. e.g. '{\"QQQM\": -19.01}'")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--impacts", type=str, help="JSON impacts. e.g. '{\"QQQM\": -19.01}'")
+    source.add_argument("--scenarios", type=str,
+                        help="JSON scenario grid, {label: {ticker: impact}} or a list of impact dicts")
+    source.add_argument("--scenarios-file", type=str, help="Path to a scenario grid JSON file (same format as --scenarios)")
     parser.add_argument("--weights", type=str, help="Optional current weights JSON. If omitted, fetched from DB.")
     parser.add_argument("--owner", default="Admin", help="Portfolio owner for weight fetching")
     parser.add_argument("--fraction", type=float, default=0.5, help="Kelly fraction (default 0.5)")
+    parser.add_argument("--json", action="store_true",
+                        help="Print scenario grid results as JSON rows (with --scenarios / --scenarios-file)")
+    parser.add_argument("--joint", action="store_true",
+                        help="Correlation-aware joint allocation using cached weekly returns (with --impacts)")
+    parser.add_argument("--max-gross", type=float, default=1.0, help="Joint mode cap on total recommended weight (default 1.0)")
     
     args = parser.parse_args()
+    if args.json and args.impacts:
+        parser.error("--json is only supported for scenario grids (--scenarios / --scenarios-file)")
+    if args.joint and not args.impacts:
+        parser.error("--joint needs --impacts; scenario grids are evaluated per asset")
     
+    scenarios = None
     try:
-        impacts = json.loads(args.impacts)
-    except json.JSONDecodeError as e:
+        if args.impacts:
+            impacts = json.loads(args.impacts)
+        else:
+            scenarios = load_scenarios(args)
+    except (json.JSONDecodeError, OSError) as e:
         print(f"Error parsing impacts JSON: {e}")
         exit(1)
         
@@ -148,35 +443,33 @@ if __name__ == "__main__":
         weights = advisor.fetch_current_weights(owner=args.owner)
         if not weights:
             print(f"[!] No active holdings found for {args.owner}. Please provide --weights manually.")
+
+    # ── MODE: Scenario grid (vectorized) ──
+    if scenarios is not None:
+        tickers = set(weights.keys()).union(*[set(v.keys()) for v in scenarios.values()])
+        db_assumptions = advisor.fetch_assumptions(tickers)
+        t0 = time.perf_counter()
+        result = advisor.evaluate_scenarios(scenarios, weights, assumptions=db_assumptions)
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        if args.json:
+            print(json.dumps(scenario_result_to_json(result), ensure_ascii=False, indent=2))
+        else:
+            print_scenario_table(result, elapsed_ms)
+        sys.exit(0)
     
-    print("\n" + "="*20 + " KELLY CRITERION POSITION ADVISOR " + "="*20)
-    print(f"Mode: {args.fraction}-Kelly | Owner: {args.owner}")
-    print("-" * 80)
-    print(f"{'Asset':<6} | {'Denom':<5} | {'Impact':<8} | {'WinRate':<7} | {'Curr Wt':<8} | {'Rec Wt':<8} | {'ACTION':<10}")
-    print("-" * 80)
-    
+    # ── MODE: Joint (correlation-aware) allocation ──
+    if args.joint:
+        all_tickers = sorted(set(impacts.keys()) | set(weights.keys()))
+        db_assumptions = advisor.fetch_assumptions(all_tickers)
+        panel = advisor.fetch_return_panel(all_tickers)
+        t0 = time.perf_counter()
+        res = advisor.allocate_joint(impacts, weights, db_assumptions, panel, max_gross=args.max_gross)
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        print_joint_table(res, args, elapsed_ms)
+        sys.exit(0)
+
     # Process all assets in impacts, or all assets in weights
     all_tickers = set(impacts.keys()) | set(weights.keys())
     db_assumptions = advisor.fetch_assumptions(all_tickers)
-    
-    for asset in sorted(all_tickers):
-        impact = impacts.get(asset, 0.0) # Default 0 impact if not specified
-        w_info = weights.get(asset, {"weight": 0.0, "denomination": "USD"})
-        curr_weight = w_info["weight"] if isinstance(w_info, dict) else float(w_info)
-        denom = w_info.get("denomination", "USD") if isinstance(w_info, dict) else "USD"
-        asset_assumptions = db_assumptions.get(asset, {"base_win_rate": 0.55, "upside": 0.30, "max_dd": 0.20})
-        
-        res = advisor.evaluate_position(asset, curr_weight, impact, asset_assumptions)
-        
-        # Color coding Actions (ANSI codes)
-        color = ""
-        if res['action'] in ['REDUCE', 'LIQUIDATE']: color = "\033[91m"
-        elif res['action'] == 'ADD': color = "\033[92m"
-        reset = "\033[0m"
-        
-        curr_w_str = f"{res['current_weight']*100:>5.1f}%"
-        rec_w_str = f"{res['recommended_weight']*100:>5.1f}%"
-        
-        print(f"{asset:<6} | {denom:<5} | {res['impact_score']:>7.2f}% | {res['original_P_win']:>3.2f}->{res['new_P_win']:<4.2f} | {curr_w_str:<8} | {rec_w_str:<8} | {color}{res['action']:<10}{reset}")
-    
-    print("=" * 80 + "\n")
+    rows = advisor.advise(impacts, weights, db_assumptions)
+    print_advice_table(rows, args.fraction, args.owner)
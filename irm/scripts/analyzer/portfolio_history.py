@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.common.db import get_redis, pipelined
+
+# Key layout: one sorted set per owner, score = unix timestamp, member = packed record
+HISTORY_KEY = "irm:portfolio:{owner}:history"
+# Snapshots older than this many days are trimmed on append; 0 keeps everything
+RETENTION_DAYS = float(os.getenv("IRM_HISTORY_RETENTION_DAYS", "730"))
+
+INTERVAL_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_interval(text):
+    """Parse an interval string like '15m', '1h', '1d', '1w' into seconds."""
+    if not text:
+        return None
+    text = text.strip().lower()
+    unit = text[-1]
+    if unit not in INTERVAL_UNITS:
+        raise ValueError(f"Unsupported interval unit in '{text}'. Use one of: {list(INTERVAL_UNITS.keys())}")
+    return int(float(text[:-1] or 1) * INTERVAL_UNITS[unit])
+
+
+def parse_time(text, default=None):
+    """Parse 'YYYY-MM-DD[ HH:MM]' or a relative lookback like '30d' into a unix timestamp."""
+    if not text:
+        return default
+    text = text.strip()
+    if text[-1].lower() in INTERVAL_UNITS and text[:-1].replace('.', '', 1).isdigit():
+        return time.time() - parse_interval(text)
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized time '{text}'. Use YYYY-MM-DD, 'YYYY-MM-DD HH:MM' or a lookback such as 30d.")
+
+
+class PortfolioHistoryStore:
+    """Append-only NAV / weight time-series for every Portfolio, kept in Redis sorted sets.
+
+    Each revaluation is packed into one compact JSON member scored by its timestamp,
+    so range reads are O(log n + m) via ZRANGEBYSCORE and never touch FalkorDB.
+    """
+
+    def __init__(self, redis_client, retention_days=None):
+        self.redis_client = redis_client
+        self.retention_days = RETENTION_DAYS if retention_days is None else retention_days
+
+    @staticmethod
+    def pack(ts, nav, currency, weights):
+        record = {
+            "t": round(ts, 3),
+            "nav": round(nav, 2),
+            "ccy": currency,
+            "w": {ticker: round(w, 6) for ticker, w in sorted(weights.items())}
+        }
+        return json.dumps(record, separators=(",", ":"), ensure_ascii=False)
+
+    @staticmethod
+    def unpack(member):
+        record = json.loads(member)
+        return {
+            "ts": record["t"],
+            "nav": record["nav"],
+            "currency": record.get("ccy"),
+            "weights": record.get("w", {})
+        }
+
+    def append(self, owner, nav, currency, weights, ts=None):
+        """Record one revaluation snapshot for owner, trimming snapshots past the retention window."""
+        ts = time.time() if ts is None else ts
+        key = HISTORY_KEY.format(owner=owner)
+        calls = [("zadd", key, {self.pack(ts, nav, currency, weights): ts})]
+        if self.retention_days > 0:
+            # Same round trip as the ZADD; "(" keeps a snapshot sitting exactly on the cutoff
+            calls.append(("zremrangebyscore", key, "-inf", f"({ts - self.retention_days * 86400}"))
+        pipelined(self.redis_client, calls)
+        return ts
+
+    def range(self, owner, start_ts=None, end_ts=None, limit=None):
+        """Return records for owner in [start_ts, end_ts], oldest first."""
+        lo = "-inf" if start_ts is None else start_ts
+        hi = "+inf" if end_ts is None else end_ts
+        if limit:
+            # Keep the most recent `limit` records inside the window
+            members = self.redis_client.zrevrangebyscore(
+                HISTORY_KEY.format(owner=owner), hi, lo, start=0, num=limit
+            )
+            members.reverse()
+        else:
+            members = self.redis_client.zrangebyscore(HISTORY_KEY.format(owner=owner), lo, hi)
+        return [self.unpack(m) for m in members]
+
+    def latest(self, owner):
+        members = self.redis_client.zrevrange(HISTORY_KEY.format(owner=owner), 0, 0)
+        return self.unpack(members[0]) if members else None
+
+    def count(self, owner):
+        return self.redis_client.zcard(HISTORY_KEY.format(owner=owner))
+
+    @staticmethod
+    def downsample(records, interval_seconds):
+        """Keep the last record of each interval bucket (records must be oldest first)."""
+        if not interval_seconds or not records:
+            return records
+        buckets = {}
+        for rec in records:
+            buckets[int(rec["ts"] // interval_seconds)] = rec
+        return [buckets[k] for k in sorted(buckets)]
+
+
+def get_redis_client():
+    return get_redis()
+
+
+def render_history(records, owner, show_weights=False):
+    if not records:
+        print(f"[!] No history recorded for owner '{owner}' in the requested window.")
+        return
+
+    currency = records[-1]["currency"] or "USD"
+    tickers = []
+    if show_weights:
+        tickers = sorted({t for rec in records for t in rec["weights"]})
+
+    header = f"{'TIME':<16} | {'NAV (' + currency + ')':>16} | {'CHG':>8}"
+    for t in tickers:
+        header += f" | {t:>7}"
+    width = len(header)
+
+    print("\n" + "=" * width)
+    print(f" PORTFOLIO HISTORY: {owner} ({len(records)} points)")
+    print("=" * width)
+    print(header)
+    print("-" * width)
+
+    prev_nav = None
+    for rec in records:
+        ts_str = datetime.fromtimestamp(rec["ts"]).strftime("%Y-%m-%d %H:%M")
+        chg = f"{(rec['nav'] / prev_nav - 1) * 100:>+7.2f}%" if prev_nav else f"{'-':>8}"
+        line = f"{ts_str:<16} | {rec['nav']:>16,.2f} | {chg:>8}"
+        for t in tickers:
+            w = rec["weights"].get(t)
+            line += f" | {w * 100:>6.1f}%" if w is not None else f" | {'-':>7}"
+        print(line)
+        prev_nav = rec["nav"]
+
+    first, last = records[0]["nav"], records[-1]["nav"]
+    print("-" * width)
+    if first:
+        print(f" Window Return: {(last / first - 1) * 100:+.2f}% | High: {max(r['nav'] for r in records):,.2f} | "
+              f"Low: {min(r['nav'] for r in records):,.2f}")
+    print("=" * width + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IRM Portfolio NAV & Weight History")
+    parser.add_argument("--owner", default="Admin", help="Portfolio owner")
+    parser.add_argument("--since", default="30d", help="Window start: YYYY-MM-DD or lookback like 30d (default 30d)")
+    parser.add_argument("--until", default=None, help="Window end: YYYY-MM-DD (default now)")
+    parser.add_argument("--every", default=None, help="Downsample interval, e.g. 1h, 1d, 1w (last point per bucket)")
+    parser.add_argument("--limit", type=int, default=None, help="Only keep the most recent N raw points in the window")
+    parser.add_argument("--weights", action="store_true", help="Show per-holding weight columns")
+    parser.add_argument("--json", action="store_true", help="Print records as JSON")
+    args = parser.parse_args()
+
+    try:
+        start_ts = parse_time(args.since)
+        end_ts = parse_time(args.until)
+        if end_ts is not None and args.until and len(args.until.strip()) == 10:
+            # A bare date is inclusive of that whole day
+            end_ts += timedelta(days=1).total_seconds() - 1
+        interval = parse_interval(args.every)
+    except ValueError as e:
+        print(f"[!] {e}")
+        sys.exit(1)
+
+    store = PortfolioHistoryStore(get_redis_client())
+    records = store.downsample(store.range(args.owner, start_ts, end_ts, limit=args.limit), interval)
+
+    if args.json:
+        print(json.dumps(records, ensure_ascii=False, indent=2))
+    else:
+        render_history(records, args.owner, show_weights=args.weights)
@@ -1,12 +1,15 @@
 import argparse
-import os
-import redis
 import logging
-from urllib.parse import urlparse
-from falkordb import FalkorDB
 import sys
-sys.path.append('/app')
+from pathlib import Path
+
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
 from scripts.analyzer.update_weights import PortfolioWeightUpdater
+from scripts.common.db import get_graph, get_redis, redis_address
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,15 +19,11 @@ class PortfolioManager:
     def __init__(self, graph_name="Graph-001"):
         self.graph_name = graph_name
         
-        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-        parsed = urlparse(redis_url)
-        host = parsed.hostname or "localhost"
-        port = parsed.port or 6379
+        host, port = redis_address()
         
         try:
-            self.db = FalkorDB(host=host, port=port)
-            self.graph = self.db.select_graph(graph_name)
-            self.redis_client = redis.Redis(host=host, port=port, decode_responses=True)
+            self.graph = get_graph(graph_name)
+            self.redis_client = get_redis()
             logger.info(f"Connected to FalkorDB and Redis at {host}:{port}")
         except Exception as e:
             logger.error(f"Initialization Failed: {e}")
@@ -219,6 +218,12 @@ class PortfolioManager:
                 )
                 self.query_falkor(update_denom_cypher)
 
+        # Ledger changed: live PnL consumers reload this owner and notice new owners (see portfolio_pnl)
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.incr(f"irm:portfolio:{owner}:ledger_version")
+        pipe.incr("irm:portfolio:ledger_version")
+        pipe.execute()
+
         # 4. Trigger weights recalculation
         logger.info("Triggering weight recalculation...")
         weight_updater = PortfolioWeightUpdater(graph_name=self.graph_name)
@@ -0,0 +1,354 @@
+"""
+Live portfolio PnL (`irm portfolio pnl`).
+
+A full revaluation (graph prices + Redis ledger + FX) runs once per owner; afterwards
+the follower consumes `irm:stream:asset_changes` (written by the price stream daemon
+and the batch price job) and only touches the holdings of the assets that moved:
+
+    slot value += shares * (new price - old price)        (local currency of the slot)
+    NAV        += that delta * FX(slot -> base)
+
+An FX pair change re-converts the slot totals of the owners that hold foreign slots,
+and a ledger edit (`irm portfolio update` bumps irm:portfolio:{owner}:ledger_version)
+reloads that owner only. Portfolios created or removed while following are picked up
+when the global irm:portfolio:ledger_version moves or, for ontology imports that do not
+touch the ledger, by re-reading the set of Portfolio owners every IRM_PNL_OWNERS_S.
+Every change appends a snapshot (totals, FX slots and the changed holdings) to
+`irm:stream:portfolio_pnl:{owner}` for the gateway to forward.
+
+Unrealized PnL = value - shares * avg_cost per holding, both in the slot currency;
+base-currency figures convert cost at the current FX rate (like the NAV).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from datetime import datetime
+from pathlib import Path
+
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.analyzer.update_weights import get_fx_rates, FX_PAIRS
+from scripts.common.db import get_graph, get_redis, query
+from scripts.providers.asset_events import ASSET_CHANGES_STREAM, parse_entry
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PNL_STREAM_KEY = "irm:stream:portfolio_pnl:{owner}"
+LEDGER_VERSION_KEY = "irm:portfolio:{owner}:ledger_version"
+# Bumped on every ledger edit of any owner (new portfolios included)
+GLOBAL_LEDGER_VERSION_KEY = "irm:portfolio:ledger_version"
+PNL_STREAM_MAXLEN = int(os.getenv("IRM_PNL_STREAM_MAXLEN", "2000"))
+# Full revaluation period of the follower (bounds drift from incremental float updates)
+RELOAD_S = float(os.getenv("IRM_PNL_RELOAD_S", "3600"))
+# Period of the Portfolio owner set check (portfolios added / removed by ontology imports)
+OWNERS_CHECK_S = float(os.getenv("IRM_PNL_OWNERS_S", "60"))
+BLOCK_MS = 5000
+
+FX_TICKERS = {ticker for ticker, _, _ in FX_PAIRS}
+
+
+class PortfolioBook:
+    """Incrementally maintained valuation of one portfolio."""
+
+    def __init__(self, owner, name, currency):
+        self.owner = owner
+        self.name = name
+        self.currency = currency
+        self.holdings = {}      # ticker -> {shares, avg_cost, denomination, price}
+        self.slots = {}         # denomination -> {"value", "cost"} in the slot currency
+        self.fx = {currency: 1.0}
+        self.nav = 0.0          # base currency
+        self.cost = 0.0         # base currency at current FX
+
+    @property
+    def multi_currency(self):
+        return any(d != self.currency for d in self.slots)
+
+    def add(self, ticker, shares, avg_cost, denomination, price):
+        self.holdings[ticker] = {"shares": shares, "avg_cost": avg_cost, "denomination": denomination,
+                                 "price": price}
+        slot = self.slots.setdefault(denomination, {"value": 0.0, "cost": 0.0})
+        slot["value"] += shares * price
+        slot["cost"] += shares * avg_cost
+
+    def set_fx(self, fx_rates):
+        """Re-convert every slot (O(slots)); also used to initialise the totals after add()."""
+        self.fx = fx_rates
+        self.nav = sum(s["value"] * self.fx.get(d, 1.0) for d, s in self.slots.items())
+        self.cost = sum(s["cost"] * self.fx.get(d, 1.0) for d, s in self.slots.items())
+
+    def reprice(self, ticker, price):
+        """Apply a new price to one holding in O(1); False when nothing changed."""
+        h = self.holdings.get(ticker)
+        if h is None or price is None or price == h["price"]:
+            return False
+        delta = h["shares"] * (price - h["price"])
+        h["price"] = price
+        self.slots[h["denomination"]]["value"] += delta
+        self.nav += delta * self.fx.get(h["denomination"], 1.0)
+        return True
+
+    def holding_view(self, ticker):
+        h = self.holdings[ticker]
+        value, cost = h["shares"] * h["price"], h["shares"] * h["avg_cost"]
+        fx = self.fx.get(h["denomination"], 1.0)
+        return {
+            "shares": h["shares"], "avg_cost": h["avg_cost"], "price": h["price"], "denomination": h["denomination"],
+            "value": round(value, 2), "upl": round(value - cost, 2),
+            "upl_pct": round((value - cost) / cost, 6) if cost else None,
+            "weight": round(value * fx / self.nav, 6) if self.nav else None,
+        }
+
+    def snapshot(self, tickers=None):
+        """Totals, FX slots and the given holdings (all when tickers is None)."""
+        slots = {}
+        for denom, s in self.slots.items():
+            slots[denom] = {"value": round(s["value"], 2), "cost": round(s["cost"], 2),
+                            "upl": round(s["value"] - s["cost"], 2), "fx": self.fx.get(denom, 1.0)}
+        names = self.holdings if tickers is None else [t for t in tickers if t in self.holdings]
+        return {
+            "owner": self.owner, "currency": self.currency,
+            "nav": round(self.nav, 2), "cost": round(self.cost, 2), "upl": round(self.nav - self.cost, 2),
+            "upl_pct": round((self.nav - self.cost) / self.cost, 6) if self.cost else None,
+            "slots": slots, "holdings": {t: self.holding_view(t) for t in names},
+        }
+
+
+class PortfolioPnLStream:
+    """
+    Uses the weight updater's FX conversion (update_weights.get_fx_rates) and ledger, so
+    the live NAV matches the total_value written by update_all_portfolios at the same prices.
+    """
+
+    def __init__(self, graph_name="Graph-001", owners=None):
+        self.graph_name = graph_name
+        try:
+            self.graph = get_graph(graph_name)
+            self.redis_client = get_redis()
+        except Exception as e:
+            logger.error(f"Initialization Failed: {e}")
+            self.graph = None
+            self.redis_client = None
+        self.owners = set(owners) if owners else None
+        self.books = {}         # owner -> PortfolioBook
+        self.holders = {}       # ticker -> {owners holding it}
+        self.versions = {}      # owner -> ledger version seen at load
+        self.global_version = None
+
+    def query_falkor(self, cypher):
+        return query(self.graph, cypher)
+
+    # ---- full revaluation ----
+    def load(self, owner_filter=None):
+        """(Re)value every portfolio (or one owner) from graph prices and the Redis ledger."""
+        where = f" WHERE p.owner = '{owner_filter}'" if owner_filter else ""
+        portfolios_res = self.query_falkor(f"MATCH (p:Portfolio){where} RETURN p.owner, p.name, p.currency")
+        rows = portfolios_res.result_set if portfolios_res and portfolios_res.result_set else []
+        if owner_filter:
+            self._drop(owner_filter)
+        else:
+            self.books.clear()
+            self.holders.clear()
+            self.global_version = self.redis_client.get(GLOBAL_LEDGER_VERSION_KEY)
+
+        fx_cache = {}
+        for owner, name, currency in rows:
+            if self.owners and owner not in self.owners:
+                continue
+            book = PortfolioBook(owner, name, currency or "USD")
+            holdings_res = self.query_falkor(
+                f"MATCH (p:Portfolio {{owner: '{owner}'}})-[r:HOLDS]->(a:Asset) "
+                f"RETURN a.ticker, a.value, r.denomination"
+            )
+            holdings = holdings_res.result_set if holdings_res and holdings_res.result_set else []
+            # All ledger hashes of the owner in one round trip
+            pipe = self.redis_client.pipeline(transaction=False)
+            for ticker, _, _ in holdings:
+                pipe.hgetall(f"irm:portfolio:{owner}:holdings:{ticker}")
+            pipe.get(LEDGER_VERSION_KEY.format(owner=owner))
+            ledgers = pipe.execute()
+            self.versions[owner] = ledgers.pop()
+
+            for (ticker, price, edge_denom), ledger in zip(holdings, ledgers):
+                denomination = edge_denom or ledger.get('denomination', book.currency)
+                book.add(ticker, float(ledger.get('shares', 0.0)), float(ledger.get('avg_cost', 0.0)),
+                         denomination, float(price or 0.0))
+            if book.multi_currency:
+                if book.currency not in fx_cache:
+                    fx_cache[book.currency] = get_fx_rates(self.graph, book.currency)
+                book.set_fx(dict(fx_cache[book.currency]))
+            else:
+                book.set_fx({book.currency: 1.0})
+
+            self.books[owner] = book
+            for ticker in book.holdings:
+                self.holders.setdefault(ticker, set()).add(owner)
+        return [r[0] for r in rows if not self.owners or r[0] in self.owners]
+
+    def _drop(self, owner):
+        book = self.books.pop(owner, None)
+        for ticker in (book.holdings if book else ()):
+            self.holders.get(ticker, set()).discard(owner)
+
+    # ---- incremental updates ----
+    def apply(self, events):
+        """Apply asset change events; returns {owner: {changed tickers}} (empty set: totals only)."""
+        touched = {}
+        fx_moved = False
+        for event in events:
+            ticker, price = event.get("ticker"), event.get("value")
+            for owner in self.holders.get(ticker, ()):
+                if self.books[owner].reprice(ticker, float(price) if price is not None else None):
+                    touched.setdefault(owner, set()).add(ticker)
+            fx_moved = fx_moved or ticker in FX_TICKERS
+        if fx_moved:
+            # The graph already holds the new FX value; re-convert owners with foreign slots
+            fx_cache = {}
+            for owner, book in self.books.items():
+                if book.multi_currency:
+                    if book.currency not in fx_cache:
+                        fx_cache[book.currency] = get_fx_rates(self.graph, book.currency)
+                    book.set_fx(dict(fx_cache[book.currency]))
+                    touched.setdefault(owner, set())
+        return touched
+
+    def changed_owners(self, check_graph=False):
+        """
+        (owners to revalue, owners removed). Ledger versions come from one MGET; the set of
+        Portfolio owners is re-read when the global ledger version moved or check_graph is set.
+        """
+        owners = list(self.books)
+        current = self.redis_client.mget([GLOBAL_LEDGER_VERSION_KEY] +
+                                         [LEDGER_VERSION_KEY.format(owner=o) for o in owners])
+        global_version, current = current[0], current[1:]
+        stale = [o for o, v in zip(owners, current) if v != self.versions.get(o)]
+        removed = []
+        if check_graph or global_version != self.global_version:
+            self.global_version = global_version
+            res = self.query_falkor("MATCH (p:Portfolio) RETURN p.owner")
+            if res is not None:
+                present = {row[0] for row in res.result_set or []}
+                if self.owners:
+                    present &= self.owners
+                stale += sorted(present - set(owners))
+                removed = [o for o in owners if o not in present]
+        return stale, removed
+
+    def publish(self, owner, tickers=None, reason="tick"):
+        book = self.books.get(owner)
+        if not book:
+            return
+        snap = book.snapshot(tickers)
+        self.redis_client.xadd(PNL_STREAM_KEY.format(owner=owner), {
+            "ts": f"{time.time():.3f}", "reason": reason, "snapshot": json.dumps(snap, separators=(",", ":"))
+        }, maxlen=PNL_STREAM_MAXLEN, approximate=True)
+
+    def follow(self, block_ms=BLOCK_MS):
+        """Consume asset changes forever, publishing per-owner snapshots."""
+        # Start from the current end of the stream; events racing the load are re-applied
+        # harmlessly because they carry absolute prices
+        last = self.redis_client.xrevrange(ASSET_CHANGES_STREAM, count=1)
+        last_id = last[0][0] if last else "0-0"
+        for owner in self.load():
+            self.publish(owner, reason="load")
+        loaded_at = owners_checked_at = time.monotonic()
+        logger.info(f"Following {ASSET_CHANGES_STREAM} for {len(self.books)} portfolio(s) from {last_id}.")
+
+        while True:
+            response = self.redis_client.xread({ASSET_CHANGES_STREAM: last_id}, count=100, block=block_ms)
+            touched = {}
+            for _, entries in response or []:
+                for entry_id, fields in entries:
+                    last_id = entry_id
+                    _, _, events = parse_entry(fields)
+                    for owner, tickers in self.apply(events).items():
+                        touched.setdefault(owner, set()).update(tickers)
+            for owner, tickers in touched.items():
+                self.publish(owner, sorted(tickers))
+            if touched:
+                logger.info(f"Published PnL for {len(touched)} portfolio(s).")
+
+            if time.monotonic() - loaded_at >= RELOAD_S:
+                for owner in self.load():
+                    self.publish(owner, reason="reload")
+                loaded_at = owners_checked_at = time.monotonic()
+                continue
+            check_graph = time.monotonic() - owners_checked_at >= OWNERS_CHECK_S
+            if check_graph:
+                owners_checked_at = time.monotonic()
+            stale, removed = self.changed_owners(check_graph)
+            for owner in removed:
+                logger.info(f"Portfolio {owner} removed; no longer following it.")
+                self._drop(owner)
+            for owner in stale:
+                logger.info(f"Ledger of {owner} changed; revaluing.")
+                if owner in self.load(owner_filter=owner):
+                    self.publish(owner, reason="ledger")
+                else:
+                    self._drop(owner)
+
+
+def print_pnl(snap):
+    ccy = snap["currency"]
+    width = 100
+    print("\n" + "=" * width)
+    print(f" PORTFOLIO PNL: {snap['owner']} (Base Currency: {ccy})")
+    print("=" * width)
+    pct = f" ({snap['upl_pct'] * 100:+.2f}%)" if snap["upl_pct"] is not None else ""
+    print(f" NAV: {snap['nav']:,.2f} {ccy}   Cost: {snap['cost']:,.2f} {ccy}   Unrealized: {snap['upl']:+,.2f} {ccy}{pct}")
+    multi = len(snap["slots"]) > 1
+    for denom in sorted(snap["slots"], key=lambda d: (d != ccy, d)):
+        slot = snap["slots"][denom]
+        if multi:
+            print(f"\n [{denom} Slot]  value {slot['value']:,.2f} {denom}, unrealized {slot['upl']:+,.2f} {denom} "
+                  f"(x {slot['fx']:.6f} {ccy})")
+        print("-" * width)
+        print(f"{'TICKER':<10} | {'SHARES':>12} | {'AVG COST':>12} | {'PRICE':>12} | {'VALUE':>14} | "
+              f"{'UNREALIZED':>14} | {'PNL %':>8}")
+        print("-" * width)
+        for ticker, h in sorted(snap["holdings"].items()):
+            if h["denomination"] != denom:
+                continue
+            upl_pct = f"{h['upl_pct'] * 100:>+7.2f}%" if h["upl_pct"] is not None else f"{'-':>8}"
+            print(f"{ticker:<10} | {h['shares']:>12.2f} | {h['avg_cost']:>12.2f} | {h['price']:>12.4f} | "
+                  f"{h['value']:>14,.2f} | {h['upl']:>+14,.2f} | {upl_pct}")
+    print("=" * width + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live portfolio NAV and unrealized PnL")
+    parser.add_argument("--owner", default=None, help="Only this portfolio owner (default: all)")
+    parser.add_argument("--follow", action="store_true",
+                        help=f"Keep consuming {ASSET_CHANGES_STREAM} and publish snapshots to "
+                             f"{PNL_STREAM_KEY.format(owner='<owner>')}")
+    parser.add_argument("--json", action="store_true", help="Print snapshots as JSON")
+    args = parser.parse_args()
+
+    stream = PortfolioPnLStream(owners=[args.owner] if args.owner else None)
+    if not stream.graph or not stream.redis_client:
+        sys.exit(1)
+    if args.follow:
+        try:
+            stream.follow()
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    owners = stream.load(owner_filter=args.owner)
+    if not owners:
+        print(f"[!] No portfolio found{f' for {args.owner}' if args.owner else ''}.")
+        sys.exit(1)
+    snapshots = [stream.books[o].snapshot() for o in owners]
+    if args.json:
+        print(json.dumps({"as_of": datetime.now().isoformat(timespec="seconds"), "portfolios": snapshots},
+                         ensure_ascii=False, indent=2))
+    else:
+        for snap in snapshots:
+            print_pnl(snap)
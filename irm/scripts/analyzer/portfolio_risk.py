@@ -0,0 +1,279 @@
+import argparse
+import hashlib
+import json
+import logging
+import sys
+from datetime import datetime
+from pathlib import Path
+from statistics import NormalDist
+import numpy as np
+
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.analyzer.update_weights import get_fx_rates
+from scripts.common.db import get_graph, get_redis, hgetall_many, query
+from scripts.providers.returns import ReturnPanelCache, load_return_panel
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# One EWMA state per ticker set (hash of the sorted tickers), so runs for different
+# owners / books do not rebuild and overwrite each other's state. "pct": every ticker in
+# percent returns (earlier states mixed in point changes of rate / volatility holdings)
+EWMA_STATE_KEY = "irm:risk:ewma:D:pct:{digest}"
+# Abandoned ticker sets expire instead of accumulating
+EWMA_STATE_TTL = 30 * 86400
+
+
+def ewma_state_key(tickers):
+    return EWMA_STATE_KEY.format(digest=hashlib.sha1("|".join(sorted(tickers)).encode()).hexdigest()[:16])
+
+
+class PortfolioRiskEngine:
+    """
+    Empirical 1-day risk for every Portfolio: historical and EWMA-parametric VaR/CVaR plus
+    max drawdown, computed on a cached daily return panel of the held tickers.
+
+    Uses the same FX conversion (update_weights.get_fx_rates) and ledger as the weight
+    updater, so position values match the NAV written by update_all_portfolios.
+    """
+
+    def __init__(self, graph_name="Graph-001", lookback=750, ewma_lambda=0.94, refresh_after=12 * 3600):
+        self.graph_name = graph_name
+        self.lookback = lookback
+        self.ewma_lambda = ewma_lambda
+        self.refresh_after = refresh_after
+        try:
+            self.graph = get_graph(graph_name)
+            self.redis_client = get_redis()
+        except Exception as e:
+            logger.error(f"Initialization Failed: {e}")
+            self.graph = None
+            self.redis_client = None
+
+    def query_falkor(self, cypher):
+        return query(self.graph, cypher)
+
+    def load_positions(self, owner_filter=None):
+        """Return {owner: {"currency", "nav", "values": {ticker: base_ccy_value}}} from graph + Redis ledger."""
+        where = f" WHERE p.owner = '{owner_filter}'" if owner_filter else ""
+        portfolios_res = self.query_falkor(f"MATCH (p:Portfolio){where} RETURN p.owner, p.currency")
+        if not portfolios_res or not portfolios_res.result_set:
+            return {}
+
+        positions = {}
+        fx_cache = {}
+        for owner, currency in portfolios_res.result_set:
+            base_currency = currency or "USD"
+            holdings_res = self.query_falkor(
+                f"MATCH (p:Portfolio {{owner: '{owner}'}})-[r:HOLDS]->(a:Asset) "
+                f"RETURN a.ticker, a.value, r.denomination"
+            )
+            if not holdings_res or not holdings_res.result_set:
+                continue
+
+            if base_currency not in fx_cache:
+                fx_cache[base_currency] = get_fx_rates(self.graph, base_currency)
+            fx_rates = fx_cache[base_currency]
+
+            values = {}
+            ledgers = hgetall_many(self.redis_client,
+                                   [f"irm:portfolio:{owner}:holdings:{row[0]}" for row in holdings_res.result_set])
+            for (ticker, price, edge_denom), redis_data in zip(holdings_res.result_set, ledgers):
+                shares = float(redis_data.get('shares', 0.0))
+                denomination = edge_denom or redis_data.get('denomination', base_currency)
+                values[ticker] = float(price or 0.0) * shares * fx_rates.get(denomination, 1.0)
+
+            nav = sum(values.values())
+            if nav > 0:
+                positions[owner] = {"currency": base_currency, "nav": nav, "values": values}
+        return positions
+
+    def load_panel(self, tickers):
+        """
+        Daily return panel for tickers, incrementally refreshed in Redis. Every holding is
+        priced in percent changes, including rate / volatility metric types that the beta
+        panels express in points, so weighted portfolio returns stay in one unit.
+        """
+        asset_config = {t: json.loads(v) for t, v in self.redis_client.hgetall("irm:config:sources").items()}
+        metric_res = self.query_falkor(
+            f"MATCH (a:Asset) WHERE a.ticker IN {json.dumps(list(tickers))} RETURN a.ticker, a.metric_type"
+        )
+        metric_types = {row[0]: row[1] for row in metric_res.result_set} if metric_res else {}
+        cache = ReturnPanelCache(self.redis_client, freq="D")
+        return load_return_panel(sorted(tickers), metric_types, asset_config, cache,
+                                 refresh_after=self.refresh_after, percent=True)
+
+    def ewma_covariance(self, panel):
+        """
+        RiskMetrics EWMA covariance of the panel, updated incrementally from the state
+        stored in Redis: only bars after the stored as-of date are folded in.
+
+        Missing bars (holidays, different exchange calendars) are masked per pair rather
+        than counted as 0% returns: each pair keeps its decayed weighted cross-product S
+        and the decayed weight W of the bars where both tickers traded, and cov = S / W.
+        """
+        tickers = list(panel.columns)
+        values = panel.to_numpy(dtype=float)
+        observed = (~np.isnan(values)).astype(float)
+        x = np.nan_to_num(values)
+        dates = [d.strftime('%Y-%m-%d') for d in panel.index]
+        lam = self.ewma_lambda
+        key = ewma_state_key(tickers)
+
+        state_raw = self.redis_client.get(key)
+        state = json.loads(state_raw) if state_raw else None
+        if state and state.get("tickers") == tickers and state.get("lambda") == lam and state.get("asof") in dates:
+            s_mat, w_mat = np.array(state["s"], dtype=float), np.array(state["w"], dtype=float)
+            start = dates.index(state["asof"]) + 1
+            for r, m in zip(x[start:], observed[start:]):
+                s_mat = lam * s_mat + (1.0 - lam) * np.outer(r, r)
+                w_mat = lam * w_mat + (1.0 - lam) * np.outer(m, m)
+            logger.info(f"EWMA covariance: folded {len(x) - start} new bar(s) into stored state.")
+        else:
+            # Full rebuild: weights (1 - lambda) * lambda^(T-1-k), newest bar weighs most
+            w = (1.0 - lam) * lam ** np.arange(len(x) - 1, -1, -1)
+            s_mat = (x * w[:, None]).T @ x
+            w_mat = (observed * w[:, None]).T @ observed
+            logger.info(f"EWMA covariance: rebuilt from {len(x)} bars for {len(tickers)} tickers.")
+
+        if dates:
+            self.redis_client.set(key, json.dumps({
+                "tickers": tickers, "lambda": lam, "asof": dates[-1],
+                "s": s_mat.round(10).tolist(), "w": w_mat.round(12).tolist()
+            }, separators=(",", ":")), ex=EWMA_STATE_TTL)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(w_mat > 0, s_mat / np.where(w_mat > 0, w_mat, 1.0), 0.0)
+
+    def compute(self, positions, panel, confidences=(0.95, 0.99)):
+        """
+        Vectorized risk over all owners at once.
+
+        :return: {owner: metrics} with VaR/CVaR expressed as positive percent-of-NAV losses.
+        """
+        owners = list(positions.keys())
+        tickers = list(panel.columns)
+        col = {t: j for j, t in enumerate(tickers)}
+
+        # Owner x ticker weight matrix (only tickers with return history carry weight)
+        weights = np.zeros((len(owners), len(tickers)))
+        coverage = np.zeros(len(owners))
+        for i, owner in enumerate(owners):
+            pos = positions[owner]
+            for ticker, value in pos["values"].items():
+                if ticker in col:
+                    weights[i, col[ticker]] = value / pos["nav"]
+            coverage[i] = weights[i].sum()
+
+        cov = self.ewma_covariance(panel)
+        hist = panel.to_numpy(dtype=float)[-self.lookback:]
+        # A day counts for an owner only when every held ticker has a bar (no 0% fill-ins)
+        valid = (np.isnan(hist).astype(float) @ (weights.T != 0)) == 0     # (T, owners)
+        port = np.where(valid, np.nan_to_num(hist) @ weights.T, np.nan)    # daily portfolio returns in %
+        ewma_sigma = np.sqrt(np.maximum(np.einsum('ij,jk,ik->i', weights, cov, weights), 0.0))
+
+        # Max drawdown of the current book replayed over history (skipped days leave wealth unchanged)
+        wealth = np.cumprod(1.0 + np.nan_to_num(port) / 100.0, axis=0)
+        drawdown = wealth / np.maximum.accumulate(wealth, axis=0) - 1.0
+        max_dd = -drawdown.min(axis=0) * 100.0 if len(port) else np.zeros(len(owners))
+
+        results = {}
+        for i, owner in enumerate(owners):
+            metrics = {
+                "currency": positions[owner]["currency"],
+                "nav": round(positions[owner]["nav"], 2),
+                "coverage": round(float(coverage[i]), 4),
+                "observations": int(valid[:, i].sum()),
+                "max_drawdown": round(float(max_dd[i]), 4),
+                "ewma_vol": round(float(ewma_sigma[i]), 4)
+            }
+            for c in confidences:
+                tag = f"{int(round(c * 100))}"
+                series = port[valid[:, i], i]
+                if len(series):
+                    var = -np.quantile(series, 1.0 - c)
+                    tail = series[series <= -var]
+                    cvar = -tail.mean() if len(tail) else var
+                else:
+                    var = cvar = 0.0
+                z = NormalDist().inv_cdf(c)
+                metrics[f"var_{tag}"] = round(float(var), 4)
+                metrics[f"cvar_{tag}"] = round(float(cvar), 4)
+                metrics[f"ewma_var_{tag}"] = round(float(z * ewma_sigma[i]), 4)
+                metrics[f"ewma_cvar_{tag}"] = round(float(ewma_sigma[i] * NormalDist().pdf(z) / (1.0 - c)), 4)
+            results[owner] = metrics
+        return results
+
+    def write_back(self, results):
+        """Persist risk metrics onto each Portfolio node for other tools to read."""
+        stamp = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+        for owner, m in results.items():
+            props = [f"p.risk_{k} = {v}" for k, v in m.items() if k.startswith(("var_", "cvar_", "ewma_"))]
+            props.append(f"p.risk_max_drawdown = {m['max_drawdown']}")
+            props.append(f"p.risk_coverage = {m['coverage']}")
+            props.append(f"p.risk_updated_at = '{stamp}'")
+            self.query_falkor(f"MATCH (p:Portfolio {{owner: '{owner}'}}) SET {', '.join(props)}")
+
+    def run(self, owner=None, confidences=(0.95, 0.99), write=True):
+        if not self.graph or not self.redis_client:
+            return {}
+        positions = self.load_positions(owner)
+        if not positions:
+            logger.warning("No valued portfolios found.")
+            return {}
+
+        tickers = set().union(*[set(p["values"].keys()) for p in positions.values()])
+        panel = self.load_panel(tickers)
+        if panel.empty:
+            logger.warning("No return history available for held tickers.")
+            return {}
+
+        results = self.compute(positions, panel, confidences)
+        if write:
+            self.write_back(results)
+        return results
+
+
+def print_risk_report(results, confidences):
+    width = 78
+    for owner, m in results.items():
+        print("\n" + "=" * width)
+        print(f" PORTFOLIO RISK: {owner} (1-day, {m['observations']} obs, NAV {m['nav']:,.2f} {m['currency']})")
+        print("=" * width)
+        print(f"{'Confidence':<12} | {'Hist VaR':>10} | {'Hist CVaR':>10} | {'EWMA VaR':>10} | {'EWMA CVaR':>10} | {'VaR Amount':>12}")
+        print("-" * width)
+        for c in confidences:
+            tag = f"{int(round(c * 100))}"
+            amount = m['nav'] * m[f'var_{tag}'] / 100.0
+            print(f"{tag + '%':<12} | {m[f'var_{tag}']:>9.2f}% | {m[f'cvar_{tag}']:>9.2f}% | "
+                  f"{m[f'ewma_var_{tag}']:>9.2f}% | {m[f'ewma_cvar_{tag}']:>9.2f}% | {amount:>12,.2f}")
+        print("-" * width)
+        print(f" Max Drawdown (current book replayed): {m['max_drawdown']:.2f}% | EWMA Daily Vol: {m['ewma_vol']:.2f}%")
+        if m['coverage'] < 0.999:
+            print(f" [!] Return history covers {m['coverage']*100:.1f}% of NAV; uncovered holdings are excluded.")
+        print("=" * width)
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IRM Portfolio Risk (Historical / EWMA VaR & CVaR)")
+    parser.add_argument("--owner", default=None, help="Portfolio owner (default: all portfolios)")
+    parser.add_argument("--confidence", type=float, nargs="+", default=[0.95, 0.99], help="Confidence levels (default 0.95 0.99)")
+    parser.add_argument("--lookback", type=int, default=750, help="Historical window in trading days (default 750)")
+    parser.add_argument("--lam", type=float, default=0.94, help="EWMA decay lambda (default 0.94)")
+    parser.add_argument("--no-write", action="store_true", help="Do not write metrics back to Portfolio nodes")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    engine = PortfolioRiskEngine(lookback=args.lookback, ewma_lambda=args.lam)
+    results = engine.run(owner=args.owner, confidences=tuple(args.confidence), write=not args.no_write)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    elif results:
+        print_risk_report(results, args.confidence)
+    else:
+        print("[!] No risk results computed. Check holdings and source configuration.")
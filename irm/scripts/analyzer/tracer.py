@@ -1,26 +1,28 @@
 import json
 import argparse
-import os
-from urllib.parse import urlparse
-from falkordb import FalkorDB
+import sys
+from pathlib import Path
+
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.common.db import get_graph, get_redis, hgetall_many, redis_address
 
 class IRMTracer:
     def __init__(self, graph_name="Graph-001"):
         self.graph_name = graph_name
         self.decay_factor = 0.8  # Dn: Distance Decay
         
-        # Priority: REDIS_URL env var > default
-        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-        parsed = urlparse(redis_url)
-        host = parsed.hostname or "localhost"
-        port = parsed.port or 6379
-        
         try:
-            self.db = FalkorDB(host=host, port=port)
-            self.graph = self.db.select_graph(graph_name)
+            self.graph = get_graph(graph_name)
+            self.redis_client = get_redis()
         except Exception as e:
+            host, port = redis_address()
             print(f"[!] Failed to connect to FalkorDB at {host}:{port}: {e}")
             self.graph = None
+            self.redis_client = None
 
     def _query_falkor(self, cypher):
         """Execute Cypher query via falkordb-python."""
@@ -50,19 +52,15 @@ class IRMTracer:
         if not result or not result.result_set:
             return portfolio
 
-        import redis
-        host = self.db.connection.connection_pool.connection_kwargs.get('host', 'localhost')
-        port = self.db.connection.connection_pool.connection_kwargs.get('port', 6379)
-        r_client = redis.Redis(host=host, port=port, decode_responses=True)
+        # All ledger hashes in one round trip on the shared pool
+        rows = [row for row in result.result_set if (row[0] or "").strip()]
+        ledgers = hgetall_many(self.redis_client,
+                               [f"irm:portfolio:{owner}:holdings:{row[0].strip().upper()}" for row in rows])
 
-        for row in result.result_set:
+        for row, redis_data in zip(rows, ledgers):
             try:
-                ticker = (row[0] or "").strip().upper()
-                if not ticker: continue
-                
-                redis_key = f"irm:portfolio:{owner}:holdings:{ticker}"
-                redis_data = r_client.hgetall(redis_key)
-                
+                ticker = row[0].strip().upper()
+
                 # Denomination priority: edge attribute > Redis > base_currency
                 edge_denom = row[2] if len(row) > 2 and row[2] else None
                 denomination = edge_denom or redis_data.get('denomination', base_currency)
@@ -83,7 +81,7 @@ class IRMTracer:
             f"MATCH (n)-[r]->(m) WHERE toUpper(COALESCE(n.ticker, n.name)) = '{ticker.upper()}' "
             f"RETURN COALESCE(m.ticker, m.name), type(r), r.base_beta, r.gamma_sensitive, "
             f"r.state_trigger, labels(m)[0], m.percentile, r.modifier_metric, r.threshold_config, n.percentile, "
-            f"m.pe_percentile, m.erp_percentile, r.id"
+            f"m.pe_percentile, m.erp_percentile, r.id, r.regime_betas"
         )
         result = self._query_falkor(cypher)
         
@@ -106,7 +104,8 @@ class IRMTracer:
                     "source_percentile": float(row[9]) if (len(row) > 9 and row[9] is not None) else None,
                     "target_pe_percentile": float(row[10]) if (len(row) > 10 and row[10] is not None) else None,
                     "target_erp_percentile": float(row[11]) if (len(row) > 11 and row[11] is not None) else None,
-                    "id": row[12] if len(row) > 12 else None
+                    "id": row[12] if len(row) > 12 else None,
+                    "regime_betas": row[13] if len(row) > 13 else None
                 })
             except (ValueError, IndexError, TypeError):
                 continue
@@ -142,24 +141,47 @@ class IRMTracer:
             
         return 1.0
 
-    def trace_impact(self, start_ticker, initial_delta, current_vix=20, target_ticker=None, source_delta_pct=None):
+    def _regime_beta(self, regime_betas_str, vix):
+        """
+        Empirical beta of the VIX bucket containing `vix`, from the `regime_betas` edge
+        property written by calc_betas.py. Returns None when the bucket has no
+        significant estimate (p >= 0.1) so the caller falls back to the gamma ramp.
+        """
+        if not regime_betas_str:
+            return None
+        try:
+            for bucket in json.loads(regime_betas_str):
+                if bucket.get("min", -float('inf')) <= vix < bucket.get("max", float('inf')):
+                    if bucket.get("p", 1.0) < 0.1:
+                        return float(bucket["beta"])
+                    return None
+        except Exception:
+            pass
+        return None
+
+    def trace_impact(self, start_ticker, initial_delta, current_vix=20, target_ticker=None, source_delta_pct=None, verbose=True,
+                     use_regime_betas=False):
         """
         Trace the impact with dynamic state modifiers.
         Formula: Impact = Source_Delta * (Beta * Mu(Path, State) * Gamma) * Decay
         
         If target_ticker is specified, only paths reaching that target are printed.
         source_delta_pct is used for heuristic percentile adjustment on the source node.
+        verbose=False suppresses step printing (e.g. for JSON output).
+        use_regime_betas=True replaces Beta * Gamma with the measured beta of the current
+        VIX bucket on edges that carry one (gamma is then 1.0).
         """
 
         # Queue stores: (current_ticker, incoming_impact, depth, path_string)
         queue = [(start_ticker, float(initial_delta), 0, start_ticker)]
         results = []
 
-        print(f"[*] Starting Trace: {start_ticker} with Delta: {initial_delta}%")
-        if target_ticker:
-            print(f"[*] Target Filter: evaluating impact on {target_ticker}")
-        print(f"[*] Market Context - Base VIX: {current_vix}")
-        print("-" * 60)
+        if verbose:
+            print(f"[*] Starting Trace: {start_ticker} with Delta: {initial_delta}%")
+            if target_ticker:
+                print(f"[*] Target Filter: evaluating impact on {target_ticker}")
+            print(f"[*] Market Context - Base VIX: {current_vix}")
+            print("-" * 60)
 
         while queue:
             current_ticker, incoming_impact, depth, path_str = queue.pop(0)
@@ -190,6 +212,12 @@ class IRMTracer:
                     else:
                         gamma = 3.0
                     gamma = round(gamma, 2)
+
+                # 2b. Measured regime beta supersedes the synthetic ramp where available
+                regime_beta = self._regime_beta(n.get('regime_betas'), current_vix) if use_regime_betas else None
+                if regime_beta is not None:
+                    beta = regime_beta
+                    gamma = 1.0
                 
                 # Routing logic for different modifier metrics
                 metric = n['modifier_metric']
@@ -236,13 +264,13 @@ class IRMTracer:
                     "step_impact": round(impact, 4),
                     "depth": depth + 1,
                     "path": new_path_str,
-                    "logic": f"Beta:{beta} * Mu:{mu} * Gamma:{gamma} * Decay:{d_factor}",
+                    "logic": f"{'RegimeBeta' if regime_beta is not None else 'Beta'}:{beta} * Mu:{mu} * Gamma:{gamma} * Decay:{d_factor}",
                     "edge_id": n.get('id')
                 }
                 results.append(path_info)
                 
                 # Print step (if --target is set, only print steps on paths toward the target)
-                if not target_ticker or target.upper() == target_ticker.upper() or self._can_reach_target(target, target_ticker):
+                if verbose and (not target_ticker or target.upper() == target_ticker.upper() or self._can_reach_target(target, target_ticker)):
                     print(f"[{depth+1}] {new_path_str} ({n['rel_type']} ID:{n.get('id')}): {round(impact, 4)}%  ({n['label']})")
 
                 # Continue traversal if impact is still significant
@@ -251,6 +279,24 @@ class IRMTracer:
 
         return results
 
+    def aggregate_portfolio_impacts(self, impacts, portfolio, source_ticker, source_delta_val):
+        """Sum path impacts per held asset (additive across parallel transmission channels)."""
+        # We use an 'Additive' approach for parallel paths from the same source event
+        # to capture the cumulative effect of different transmission channels (e.g. Davis Double Play).
+        summary_impacts = {asset.upper(): 0.0 for asset in portfolio}
+
+        # [FIX] Normalize source ticker check
+        source_ticker_upper = source_ticker.strip().upper()
+        if source_ticker_upper in summary_impacts:
+            summary_impacts[source_ticker_upper] = source_delta_val
+
+        for imp in impacts:
+            target = (imp['to'] or "").strip().upper()
+            if target in summary_impacts:
+                # Additive aggregation
+                summary_impacts[target] += imp['step_impact']
+        return summary_impacts
+
     def _can_reach_target(self, current_ticker, target_ticker, max_depth=5):
         """Check if a path exists from current_ticker to target_ticker within max_depth hops."""
         cypher = (
@@ -325,8 +371,16 @@ if __name__ == "__main__":
     parser.add_argument("--owner", type=str, default="Admin", help="Portfolio Owner")
     parser.add_argument("--target", type=str, default=None, help="Target node ticker to evaluate impact on (e.g., NVDA)")
     parser.add_argument("--vix", type=float, default=None, help="Override VIX value for Gamma calculation (e.g., 35)")
+    parser.add_argument("--regime-betas", action="store_true",
+                        help="Use measured per-VIX-bucket betas (calc_betas) instead of the synthetic gamma ramp where available")
+    parser.add_argument("--advise", action="store_true",
+                        help="Feed the portfolio impact vector straight into the Kelly advisor (single process)")
+    parser.add_argument("--fraction", type=float, default=0.5, help="Kelly fraction for --advise (default 0.5)")
+    parser.add_argument("--json", action="store_true", help="Print one combined JSON report instead of text")
     
     args = parser.parse_args()
+    # In JSON mode all narration is suppressed; only the final report is printed
+    say = (lambda *a, **k: None) if args.json else print
     
     tracer = IRMTracer()
     
@@ -336,7 +390,7 @@ if __name__ == "__main__":
     # 3. Dynamically Load Portfolio (needed for portfolio summary mode)
     portfolio = tracer.get_portfolio_assets(owner=args.owner)
     if not portfolio:
-         print(f"[!] Warning: Portfolio for '{args.owner}' not found or empty.")
+         say(f"[!] Warning: Portfolio for '{args.owner}' not found or empty.")
          portfolio_assets = []
     else:
          portfolio_assets = list(portfolio.keys())
@@ -352,33 +406,82 @@ if __name__ == "__main__":
         
         if m_type in ['rate', 'volatility'] and cur_val is not None:
             source_delta_val = float(cur_val) * (args.delta / 100.0)
-            print(f"[*] Metric Correction: Converting {args.delta}% relative shock to {round(source_delta_val, 4)} absolute point change (Source: {m_type})")
+            say(f"[*] Metric Correction: Converting {args.delta}% relative shock to {round(source_delta_val, 4)} absolute point change (Source: {m_type})")
 
     # 5. Determine effective VIX (Event-Forward Estimation)
     #    The event itself may induce panic — we estimate VIX movement
     #    through graph propagation BEFORE running the main trace.
     if args.vix is not None:
         effective_vix = args.vix
-        print(f"[*] VIX Override: Using user-specified VIX={effective_vix}")
+        say(f"[*] VIX Override: Using user-specified VIX={effective_vix}")
     elif args.ticker.upper() == "VIX":
         effective_vix = base_vix * (1 + args.delta / 100.0)
-        print(f"[*] VIX Direct Shock: {base_vix:.1f} → {effective_vix:.1f}")
+        say(f"[*] VIX Direct Shock: {base_vix:.1f} → {effective_vix:.1f}")
     else:
         vix_delta = tracer.estimate_vix_impact(args.ticker, source_delta_val)
         if abs(vix_delta) > 0.01:
             effective_vix = max(10.0, base_vix + vix_delta)
-            print(f"[*] VIX Forward Estimate: {base_vix:.1f} → {effective_vix:.1f} (Event-induced delta: {vix_delta:+.2f})")
+            say(f"[*] VIX Forward Estimate: {base_vix:.1f} → {effective_vix:.1f} (Event-induced delta: {vix_delta:+.2f})")
         else:
             effective_vix = base_vix
 
     # 6. Run main trace with event-adjusted VIX
+    if args.regime_betas:
+        say("[*] Regime betas: measured per-VIX-bucket betas replace the gamma ramp where available")
     impacts = tracer.trace_impact(
         args.ticker, source_delta_val, current_vix=effective_vix,
-        target_ticker=args.target, source_delta_pct=args.delta
+        target_ticker=args.target, source_delta_pct=args.delta, verbose=not args.json,
+        use_regime_betas=args.regime_betas
     )
+    summary_impacts = tracer.aggregate_portfolio_impacts(impacts, portfolio_assets, args.ticker, source_delta_val)
+
+    # 7. Optional in-process Kelly advice: reuse the trace's graph connection and loaded portfolio
+    advice = None
+    if args.advise and portfolio:
+        from scripts.analyzer.portfolio_advisor import KellyAdvisor, print_advice_table
+
+        advisor = KellyAdvisor(kelly_fraction=args.fraction, graph_name=tracer.graph_name, graph=tracer.graph)
+        weights = {t: {"weight": h["weight"], "denomination": h.get("denomination", "USD")} for t, h in portfolio.items()}
+        advice = advisor.advise(summary_impacts, weights, advisor.fetch_assumptions(portfolio_assets))
+
+    if args.json:
+        holdings = {}
+        for asset in portfolio_assets:
+            weight = portfolio[asset]['weight']
+            total_imp = summary_impacts.get(asset, 0.0)
+            holdings[asset] = {
+                "weight": weight,
+                "denomination": portfolio[asset].get('denomination', 'USD'),
+                "impact": round(total_imp, 4),
+                "weighted_pnl": round(total_imp * weight, 4)
+            }
+        report = {
+            "source": args.ticker,
+            "delta_pct": args.delta,
+            "source_delta": round(source_delta_val, 4),
+            "base_vix": base_vix,
+            "effective_vix": round(effective_vix, 2),
+            "regime_betas": args.regime_betas,
+            "owner": args.owner,
+            "portfolio": holdings,
+            "total_nav_shock": round(sum(h["weighted_pnl"] for h in holdings.values()), 4),
+            "paths": impacts
+        }
+        if args.target:
+            target_upper = args.target.strip().upper()
+            target_impacts = [imp for imp in impacts if (imp['to'] or '').strip().upper() == target_upper]
+            report["target"] = {
+                "ticker": target_upper,
+                "paths": len(target_impacts),
+                "total_impact": round(sum(imp['step_impact'] for imp in target_impacts), 4)
+            }
+        if args.advise:
+            report["advice"] = advice or []
+            report["kelly_fraction"] = args.fraction
+        print(json.dumps(report, ensure_ascii=False, indent=2))
     
     # ── MODE: Target-focused impact evaluation ──
-    if args.target:
+    elif args.target:
         target_upper = args.target.strip().upper()
         source_upper = args.ticker.strip().upper()
         
@@ -426,21 +529,6 @@ if __name__ == "__main__":
     else:
         print("\n" + "="*20 + " PORTFOLIO IMPACT SUMMARY " + "="*20)
         
-        # We use an 'Additive' approach for parallel paths from the same source event
-        # to capture the cumulative effect of different transmission channels (e.g. Davis Double Play).
-        summary_impacts = {asset.upper(): 0.0 for asset in portfolio_assets}
-        
-        # [FIX] Normalize source ticker check
-        source_ticker_upper = args.ticker.strip().upper()
-        if source_ticker_upper in summary_impacts:
-            summary_impacts[source_ticker_upper] = source_delta_val
-        
-        for imp in impacts:
-            target = (imp['to'] or "").strip().upper()
-            if target in summary_impacts:
-                # Additive aggregation
-                summary_impacts[target] += imp['step_impact']
-        
         # Group assets by denomination for multi-currency display
         denom_groups = {}
         for asset in portfolio_assets:
@@ -477,3 +565,8 @@ if __name__ == "__main__":
         port_color = "\033[91m" if total_portfolio_impact < -5 else "\033[93m" if total_portfolio_impact < 0 else "\033[92m" if total_portfolio_impact > 0 else "\033[0m"
         print(f"ESTIMATED TOTAL PORTFOLIO NAV SHOCK: {port_color}{total_portfolio_impact:>7.2f}%\033[0m")
         print("=" * 66)
+
+    if advice is not None and not args.json:
+        print_advice_table(advice, args.fraction, args.owner)
+    elif args.advise and not args.json:
+        print(f"[!] No holdings for '{args.owner}'; skipping Kelly advice.")
@@ -1,32 +1,82 @@
-import os
 import json
-import redis
 import logging
-from urllib.parse import urlparse
-from falkordb import FalkorDB
+import sys
+from pathlib import Path
+
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.analyzer.portfolio_history import PortfolioHistoryStore
+from scripts.common.db import get_falkordb, get_redis, redis_address, TimedGraph, query
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Common FX pair conventions: USD is usually the base in USDXXX pairs
+FX_PAIRS = [
+    # (ticker, from_ccy, to_ccy) - ticker value = how many to_ccy per 1 from_ccy
+    ("USDCNY", "USD", "CNY"),
+    ("USDJPY", "USD", "JPY"),
+    ("USDHKD", "USD", "HKD"),
+    ("USDKRW", "USD", "KRW"),
+    ("USDGBP", "USD", "GBP"),
+    ("USDEUR", "USD", "EUR"),
+    ("EURUSD", "EUR", "USD"),
+    ("GBPUSD", "GBP", "USD"),
+]
+
+
+def get_fx_rates(graph, base_currency):
+    """Fetch FX rates from graph (Asset:Macro:Currency nodes) relative to base_currency.
+    
+    Convention: A node like USDCNY with value=7.28 means 1 USD = 7.28 CNY.
+    Returns a dict mapping denomination -> multiplier to convert TO base_currency.
+    e.g. if base='USD': {'USD': 1.0, 'CNY': 0.1374, 'JPY': 0.0067, 'HKD': 0.128}
+    """
+    fx_rates = {base_currency: 1.0}
+
+    # All pair nodes in one round trip
+    res = query(graph, f"MATCH (fx:Asset) WHERE fx.ticker IN {json.dumps([t for t, _, _ in FX_PAIRS])} "
+                       f"RETURN fx.ticker, fx.value")
+    values = {row[0]: row[1] for row in (res.result_set if res and res.result_set else [])}
+    # We look for pairs where base_currency is involved
+    for ticker, from_ccy, to_ccy in FX_PAIRS:
+        if values.get(ticker) is not None:
+            rate = float(values[ticker])
+            if rate <= 0:
+                continue
+            # rate = how many to_ccy per 1 from_ccy
+            if from_ccy == base_currency:
+                # to convert to_ccy -> base: divide by rate
+                fx_rates[to_ccy] = 1.0 / rate
+            elif to_ccy == base_currency:
+                # to convert from_ccy -> base: multiply by rate
+                fx_rates[from_ccy] = rate
+
+    return fx_rates
+
+
 class PortfolioWeightUpdater:
-    def __init__(self, graph_name="Graph-001"):
+    def __init__(self, graph_name="Graph-001", db=None, redis_client=None):
         self.graph_name = graph_name
         
-        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-        parsed = urlparse(redis_url)
-        host = parsed.hostname or "localhost"
-        port = parsed.port or 6379
+        host, port = redis_address()
         
         try:
-            self.db = FalkorDB(host=host, port=port)
-            self.graph = self.db.select_graph(graph_name)
-            self.redis_client = redis.Redis(host=host, port=port, decode_responses=True)
+            # Shared pool unless the caller (refresh / price job) hands over its own clients
+            self.db = db or get_falkordb()
+            self.graph = TimedGraph(self.db.select_graph(graph_name))
+            self.redis_client = redis_client or get_redis()
+            self.history = PortfolioHistoryStore(self.redis_client)
             logger.info(f"Connected to FalkorDB and Redis at {host}:{port}")
         except Exception as e:
             logger.error(f"Initialization Failed: {e}")
             self.graph = None
             self.redis_client = None
+            self.history = None
 
     def query_falkor(self, cypher):
         if not self.graph:
@@ -38,43 +88,8 @@ class PortfolioWeightUpdater:
             return None
 
     def _get_fx_rates(self, base_currency):
-        """Fetch FX rates from graph (Asset:Macro:Currency nodes) relative to base_currency.
-        
-        Convention: A node like USDCNY with value=7.28 means 1 USD = 7.28 CNY.
-        Returns a dict mapping denomination -> multiplier to convert TO base_currency.
-        e.g. if base='USD': {'USD': 1.0, 'CNY': 0.1374, 'JPY': 0.0067, 'HKD': 0.128}
-        """
-        fx_rates = {base_currency: 1.0}
-        
-        # Common FX pair conventions: USD is usually the base in USDXXX pairs
-        # We look for pairs where base_currency is involved
-        fx_pairs = [
-            # (ticker, from_ccy, to_ccy) - ticker value = how many to_ccy per 1 from_ccy
-            ("USDCNY", "USD", "CNY"),
-            ("USDJPY", "USD", "JPY"),
-            ("USDHKD", "USD", "HKD"),
-            ("USDKRW", "USD", "KRW"),
-            ("USDGBP", "USD", "GBP"),
-            ("USDEUR", "USD", "EUR"),
-            ("EURUSD", "EUR", "USD"),
-            ("GBPUSD", "GBP", "USD"),
-        ]
-        
-        for ticker, from_ccy, to_ccy in fx_pairs:
-            res = self.query_falkor(f"MATCH (fx:Asset {{ticker: '{ticker}'}}) RETURN fx.value")
-            if res and res.result_set and res.result_set[0][0] is not None:
-                rate = float(res.result_set[0][0])
-                if rate <= 0:
-                    continue
-                # rate = how many to_ccy per 1 from_ccy
-                if from_ccy == base_currency:
-                    # to convert to_ccy -> base: divide by rate
-                    fx_rates[to_ccy] = 1.0 / rate
-                elif to_ccy == base_currency:
-                    # to convert from_ccy -> base: multiply by rate
-                    fx_rates[from_ccy] = rate
-        
-        return fx_rates
+        """FX multipliers to base_currency (see get_fx_rates)."""
+        return get_fx_rates(self.graph, base_currency)
 
     def update_all_portfolios(self):
         """Update total_value and weight_pct for all portfolios in the graph.
@@ -84,6 +99,7 @@ class PortfolioWeightUpdater:
         2. Calculate per-slot NAV in local currency
         3. Convert to base currency using FX rates from graph
         4. Compute global weight_pct in base currency terms
+        5. Append the revaluation to the NAV/weight history store
         """
         if not self.graph or not self.redis_client:
             return
@@ -167,9 +183,11 @@ class PortfolioWeightUpdater:
             self.query_falkor(f"MATCH (p:Portfolio {{owner: '{owner}'}}) SET p.total_value = {total_nav_base:.2f}")
 
             # 7. Update weight_pct on each HOLDS edge (global weight in base currency terms)
+            weights = {}
             for h in holdings_data:
                 fx = fx_rates.get(h["denomination"], 1.0)
                 global_weight = (h['market_value'] * fx) / total_nav_base
+                weights[h['ticker']] = global_weight
                 
                 update_rel_cypher = (
                     f"MATCH (p:Portfolio {{owner: '{owner}'}})-[r:HOLDS]->(a:Asset {{ticker: '{h['ticker']}'}}) "
@@ -178,6 +196,12 @@ class PortfolioWeightUpdater:
                 self.query_falkor(update_rel_cypher)
                 logger.debug(f"Updated {h['ticker']} weight to {global_weight*100:.2f}% (denom: {h['denomination']})")
 
+            # 8. Append snapshot to history (never blocks the weight sync)
+            try:
+                self.history.append(owner, total_nav_base, base_currency, weights)
+            except Exception as e:
+                logger.warning(f"Failed to append history snapshot for {owner}: {e}")
+
             logger.info(f"Successfully updated portfolio weights for {owner}.")
 
 if __name__ == "__main__":
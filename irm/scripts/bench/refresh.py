@@ -0,0 +1,489 @@
+"""
+End-to-end refresh benchmark (`irm bench refresh`).
+
+Seeds a synthetic ontology of increasing size (default 100 / 1k / 10k assets) into a
+*dedicated* FalkorDB / Redis instance and runs the refresh stages of `irm refresh`
+(prices, fundamentals, betas, earnings, valuation, weights) one after another against
+it, with every provider replaced by replayed fixtures (IRM_PROVIDER_OVERRIDE=replay).
+Fixtures are generated once from a fixed seed (factor-model prices, rates, VIX and
+fundamentals), so two commits benchmarked on the same day see identical data.
+
+Every size runs in its own process with fresh series / percentile / fundamentals
+caches. The first run is cold (full history, full beta state), later runs are warm
+(cache hits, incremental percentiles, change detection). Per stage it records:
+
+    wall_s / cpu_s         wall and process CPU time
+    graph_queries / _s     FalkorDB round trips and the time spent in them (Cypher)
+    redis_commands         other Redis commands (ledger, beta state, history)
+    provider_calls / _s    provider transport calls and their time (the "network"; summed over threads)
+    other_s                wall - graph_s - provider_s, i.e. pandas / Python (approximate)
+    peak_mb                peak traced Python allocation during the stage (tracemalloc)
+
+Reports are JSON and can be compared across commits with --compare.
+The target must not be the production instance: a Redis that holds the production
+graph or an unmarked `irm:config:sources` is refused unless --force is given.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+APP_ROOT = str(SCRIPTS_DIR.parent)
+
+DEFAULT_SIZES = [100, 1000, 10000]
+DEFAULT_URL = os.getenv("IRM_BENCH_REDIS_URL", "redis://127.0.0.1:6380")
+DEFAULT_WORKDIR = os.getenv("IRM_BENCH_DIR", "/tmp/irm-bench")
+BENCH_GRAPH = "IRM-Bench"
+PRODUCTION_GRAPH = "Graph-001"
+MARKER_KEY = "irm:bench:marker"
+SOURCES_KEY = "irm:config:sources"
+BETA_STATE_KEY = "irm:betas:state"
+
+REPLAY_SOURCE = "yfinance"
+FIXTURE_DAYS = 2700              # business days, covers the 10Y percentile window
+HUB_EVERY = 10                   # every 10th asset gets an Earnings and a Valuation hub
+HOLDINGS_PER_PORTFOLIO = 25
+ASSETS_PER_PORTFOLIO = 500
+EDGES_PER_ASSET = 2
+RELATIONS = ["DRIVES", "PRICES", "SPILLS_TO"]
+# Stage wall-time regressions below this absolute delta are noise
+NOISE_FLOOR_S = 0.05
+MARKER = "__IRM_BENCH__"
+
+
+# ---- synthetic universe ----
+def universe(count):
+    """[(ticker, metric_type)]; prefix-stable so every size is a subset of the largest one."""
+    assets = [("VIX", "volatility")]
+    for i in range(1, count):
+        assets.append((f"S{i:05d}", "rate" if i % 10 == 1 else "price"))
+    return assets
+
+
+def hub_targets(assets):
+    return [t for i, (t, m) in enumerate(assets) if m == "price" and i % HUB_EVERY == 5]
+
+
+def generate_fixtures(replay_dir, count, seed, end=None):
+    """Write replay fixtures for the first `count` assets (skipped when the manifest already covers them)."""
+    import numpy as np
+    import pandas as pd
+
+    end = end or datetime.now().strftime('%Y-%m-%d')
+    manifest_path = os.path.join(replay_dir, "manifest.json")
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["seed"] == seed and manifest["end"] == end and manifest["count"] >= count:
+            return manifest
+    except (OSError, ValueError, KeyError):
+        pass
+
+    shutil.rmtree(replay_dir, ignore_errors=True)
+    series_dir = os.path.join(replay_dir, REPLAY_SOURCE)
+    metrics_dir = os.path.join(replay_dir, "fundamentals")
+    os.makedirs(series_dir)
+    os.makedirs(metrics_dir)
+
+    t0 = time.perf_counter()
+    days = pd.bdate_range(end=end, periods=FIXTURE_DAYS, name="date")
+    market = np.random.default_rng(seed).normal(0.0003, 0.01, len(days))
+    stress = pd.Series(market).rolling(20, min_periods=1).mean().to_numpy()
+    assets = universe(count)
+    for i, (ticker, metric_type) in enumerate(assets):
+        rng = np.random.default_rng([seed, i])
+        if metric_type == "volatility":
+            values = np.clip(18.0 - 400.0 * stress + rng.normal(0, 1.0, len(days)), 9.0, 80.0)
+        elif metric_type == "rate":
+            values = np.clip(3.0 + np.cumsum(rng.normal(0, 0.03, len(days))), 0.0, None)
+        else:
+            beta = rng.uniform(0.3, 1.6)
+            values = 100.0 * np.exp(np.cumsum(beta * market + rng.normal(0, 0.012, len(days))))
+        frame = pd.DataFrame({"value": values}, index=days)
+        try:
+            frame.to_parquet(os.path.join(series_dir, f"{ticker}.parquet"))
+        except ImportError:
+            frame.to_csv(os.path.join(series_dir, f"{ticker}.csv"))
+
+    for ticker in hub_targets(assets):
+        rng = np.random.default_rng([seed, len(assets), int(ticker[1:])])
+        metrics = {"pe_ratio": round(float(rng.uniform(8, 45)), 2),
+                   "earnings_growth": round(float(rng.uniform(-0.1, 0.5)), 4)}
+        with open(os.path.join(metrics_dir, f"{ticker}.json"), "w", encoding="utf-8") as f:
+            json.dump(metrics, f)
+
+    manifest = {"seed": seed, "end": end, "count": count, "days": FIXTURE_DAYS,
+                "seconds": round(time.perf_counter() - t0, 1)}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+# ---- target instance ----
+def connect(url):
+    """(FalkorDB, Redis) clients on the shared connection pool for `url` (scripts.common.db)."""
+    if APP_ROOT not in sys.path:
+        sys.path.append(APP_ROOT)
+    from scripts.common.db import get_falkordb, get_redis
+    return get_falkordb(url), get_redis(url)
+
+
+def check_target(client, graph_name, force):
+    """Refuse instances holding production data; returns a reason or None."""
+    if force:
+        return None
+    if graph_name == PRODUCTION_GRAPH:
+        return f"graph '{graph_name}' is the production graph"
+    if client.exists(PRODUCTION_GRAPH):
+        return f"the target holds the production graph '{PRODUCTION_GRAPH}'"
+    if client.exists(SOURCES_KEY) and not client.exists(MARKER_KEY):
+        return f"the target has a '{SOURCES_KEY}' that was not written by this benchmark"
+    return None
+
+
+def seed_ontology(db, client, graph_name, size, seed, index=False):
+    """(Re)create the benchmark graph and its Redis config / ledgers; returns counts."""
+    import random
+
+    graph = db.select_graph(graph_name)
+    try:
+        graph.delete()
+    except Exception:
+        pass  # graph did not exist
+    for key in client.scan_iter("irm:portfolio:bench-*"):
+        client.delete(key)
+    client.delete(SOURCES_KEY, BETA_STATE_KEY)
+    client.set(MARKER_KEY, graph_name)
+
+    assets = universe(size)
+    rows = [{"ticker": t, "name": f"Bench {t}", "metric_type": m} for t, m in assets]
+    ids = {}
+    for i in range(0, len(rows), 1000):
+        res = graph.query("UNWIND $rows AS row CREATE (a:Asset {ticker: row.ticker, name: row.name, "
+                          "metric_type: row.metric_type}) RETURN row.ticker, id(a)", {"rows": rows[i:i + 1000]})
+        ids.update({r[0]: r[1] for r in res.result_set})
+    if index:
+        graph.query("CREATE INDEX FOR (a:Asset) ON (a.ticker)")
+
+    rng = random.Random(seed)
+    tickers = [t for t, _ in assets]
+    edges = {rel: [] for rel in RELATIONS}
+    for target in tickers[1:]:
+        sources = [s for s in rng.sample(tickers, min(EDGES_PER_ASSET + 1, len(tickers))) if s != target]
+        for source in sources[:EDGES_PER_ASSET]:
+            edges[rng.choice(RELATIONS)].append({"s": ids[source], "t": ids[target]})
+    for rel, rel_rows in edges.items():
+        for i in range(0, len(rel_rows), 1000):
+            graph.query(f"UNWIND $rows AS row MATCH (a), (b) WHERE id(a) = row.s AND id(b) = row.t "
+                        f"CREATE (a)-[:{rel} {{base_beta: 0.0}}]->(b)", {"rows": rel_rows[i:i + 1000]})
+
+    targets = hub_targets(assets)
+    hubs = [{"target": t} for t in targets]
+    graph.query("UNWIND $rows AS row CREATE (:Hub:Earnings {name: row.target + ' EPS', target: row.target, "
+                "eps_min: 0.0, eps_max: 0.3})", {"rows": hubs})
+    graph.query("UNWIND $rows AS row CREATE (:Hub:Valuation {name: row.target + ' PE', target: row.target, "
+                "pe_min: 10.0, pe_max: 40.0, erp_percentile: 0.5})", {"rows": hubs})
+
+    investable = [t for t, m in assets if m == "price"]
+    holdings = 0
+    for k in range(max(1, size // ASSETS_PER_PORTFOLIO)):
+        owner = f"bench-{k:03d}"
+        picks = rng.sample(investable, min(HOLDINGS_PER_PORTFOLIO, len(investable)))
+        graph.query("CREATE (:Portfolio {owner: $owner, name: $owner, currency: 'USD'})", {"owner": owner})
+        graph.query("MATCH (p:Portfolio {owner: $owner}) UNWIND $rows AS row MATCH (a) WHERE id(a) = row.id "
+                    "CREATE (p)-[:HOLDS {id: 'edge_' + $owner + '_' + row.ticker, weight_pct: 0.0, "
+                    "denomination: 'USD'}]->(a)",
+                    {"owner": owner, "rows": [{"id": ids[t], "ticker": t} for t in picks]})
+        pipe = client.pipeline(transaction=False)
+        for t in picks:
+            pipe.hset(f"irm:portfolio:{owner}:holdings:{t}", mapping={
+                "shares": str(rng.randint(10, 500)), "avg_cost": "100.0", "denomination": "USD"})
+        pipe.execute()
+        holdings += len(picks)
+
+    client.hset(SOURCES_KEY, mapping={
+        t: json.dumps({"symbol": t, "provider": REPLAY_SOURCE, "name": f"Bench {t}"}) for t in tickers})
+    return {"assets": len(assets), "edges": sum(len(e) for e in edges.values()),
+            "hubs": 2 * len(hubs), "holdings": holdings}
+
+
+# ---- measurement ----
+class Meter:
+    """Process-wide counters around FalkorDB queries, Redis commands and provider transport calls."""
+    FIELDS = ["graph_queries", "graph_s", "redis_commands", "provider_calls", "provider_s"]
+
+    def __init__(self, trace=True):
+        self.trace = trace
+        self.counts = dict.fromkeys(self.FIELDS, 0)
+        self._lock = threading.Lock()
+
+    def _wrap(self, fn, calls, seconds=None):
+        meter = self
+
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with meter._lock:
+                    meter.counts[calls] += 1
+                    if seconds:
+                        meter.counts[seconds] += time.perf_counter() - t0
+        return wrapper
+
+    def install(self):
+        import redis
+        from falkordb.graph import Graph
+        from scripts.providers.transport import ProviderTransport
+        Graph._query = self._wrap(Graph._query, "graph_queries", "graph_s")
+        redis.Redis.execute_command = self._wrap(redis.Redis.execute_command, "redis_commands")
+        ProviderTransport.call = self._wrap(ProviderTransport.call, "provider_calls", "provider_s")
+        if self.trace:
+            tracemalloc.start()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def measure(self, name, fn, report):
+        """Wrap a refresh stage fn(ctx) so its counters land in report[name]."""
+        def measured(ctx):
+            before = self.snapshot()
+            if self.trace:
+                tracemalloc.reset_peak()
+            t0, c0 = time.perf_counter(), time.process_time()
+            try:
+                return fn(ctx)
+            finally:
+                wall = time.perf_counter() - t0
+                after = self.snapshot()
+                delta = {k: after[k] - before[k] for k in self.FIELDS}
+                # Graph queries travel over the same Redis client; count them once
+                delta["redis_commands"] -= delta["graph_queries"]
+                stats = {"wall_s": round(wall, 3), "cpu_s": round(time.process_time() - c0, 3)}
+                stats.update({k: round(v, 3) if k.endswith("_s") else v for k, v in delta.items()})
+                stats["other_s"] = round(max(0.0, wall - delta["graph_s"] - delta["provider_s"]), 3)
+                stats["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1) if self.trace else None
+                report[name] = stats
+        return measured
+
+
+def rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+
+def worker(args):
+    """Seed one size and run the refresh stages `args.runs` times; prints the result after MARKER."""
+    if APP_ROOT not in sys.path:
+        sys.path.append(APP_ROOT)
+    from scripts.providers.refresh import STAGES, Stage, RefreshContext, run_dag, DONE
+
+    db, client = connect(os.environ["REDIS_URL"])
+    t0 = time.perf_counter()
+    counts = seed_ontology(db, client, args.graph, args.worker, args.seed, index=args.index)
+    result = {"seed_s": round(time.perf_counter() - t0, 2), **counts, "runs": []}
+
+    meter = Meter(trace=not args.no_tracemalloc)
+    meter.install()
+    for i in range(args.runs):
+        stats = {}
+        stages = [Stage(s.name, meter.measure(s.name, s.fn, stats), s.deps) for s in STAGES]
+        t0 = time.perf_counter()
+        ctx = RefreshContext(graph_name=args.graph)
+        # One worker: stages run one at a time so their counters do not mix
+        status = run_dag(ctx, stages, max_workers=1)
+        run = {"label": "cold" if i == 0 else f"warm{i}", "wall_s": round(time.perf_counter() - t0, 3),
+               "stages": {}}
+        for name, r in status.items():
+            run["stages"][name] = {"status": r["status"], "error": r["error"], **stats.get(name, {})}
+        run["ok"] = all(r["status"] == DONE for r in status.values())
+        result["runs"].append(run)
+    result["rss_peak_mb"] = rss_mb()
+    print(MARKER + json.dumps(result))
+
+
+# ---- orchestration ----
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPTS_DIR,
+                             capture_output=True, text=True, timeout=10)
+        if out.returncode == 0:
+            return out.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return os.getenv("IRM_BUILD_COMMIT", "unknown")
+
+
+def bench(args):
+    replay_dir = os.path.join(args.workdir, "replay")
+    manifest = generate_fixtures(replay_dir, max(args.sizes), args.seed)
+    report = {"meta": {"commit": git_commit(), "created": datetime.now().isoformat(timespec="seconds"),
+                       "python": platform.python_version(), "host": platform.node(), "runs": args.runs,
+                       "seed": args.seed, "latency_ms": args.latency_ms, "index": args.index,
+                       "tracemalloc": not args.no_tracemalloc, "fixtures": manifest},
+              "sizes": {}}
+    for size in args.sizes:
+        size_dir = os.path.join(args.workdir, f"size-{size}")
+        shutil.rmtree(size_dir, ignore_errors=True)
+        os.makedirs(size_dir)
+        env = {**os.environ, "REDIS_URL": args.redis_url, "IRM_PROVIDER_OVERRIDE": "replay",
+               "IRM_REPLAY_DIR": replay_dir, "IRM_REPLAY_LATENCY_MS": str(args.latency_ms),
+               "IRM_CACHE_DIR": os.path.join(size_dir, "cache", "series")}
+        for key in ("IRM_PERCENTILE_DIR", "IRM_FUNDAMENTALS_DIR", "IRM_REPLAY_ERROR_RATE"):
+            env.pop(key, None)
+        cmd = [sys.executable, __file__, "--worker", str(size), "--runs", str(args.runs), "--graph", args.graph,
+               "--seed", str(args.seed)] + (["--index"] if args.index else []) \
+            + (["--no-tracemalloc"] if args.no_tracemalloc else [])
+        log_path = os.path.join(size_dir, "bench.log")
+        print(f"[*] {size} assets: seeding and running {args.runs} refresh(es) (log: {log_path})")
+        with open(log_path, "w", encoding="utf-8") as log:
+            proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=log, text=True)
+        lines = [l for l in proc.stdout.splitlines() if l.startswith(MARKER)]
+        if proc.returncode != 0 or not lines:
+            report["sizes"][str(size)] = {"error": f"worker exited with {proc.returncode}, see {log_path}"}
+            print(f"[!] {size} assets failed, see {log_path}")
+            continue
+        report["sizes"][str(size)] = json.loads(lines[-1][len(MARKER):])
+    return report
+
+
+COLUMNS = [("wall_s", "Wall", "{:>7.2f}s"), ("graph_queries", "Queries", "{:>7}"), ("graph_s", "Cypher", "{:>6.2f}s"),
+           ("provider_calls", "Fetches", "{:>7}"), ("provider_s", "Fetch", "{:>6.2f}s"),
+           ("other_s", "Other", "{:>6.2f}s"), ("redis_commands", "Redis", "{:>6}"), ("peak_mb", "PeakMB", "{:>7}")]
+
+
+def print_report(report):
+    width = 104
+    meta = report["meta"]
+    print("\n" + "=" * width)
+    print(f" IRM REFRESH BENCHMARK  commit {meta['commit']}  ({meta['created']}, latency {meta['latency_ms']}ms)")
+    print("=" * width)
+    for size, r in report["sizes"].items():
+        if "error" in r:
+            print(f"{size} assets: {r['error']}\n")
+            continue
+        print(f"{size} assets, {r['edges']} edges, {r['hubs']} hubs, {r['holdings']} holdings "
+              f"(seeded in {r['seed_s']:.1f}s, peak RSS {r['rss_peak_mb']} MB)")
+        print(f"  {'Run/Stage':<18} | " + " | ".join(f"{title:>8}" for _, title, _ in COLUMNS))
+        print("  " + "-" * (width - 2))
+        for run in r["runs"]:
+            print(f"  {run['label']:<18} | {run['wall_s']:>7.2f}s" + ("" if run["ok"] else " | FAILED"))
+            for name, s in run["stages"].items():
+                if s["status"] != "done":
+                    print(f"    {name:<16} | {s['status']}: {s['error']}")
+                    continue
+                cells = [fmt.format(s[key]) if s.get(key) is not None else f"{'-':>8}" for key, _, fmt in COLUMNS]
+                print(f"    {name:<16} | " + " | ".join(f"{c:>8}" for c in cells))
+        print()
+    print("=" * width + "\n")
+
+
+def compare(base, new, threshold):
+    """Print per-stage deltas; returns the regressions (wall time above threshold % and the noise floor)."""
+    regressions = []
+    print("\n" + "=" * 92)
+    print(f" REFRESH BENCHMARK COMPARISON  {base['meta']['commit']} -> {new['meta']['commit']}")
+    print("=" * 92)
+    print(f"{'Size/Run/Stage':<30} | {'Base':>8} | {'New':>8} | {'Delta':>7} | {'Queries':>15} | {'PeakMB':>13}")
+    print("-" * 92)
+    for size, b in base["sizes"].items():
+        n = new["sizes"].get(size)
+        if not n or "runs" not in b or "runs" not in n:
+            continue
+        new_runs = {run["label"]: run for run in n["runs"]}
+        for run in b["runs"]:
+            other = new_runs.get(run["label"])
+            if not other:
+                continue
+            rows = [("total", run, other)] + [
+                (name, s, other["stages"][name]) for name, s in run["stages"].items()
+                if name in other["stages"] and "wall_s" in s and "wall_s" in other["stages"][name]]
+            for name, bs, ns in rows:
+                delta = ns["wall_s"] - bs["wall_s"]
+                pct = 100.0 * delta / bs["wall_s"] if bs["wall_s"] else 0.0
+                flag = ""
+                if pct > threshold and delta > NOISE_FLOOR_S:
+                    flag = "  <-- regression"
+                    regressions.append(f"{size}/{run['label']}/{name}")
+                queries = f"{bs.get('graph_queries', '-')}->{ns.get('graph_queries', '-')}" if name != "total" else ""
+                peak = f"{bs.get('peak_mb', '-')}->{ns.get('peak_mb', '-')}" if name != "total" else ""
+                print(f"{size + '/' + run['label'] + '/' + name:<30} | {bs['wall_s']:>7.2f}s | {ns['wall_s']:>7.2f}s | "
+                      f"{pct:>+6.1f}% | {queries:>15} | {peak:>13}{flag}")
+    print("=" * 92 + "\n")
+    return regressions
+
+
+def load_report(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end refresh benchmark on synthetic ontologies (replayed data)")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES,
+                        help=f"Ontology sizes in assets (default {' '.join(map(str, DEFAULT_SIZES))})")
+    parser.add_argument("--runs", type=int, default=2, help="Refreshes per size; the first one is cold (default 2)")
+    parser.add_argument("--redis-url", default=DEFAULT_URL,
+                        help=f"Dedicated FalkorDB/Redis instance (default IRM_BENCH_REDIS_URL or {DEFAULT_URL})")
+    parser.add_argument("--graph", default=BENCH_GRAPH, help=f"Benchmark graph name (default {BENCH_GRAPH})")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR,
+                        help=f"Fixtures, caches and logs (default IRM_BENCH_DIR or {DEFAULT_WORKDIR})")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the synthetic data (default 42)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated provider latency per call (default 0)")
+    parser.add_argument("--index", action="store_true", help="Create an index on :Asset(ticker) (production has none)")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip per-stage peak memory (less overhead)")
+    parser.add_argument("--out", default=None, help="Report path (default <workdir>/refresh-<commit>.json)")
+    parser.add_argument("--compare", nargs="+", metavar="REPORT",
+                        help="Compare BASE [NEW] reports (NEW defaults to a fresh run) instead of only reporting")
+    parser.add_argument("--threshold", type=float, default=20.0,
+                        help="Wall-time regression threshold in percent for --compare (default 20)")
+    parser.add_argument("--force", action="store_true", help="Run even if the target looks like production")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        worker(args)
+        sys.exit(0)
+
+    if args.compare and len(args.compare) == 2:
+        regressions = compare(load_report(args.compare[0]), load_report(args.compare[1]), args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    try:
+        _, target = connect(args.redis_url)
+        target.ping()
+        refusal = check_target(target, args.graph, args.force)
+    except Exception as e:
+        print(f"[!] Cannot reach the benchmark instance at {args.redis_url}: {e}")
+        sys.exit(2)
+    if refusal:
+        print(f"[!] Refusing to benchmark against {args.redis_url}: {refusal}. "
+              f"Point --redis-url at a scratch FalkorDB (or pass --force).")
+        sys.exit(2)
+
+    result = bench(args)
+    out = args.out or os.path.join(args.workdir, f"refresh-{result['meta']['commit']}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+    print(f"[*] Report written to {out}")
+
+    failed = any("error" in r or not all(run["ok"] for run in r["runs"]) for r in result["sizes"].values())
+    if args.compare:
+        failed = bool(compare(load_report(args.compare[0]), result, args.threshold)) or failed
+    sys.exit(1 if failed else 0)
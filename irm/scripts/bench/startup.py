@@ -0,0 +1,161 @@
+"""
+Startup-time benchmark for every `irm` subcommand and scheduled job entry point.
+
+Each command is launched the way irm.sh / the scheduler launches it (script path, or
+`python3 -m` from /app), with `--help` so it exits right after argument parsing (no FalkorDB / Redis round trips). Measured per command:
+wall time of the whole process (interpreter included), peak RSS, and which heavy
+libraries ended up imported. A command fails the run when its median wall time
+exceeds its budget or when it imports a library it must not need.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ["openbb", "pandas", "scipy", "akshare", "numpy"]
+LIGHT = ["openbb", "pandas", "scipy", "akshare", "numpy"]     # forbidden for pure graph/Redis commands
+NUMERIC = ["openbb", "pandas", "scipy", "akshare"]           # numpy allowed
+PANEL = ["openbb", "scipy", "akshare"]                       # pandas/numpy allowed
+
+# name -> (script relative to scripts/ or "-m <module>", argv, budget in ms, forbidden modules)
+SUBCOMMANDS = {
+    "tracer":            ("analyzer/tracer.py", ["--help"], 1000, LIGHT),
+    "portfolio list":    ("analyzer/portfolio_manager.py", ["list", "--help"], 1000, LIGHT),
+    "portfolio update":  ("analyzer/portfolio_manager.py", ["update", "--help"], 1000, LIGHT),
+    "portfolio advisor": ("analyzer/portfolio_advisor.py", ["--help"], 1500, NUMERIC),
+    "portfolio history": ("analyzer/portfolio_history.py", ["--help"], 800, LIGHT),
+    "portfolio risk":    ("analyzer/portfolio_risk.py", ["--help"], 2500, PANEL),
+    "portfolio pnl":     ("analyzer/portfolio_pnl.py", ["--help"], 1000, LIGHT),
+    "graph nodes":       ("analyzer/node_viewer.py", ["--help"], 1000, LIGHT),
+    "graph edges":       ("analyzer/edge_viewer.py", ["--help"], 1000, LIGHT),
+    "graph exec":        ("analyzer/graph_exec.py", ["--help"], 1000, LIGHT),
+    "sources ls":        ("analyzer/config_manager.py", ["sources", "ls", "--help"], 1000, LIGHT),
+    "sources update":    ("analyzer/config_manager.py", ["sources", "update", "--help"], 1000, LIGHT),
+    "sources query":     ("analyzer/config_manager.py", ["sources", "query", "--help"], 1000, LIGHT),
+    "sources rm":        ("analyzer/config_manager.py", ["sources", "rm", "--help"], 1000, LIGHT),
+    "jobs":              ("providers/job_lock.py", ["status", "--help"], 1000, LIGHT),
+    "refresh":           ("providers/refresh.py", ["--help"], 1000, LIGHT),
+    "replay record":     ("-m scripts.providers.replay_provider", ["--help"], 2500, PANEL),
+    "stream prices":     ("providers/price_stream.py", ["--help"], 1000, LIGHT),
+    "backup":            ("ontology/export_cypher.py", ["--help"], 1000, LIGHT),
+    "polymarket":        ("polymarket/cli.py", ["--help"], 1000, LIGHT),
+    # Scheduled jobs (entrypoint.sh): the heavy work happens in run(), not at import
+    "job calc-betas":    ("providers/calc_betas.py", ["--help"], 1000, LIGHT),
+    "job update-earnings": ("providers/update_earnings.py", ["--help"], 1000, LIGHT),
+    "job update-percentiles": ("providers/update_percentiles.py", ["--help"], 1000, LIGHT),
+}
+
+# Runs the target script in-process and reports imports / RSS at interpreter exit
+PROBE = r"""
+import atexit, json, resource, runpy, sys
+heavy, target, args = json.loads(sys.argv[1])
+def _report():
+    loaded = [m for m in heavy if m in sys.modules]
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    sys.stderr.write("\n__IRM_BENCH__" + json.dumps({"modules": loaded, "rss_kb": rss_kb}) + "\n")
+atexit.register(_report)
+if target.startswith("-m "):
+    sys.argv = [target[3:]] + args
+    runpy.run_module(target[3:], run_name="__main__", alter_sys=True)
+else:
+    sys.argv = [target] + args
+    sys.path.insert(0, str(__import__("pathlib").Path(target).resolve().parent))
+    runpy.run_path(target, run_name="__main__")
+"""
+
+
+def run_once(script, argv):
+    # Modules run from the app root (cwd is on sys.path under `python -c`), like `cd /app && python3 -m`
+    target = script if script.startswith("-m ") else str(SCRIPTS_DIR / script)
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE, json.dumps([HEAVY_MODULES, target, argv])],
+        capture_output=True, text=True, cwd=str(SCRIPTS_DIR.parent),
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    )
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+    report = {"modules": None, "rss_kb": None}
+    for line in proc.stderr.splitlines():
+        if line.startswith("__IRM_BENCH__"):
+            report = json.loads(line[len("__IRM_BENCH__"):])
+    error = None
+    if report["modules"] is None:
+        error = (proc.stderr.strip().splitlines() or ["no report"])[-1][:120]
+    return wall_ms, report, error
+
+
+def bench(names, runs, scale):
+    results = {}
+    for name in names:
+        script, argv, budget, forbidden = SUBCOMMANDS[name]
+        walls, report, error = [], None, None
+        for _ in range(runs):
+            wall, report, error = run_once(script, argv)
+            walls.append(wall)
+            if error:
+                break
+        median = statistics.median(walls)
+        budget_ms = budget * scale
+        violations = sorted(set(report["modules"] or []) & set(forbidden))
+        results[name] = {
+            "median_ms": round(median, 1),
+            "min_ms": round(min(walls), 1),
+            "budget_ms": round(budget_ms, 1),
+            "rss_mb": round(report["rss_kb"] / 1024.0, 1) if report["rss_kb"] else None,
+            "heavy_imports": report["modules"],
+            "forbidden_imports": violations,
+            "error": error,
+            "ok": error is None and median <= budget_ms and not violations,
+        }
+    return results
+
+
+def print_report(results):
+    width = 100
+    print("\n" + "=" * width)
+    print(" IRM STARTUP BENCHMARK (median wall time of `<cmd> --help`, interpreter included)")
+    print("=" * width)
+    print(f"{'Command':<24} | {'Median':>8} | {'Budget':>8} | {'RSS MB':>7} | {'Heavy imports':<22} | Status")
+    print("-" * width)
+    for name, r in results.items():
+        heavy = ",".join(r["heavy_imports"] or []) or "-"
+        if r["error"]:
+            status = f"ERROR {r['error']}"
+        elif r["forbidden_imports"]:
+            status = f"FAIL (imports {','.join(r['forbidden_imports'])})"
+        elif not r["ok"]:
+            status = "FAIL (over budget)"
+        else:
+            status = "OK"
+        rss = f"{r['rss_mb']:.1f}" if r["rss_mb"] is not None else "-"
+        print(f"{name:<24} | {r['median_ms']:>6.0f}ms | {r['budget_ms']:>6.0f}ms | {rss:>7} | {heavy[:22]:<22} | {status}")
+    print("=" * width + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IRM startup-time benchmark with per-command budgets")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per command; the median is compared (default 5)")
+    parser.add_argument("--only", nargs="+", default=None, help="Benchmark only these commands (e.g. 'sources ls')")
+    parser.add_argument("--scale", type=float, default=float(os.getenv("IRM_BENCH_BUDGET_SCALE", "1.0")),
+                        help="Multiply all budgets (slow hosts / CI), default IRM_BENCH_BUDGET_SCALE or 1.0")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    names = args.only or list(SUBCOMMANDS)
+    unknown = [n for n in names if n not in SUBCOMMANDS]
+    if unknown:
+        print(f"[!] Unknown command(s): {unknown}. Available: {list(SUBCOMMANDS)}")
+        sys.exit(2)
+
+    results = bench(names, max(1, args.runs), args.scale)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_report(results)
+    sys.exit(0 if all(r["ok"] for r in results.values()) else 1)
@@ -0,0 +1,219 @@
+"""
+Shared FalkorDB / Redis connection layer.
+
+Every module used to parse REDIS_URL and open its own FalkorDB and redis clients,
+sometimes per call. This module keeps one connection pool per process (FalkorDB
+runs on the same server, so graph queries and plain Redis commands share it) and
+wraps graph access in a single query path that:
+
+* times every Cypher call and counts round trips per command (`GRAPH.QUERY`,
+  `HGETALL`, `PIPELINE`...), see stats() / IRM_DB_STATS=1 for a summary on exit,
+* logs queries slower than IRM_SLOW_QUERY_MS together with their execution plan
+  (GRAPH.EXPLAIN), so slow lookups can be traced to missing indexes.
+
+Usage:
+    from scripts.common.db import get_graph, get_redis, hgetall_many
+    graph = get_graph("Graph-001")        # pooled, timed; same API as falkordb's Graph
+    rows = hgetall_many(get_redis(), keys)  # one round trip
+"""
+import os
+import sys
+import time
+import atexit
+import logging
+import threading
+from urllib.parse import urlparse
+
+import redis
+from redis.client import Pipeline
+from falkordb import FalkorDB
+
+logger = logging.getLogger(__name__)
+
+# 127.0.0.1 rather than localhost: the provider jobs always used it, and it avoids an IPv6 (::1) first try
+DEFAULT_REDIS_URL = "redis://127.0.0.1:6379"
+MAX_CONNECTIONS = int(os.getenv("IRM_DB_MAX_CONNECTIONS", "32"))
+# Log Cypher calls slower than this (milliseconds) with their plan; unset or <= 0 disables
+SLOW_QUERY_MS = float(os.getenv("IRM_SLOW_QUERY_MS", "0") or 0)
+
+_lock = threading.Lock()
+_pools = {}         # url -> ConnectionPool
+_falkor = {}        # url -> FalkorDB
+_redis = {}         # url -> CountingRedis
+_stats = {}         # command -> [round trips, total seconds, max seconds]
+
+
+def redis_url():
+    """REDIS_URL env var > default."""
+    return os.getenv("REDIS_URL", DEFAULT_REDIS_URL)
+
+
+def redis_address(url=None):
+    """(host, port) of the IRM server for messages and tools that need them."""
+    parsed = urlparse(url or redis_url())
+    return parsed.hostname or "127.0.0.1", parsed.port or 6379
+
+
+# ---- instrumentation ----
+def record(command, elapsed):
+    """Count one round trip of `command` taking `elapsed` seconds."""
+    with _lock:
+        entry = _stats.setdefault(command, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] = max(entry[2], elapsed)
+
+
+def stats(reset=False):
+    """{command: {"calls", "total_ms", "max_ms"}} for this process."""
+    with _lock:
+        snapshot = {cmd: {"calls": n, "total_ms": round(total * 1000, 3), "max_ms": round(peak * 1000, 3)}
+                    for cmd, (n, total, peak) in _stats.items()}
+        if reset:
+            _stats.clear()
+    return snapshot
+
+
+def print_stats(out=sys.stderr):
+    rows = stats()
+    if not rows:
+        return
+    print(f"[*] DB round trips ({sum(r['calls'] for r in rows.values())} total):", file=out)
+    for cmd, r in sorted(rows.items(), key=lambda kv: -kv[1]["total_ms"]):
+        print(f"    {cmd:<24} {r['calls']:>7} call(s) {r['total_ms']:>11.1f} ms (max {r['max_ms']:.1f} ms)", file=out)
+
+
+if os.getenv("IRM_DB_STATS") == "1":
+    atexit.register(print_stats)
+
+
+class CountingPipeline(Pipeline):
+    """Pipeline whose execute() counts as one PIPELINE round trip."""
+
+    def execute(self, raise_on_error=True):
+        started = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            record("PIPELINE", time.perf_counter() - started)
+
+
+class CountingRedis(redis.Redis):
+    """redis.Redis recording every command round trip in stats()."""
+
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            record(str(args[0]).upper(), time.perf_counter() - started)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return CountingPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class TimedGraph:
+    """
+    falkordb Graph proxy: query() / ro_query() are timed, counted and slow-logged;
+    every other attribute is delegated unchanged.
+    """
+
+    def __init__(self, graph):
+        self._graph = graph
+        self.name = graph.name
+
+    def __getattr__(self, item):
+        return getattr(self._graph, item)
+
+    def _timed(self, command, fn, cypher, params, timeout):
+        started = time.perf_counter()
+        try:
+            return fn(cypher, params, timeout=timeout)
+        finally:
+            elapsed = time.perf_counter() - started
+            record(command, elapsed)
+            if SLOW_QUERY_MS > 0 and elapsed * 1000 >= SLOW_QUERY_MS:
+                self._log_slow(cypher, params, elapsed)
+
+    def _log_slow(self, cypher, params, elapsed):
+        try:
+            plan = str(self._graph.explain(cypher, params)).strip()
+        except Exception as e:
+            plan = f"(plan unavailable: {e})"
+        logger.warning(f"Slow query on {self.name} ({elapsed * 1000:.1f} ms): {' '.join(cypher.split())[:500]}\n{plan}")
+
+    def query(self, q, params=None, timeout=None):
+        return self._timed("GRAPH.QUERY", self._graph.query, q, params, timeout)
+
+    def ro_query(self, q, params=None, timeout=None):
+        return self._timed("GRAPH.RO_QUERY", self._graph.ro_query, q, params, timeout)
+
+
+# ---- pooled clients ----
+def _pool(url):
+    # Caller holds _lock. decode_responses is a pool setting and FalkorDB requires it
+    pool = _pools.get(url)
+    if pool is None:
+        host, port = redis_address(url)
+        pool = _pools[url] = redis.BlockingConnectionPool(
+            host=host, port=port, decode_responses=True, max_connections=MAX_CONNECTIONS, timeout=30)
+    return pool
+
+
+def get_redis(url=None):
+    """Process-wide Redis client (decoded responses) on the shared pool."""
+    url = url or redis_url()
+    with _lock:
+        client = _redis.get(url)
+        if client is None:
+            client = _redis[url] = CountingRedis(connection_pool=_pool(url))
+        return client
+
+
+def get_falkordb(url=None):
+    """Process-wide FalkorDB client on the shared pool."""
+    url = url or redis_url()
+    with _lock:
+        db = _falkor.get(url)
+        if db is None:
+            db = _falkor[url] = FalkorDB(connection_pool=_pool(url))
+        return db
+
+
+def get_graph(graph_name="Graph-001", url=None):
+    """Timed handle on a graph; only the first call per process connects (shared pool)."""
+    return TimedGraph(get_falkordb(url).select_graph(graph_name))
+
+
+def query(graph, cypher, params=None):
+    """
+    Run Cypher through the timed path; errors are logged and None is returned, like the
+    modules' own query_falkor wrappers.
+    """
+    if graph is None:
+        return None
+    if not isinstance(graph, TimedGraph):
+        graph = TimedGraph(graph)
+    try:
+        return graph.query(cypher, params)
+    except Exception as e:
+        logger.error(f"Query error on {graph.name}: {e}")
+        return None
+
+
+# ---- pipelining helpers ----
+def pipelined(client, calls, transaction=False):
+    """
+    Issue several commands in one round trip.
+    :param calls: iterable of (method name, *args), e.g. [("hgetall", key), ("get", other)].
+    """
+    pipe = client.pipeline(transaction=transaction)
+    for name, *args in calls:
+        getattr(pipe, name)(*args)
+    return pipe.execute()
+
+
+def hgetall_many(client, keys):
+    """HGETALL of every key in one round trip, in key order."""
+    keys = list(keys)
+    return pipelined(client, [("hgetall", k) for k in keys]) if keys else []
@@ -51,14 +51,14 @@ else
             }" > /dev/null
     }
 
-    # Register earnings update (Daily at 12:00)
-    register_job "update-earnings" "0 0 12 * * *" "docker exec irm python3 /app/scripts/providers/update_earnings.py"
-    
-    # Register percentile update (Daily at 12:00)
-    register_job "update-percentiles" "0 0 12 * * *" "docker exec irm python3 /app/scripts/providers/update_percentiles.py"
-    
-    # Register price signals update (Daily at 12:00)
-    register_job "update-price-signals" "0 0 12 * * *" "docker exec irm python3 /app/scripts/providers/update_price_signals.py"
+    # Register the daily refresh (Daily at 12:00): prices, fundamentals, EPS/PE hubs and weight sync
+    # in one process. Betas stay manual (calc-betas below).
+    register_job "refresh" "0 0 12 * * *" "docker exec irm python3 /app/scripts/providers/refresh.py --skip betas --coalesce"
+
+    # Single-job entry points (Manual only)
+    register_job "update-earnings" "@manually" "docker exec irm python3 /app/scripts/providers/update_earnings.py"
+    register_job "update-percentiles" "@manually" "docker exec irm python3 /app/scripts/providers/update_percentiles.py"
+    register_job "update-price-signals" "@manually" "docker exec irm python3 /app/scripts/providers/update_price_signals.py"
 
     # Register Beta calculation (Manual only)
     register_job "calc-betas" "@manually" "docker exec irm python3 /app/scripts/providers/calc_betas.py"
@@ -66,6 +66,18 @@ else
     echo "Dkron job registration complete."
 fi
 
+# Optional near-real-time price daemon (IRM_PRICE_STREAM=1)
+if [ "$IRM_PRICE_STREAM" = "1" ]; then
+    echo "Starting price stream daemon (log: $IRM_CONFIG_DIR/price_stream.log)..."
+    nohup python3 /app/scripts/providers/price_stream.py >> "$IRM_CONFIG_DIR/price_stream.log" 2>&1 &
+fi
+
+# Optional live portfolio PnL follower (IRM_PORTFOLIO_PNL=1), fed by irm:stream:asset_changes
+if [ "$IRM_PORTFOLIO_PNL" = "1" ]; then
+    echo "Starting portfolio PnL stream (log: $IRM_CONFIG_DIR/portfolio_pnl.log)..."
+    nohup python3 /app/scripts/analyzer/portfolio_pnl.py --follow >> "$IRM_CONFIG_DIR/portfolio_pnl.log" 2>&1 &
+fi
+
 echo "Keeping container alive with tail -f /dev/null..."
 
 # Keep the container alive
@@ -21,6 +21,15 @@ case "$COMMAND" in
             advisor)
                 python3 /app/scripts/analyzer/portfolio_advisor.py "$@"
                 ;;
+            history)
+                python3 /app/scripts/analyzer/portfolio_history.py "$@"
+                ;;
+            risk)
+                python3 /app/scripts/analyzer/portfolio_risk.py "$@"
+                ;;
+            pnl)
+                python3 /app/scripts/analyzer/portfolio_pnl.py "$@"
+                ;;
             list|ls|*)
                 python3 /app/scripts/analyzer/portfolio_manager.py list "$@"
                 ;;
@@ -50,6 +59,22 @@ case "$COMMAND" in
     sources)
         python3 /app/scripts/analyzer/config_manager.py sources "$@"
         ;;
+    refresh)
+        python3 /app/scripts/providers/refresh.py "$@"
+        ;;
+    replay)
+        SUBCOMMAND=$1
+        shift
+        case "$SUBCOMMAND" in
+            record)
+                cd /app && python3 -m scripts.providers.replay_provider "$@"
+                ;;
+            *)
+                echo "Unknown replay command: $SUBCOMMAND"
+                echo "Usage: irm replay record [--tickers T ...] [--start YYYY-MM-DD] [--dir DIR]"
+                ;;
+        esac
+        ;;
     backup)
         python3 /app/scripts/ontology/export_cypher.py "$@"
         ;;
@@ -64,15 +89,49 @@ case "$COMMAND" in
     polymarket)
         python3 /app/scripts/polymarket/cli.py "$@"
         ;;
+    stream)
+        SUBCOMMAND=$1
+        shift
+        case "$SUBCOMMAND" in
+            prices)
+                python3 /app/scripts/providers/price_stream.py "$@"
+                ;;
+            *)
+                echo "Unknown stream command: $SUBCOMMAND"
+                echo "Usage: irm stream prices [--interval S] [--tickers T ...] [--once]"
+                ;;
+        esac
+        ;;
+    jobs)
+        python3 /app/scripts/providers/job_lock.py "${@:-status}"
+        ;;
+    bench)
+        SUBCOMMAND=$1
+        shift
+        case "$SUBCOMMAND" in
+            startup)
+                python3 /app/scripts/bench/startup.py "$@"
+                ;;
+            refresh)
+                python3 /app/scripts/bench/refresh.py "$@"
+                ;;
+            *)
+                echo "Unknown bench command: $SUBCOMMAND"
+                echo "Usage: irm bench {startup|refresh}"
+                ;;
+        esac
+        ;;
     help|*)
         echo "IRM (Investment Risk Management) CLI"
         echo "Usage: irm <command> [options]"
         echo ""
         echo "Available Commands:"
-        echo "  tracer    - Trace macro-to-micro impact propagation (supports --target <ticker>)"
+        echo "  tracer    - Trace macro-to-micro impact propagation (supports --target <ticker>, --regime-betas, --advise, --json)"
         echo "  portfolio list   - List asset allocation status for a specified owner"
         echo "  portfolio update - Update a specific holding (e.g. irm portfolio update NVDA 300 850 --denom USD)"
         echo "  portfolio advisor - Get Kelly-based allocation advice (requires impacts/weights)"
+        echo "  portfolio history - Show NAV/weight history from the time-series store (no FalkorDB access)"
+        echo "  portfolio risk   - Historical & EWMA VaR/CVaR and max drawdown per owner (written to Portfolio node)"
         echo ""
         echo "  polymarket search - Search Polymarket prediction markets"
         echo ""
@@ -81,6 +140,12 @@ case "$COMMAND" in
         echo "  backup    - Export live Ontology data and Configs to .irm directory"
         echo "  store     - Restore data and configs from EXPORTED backups in .irm"
         echo "  sources   - Manage data sources configuration (ls, update, query)"
+        echo "  refresh   - Run all update jobs (prices, fundamentals, betas, hubs, weights) as one DAG (--skip, --only)"
+        echo "  replay record - Record replay fixtures of all configured sources (offline runs: IRM_PROVIDER_OVERRIDE=replay)"
+        echo "  stream prices - Near-real-time price daemon (changed Asset nodes + irm:stream:asset_changes)"
+        echo "  jobs          - Job lease status (running / rerun pending / last result); 'jobs unlock <job>'"
+        echo "  bench startup - Startup time / heavy-import budget check for every subcommand"
+        echo "  bench refresh - End-to-end refresh benchmark on synthetic ontologies (scratch FalkorDB only)"
         echo ""
         echo "Use 'irm <command> --help' for more information on a specific command."
         ;;
@@ -1,8 +1,15 @@
 import os
+import sys
 import json
 import argparse
-from urllib.parse import urlparse
-from falkordb import FalkorDB
+from pathlib import Path
+
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.common.db import get_graph, get_redis, redis_address
 
 def escape_str(val):
     if isinstance(val, str):
@@ -11,15 +18,11 @@ def escape_str(val):
     return str(val)
 
 def export_graph(graph_name="Graph-001", output_file="/home/pi-mono/.pi/agent/workspace/.irm/EXPORTED_SCHEMA.cypher"):
-    redis_url = os.getenv("REDIS_URL", "redis://127.0.0.1:6379")
-    parsed = urlparse(redis_url)
-    host = parsed.hostname or "127.0.0.1"
-    port = parsed.port or 6379
+    host, port = redis_address()
     
     print(f"[*] Connecting to FalkorDB at {host}:{port}, Graph: {graph_name}...")
     try:
-        db = FalkorDB(host=host, port=port)
-        graph = db.select_graph(graph_name)
+        graph = get_graph(graph_name)
     except Exception as e:
         print(f"[!] Failed to connect: {e}")
         return
@@ -94,12 +97,11 @@ def export_graph(graph_name="Graph-001", output_file="/home/pi-mono/.pi/agent/wo
     export_config(host, port, os.path.dirname(output_file))
 
 def export_config(host, port, out_dir):
-    import redis
     print("[*] Exporting Redis Configurations...")
     out_script = os.path.join(out_dir, "EXPORTED_CONFIG.sh")
     
     try:
-        r = redis.Redis(host=host, port=port, decode_responses=True)
+        r = get_redis()
     except Exception as e:
         print(f"[!] Redis connect err: {e}")
         return
@@ -1,14 +1,14 @@
-from falkordb import FalkorDB
-import os
-from urllib.parse import urlparse
+import sys
+from pathlib import Path
 
-redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-parsed = urlparse(redis_url)
-host = parsed.hostname or "localhost"
-port = parsed.port or 6379
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
 
-db = FalkorDB(host=host, port=port)
-graph = db.select_graph('Graph-001')
+from scripts.common.db import get_graph
+
+graph = get_graph('Graph-001')
 
 print("1. Injecting :Investable label to tradeable asset categories...")
 # Stock, EquityETF, Crypto, Commodity are investable.
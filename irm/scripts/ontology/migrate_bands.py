@@ -1,18 +1,17 @@
-import os
+import sys
 import json
-import redis
-import falkordb
-from urllib.parse import urlparse
+from pathlib import Path
+
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.common.db import get_graph, get_redis
 
 def migrate():
-    redis_url = os.getenv("REDIS_URL", "redis://redis:6379")
-    parsed = urlparse(redis_url)
-    host = parsed.hostname or "localhost"
-    port = parsed.port or 6379
-    
-    r = redis.Redis(host=host, port=port, decode_responses=True)
-    db = falkordb.FalkorDB(host=host, port=port)
-    graph = db.select_graph("Graph-001")
+    r = get_redis()
+    graph = get_graph("Graph-001")
 
     print("[*] Migrating PE bands from Redis to FalkorDB...")
     pe_bands = r.hgetall("irm:config:pe_bands")
@@ -1,7 +1,13 @@
 import sys
 import os
-from urllib.parse import urlparse
-from falkordb import FalkorDB
+from pathlib import Path
+
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.common.db import get_graph, redis_address
 
 def sync_schema(schema_path, graph_name="Graph-001"):
     if not os.path.exists(schema_path):
@@ -28,15 +34,11 @@ def sync_schema(schema_path, graph_name="Graph-001"):
     queries = clean_content.split(';')
 
     # Connection details from environment
-    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-    parsed = urlparse(redis_url)
-    host = parsed.hostname or "localhost"
-    port = parsed.port or 6379
+    host, port = redis_address()
 
     print(f"[*] Connecting to FalkorDB at {host}:{port}...")
     try:
-        db = FalkorDB(host=host, port=port)
-        graph = db.select_graph(graph_name)
+        graph = get_graph(graph_name)
     except Exception as e:
         print(f"[!] Connection failed: {e}")
         return
@@ -1,34 +1,58 @@
 """
 Providers Registry module for data source providers.
 Allows dynamically obtaining provider implementations based on name.
+
+Provider modules (and with them pandas / openbb / akshare) are imported only when a
+provider is actually instantiated, so commands that merely list or edit the source
+configuration stay lightweight.
 """
+import os
 import logging
-from .yfinance_provider import YFinanceProvider
-from .fred_provider import FredProvider
-from .akshare_fund_provider import AkShareFundProvider
-from .akshare_bond_provider import AkShareBondProvider
+from importlib import import_module
 
 logger = logging.getLogger(__name__)
 
-# Registry for providers: provider name -> provider class
+# Registry for providers: provider name -> "module:Class" (resolved lazily)
 PROVIDER_REGISTRY = {
-    "yfinance":      YFinanceProvider,
-    "fred":          FredProvider,
-    "akshare_fund":  AkShareFundProvider,   # 基金净值
-    "akshare_bond":  AkShareBondProvider,   # 国债/宏观利率
+    "yfinance":      ".yfinance_provider:YFinanceProvider",
+    "fred":          ".fred_provider:FredProvider",
+    "akshare_fund":  ".akshare_fund_provider:AkShareFundProvider",   # 基金净值
+    "akshare_bond":  ".akshare_bond_provider:AkShareBondProvider",   # 国债/宏观利率
+    "replay":        ".replay_provider:ReplayProvider",             # 离线回放 (fixtures)
 }
 
-def get_provider(name: str):
+def load_provider_class(name: str):
+    """Import and return the provider class registered under name."""
+    target = PROVIDER_REGISTRY.get(name.lower())
+    if not target:
+        raise ValueError(f"Unsupported provider: {name}. Available providers: {list(PROVIDER_REGISTRY.keys())}")
+    module_name, class_name = target.split(":")
+    return getattr(import_module(module_name, __name__), class_name)
+
+def get_provider(name: str, cached: bool = True):
     """
     Returns an instance of the provider class with the given name.
+    By default it is wrapped in the local incremental time-series cache
+    (disable per call with cached=False or globally with IRM_PROVIDER_CACHE=0).
+    With IRM_PROVIDER_OVERRIDE=replay every provider is served from replay fixtures
+    (cached under a separate 'replay/<name>' directory so real and replayed series never mix).
     Raises ValueError if provider not found.
     """
-    provider_cls = PROVIDER_REGISTRY.get(name.lower())
-    if not provider_cls:
-        raise ValueError(f"Unsupported provider: {name}. Available providers: {list(PROVIDER_REGISTRY.keys())}")
-    
+    name = name.lower()
+    override = os.getenv("IRM_PROVIDER_OVERRIDE", "").lower()
+    cache_name = name
+
     try:
-        return provider_cls()
+        if override and override != name:
+            provider = load_provider_class(override)(source=name)
+            cache_name = f"{override}/{name}"
+        else:
+            provider = load_provider_class(name)()
     except (EnvironmentError, ImportError) as e:
         logger.error(f"Provider {name} could not be initialized: {e}")
         raise
+
+    if cached and os.getenv("IRM_PROVIDER_CACHE", "1") != "0":
+        from .cache import CachedProvider
+        return CachedProvider(cache_name, provider)
+    return provider
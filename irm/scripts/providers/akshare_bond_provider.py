@@ -1,50 +1,85 @@
 import pandas as pd
 import logging
 from .base import BaseProvider
+from .bulk import bulk_tables
+from .transport import get_transport
 
 logger = logging.getLogger(__name__)
 
+DATE_COLUMN = '日期'
+
 class AkShareBondProvider(BaseProvider):
-    def fetch(self, symbol: str, start_date: str) -> pd.DataFrame:
+    def _table(self, start_date: str) -> pd.DataFrame:
         """
-        Fetch historical bond yields from AkShare.
-        Supports 'bond_zh_us_rate' based indices.
+        The full bond_zh_us_rate table (one column per country/tenor) from start_date on.
+        Downloaded once per TTL window and shared by every instance in the process.
         """
         import akshare as ak
         try:
             # This returns a multi-column dataframe with CN/US rates
-            df = ak.bond_zh_us_rate()
-            
-            if not df.empty:
-                # Standardize to 'date' column
-                df['日期'] = pd.to_datetime(df['日期'])
-                start_dt = pd.to_datetime(start_date)
-                df = df[df['日期'] >= start_dt]
-                
-                # Check if the requested symbol exists as a column
-                if symbol not in df.columns:
-                     # Check for partial matches if specific column names are hard to remember
-                     matches = [c for c in df.columns if symbol in c]
-                     if not matches:
-                         logger.warning(f"Column '{symbol}' not found in bond_zh_us_rate data. Available: {df.columns.tolist()}")
-            
-            return df
+            df = bulk_tables.get("akshare:bond_zh_us_rate",
+                                 lambda: get_transport('akshare_bond').call(ak.bond_zh_us_rate))
         except Exception as e:
             raise RuntimeError(f"Failed to fetch bond data from AkShare: {e}")
 
+        if not df.empty:
+            # Standardize to 'date' column
+            df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN])
+            df = df[df[DATE_COLUMN] >= pd.to_datetime(start_date)]
+        return df
+
+    def fetch(self, symbol: str, start_date: str) -> pd.DataFrame:
+        """
+        Fetch historical bond yields from AkShare.
+        Supports 'bond_zh_us_rate' based indices; the result is projected to the date
+        column plus the single column matching `symbol`.
+        """
+        df = self._table(start_date)
+        if df.empty:
+            return df
+
+        col = self.resolve_column(df, symbol)
+        if col is None:
+            logger.warning(f"Column '{symbol}' not found in bond_zh_us_rate data. Available: {df.columns.tolist()}")
+            return df.iloc[0:0][[DATE_COLUMN]]
+        return df[[DATE_COLUMN, col]]
+
     def get_value_column(self, df: pd.DataFrame) -> str:
         """
-        Return the first column that matches common yield patterns or if it was the symbol.
-        In AkShare Bond data, columns are typically '中国国债收益率10年' etc.
+        fetch() projects to the requested symbol, so the value column is the only
+        numeric column left. For an unprojected table fall back to the CN 10Y yield.
         """
-        # If the df was filtered for the specific symbol being present, it's safer to find it
-        # We look for numeric columns that aren't '日期'
         numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-        
-        # Priority 1: Match '10年' if that's what we usually look for
+        if len(numeric_cols) == 1:
+            return numeric_cols[0]
+
         for col in numeric_cols:
             if '10年' in col and '中国' in col:
                 return col
-        
-        # Priority 2: Return first numeric column
         return numeric_cols[0] if numeric_cols else None
+
+    @staticmethod
+    def resolve_column(df: pd.DataFrame, symbol: str):
+        """Exact column match, else the first column containing the symbol."""
+        if symbol in df.columns and symbol != DATE_COLUMN:
+            return symbol
+        matches = [c for c in df.columns if symbol and symbol in c and c != DATE_COLUMN]
+        return matches[0] if matches else None
+
+    def fetch_many(self, symbols, start_date: str) -> pd.DataFrame:
+        """The whole bond_zh_us_rate table comes back in one call; slice it per symbol."""
+        symbols = list(dict.fromkeys(symbols))
+        try:
+            df = self._table(start_date)
+        except Exception as e:
+            return self.align({}, {s: str(e).split('\n')[0] for s in symbols})
+
+        series_map = {}
+        errors = {}
+        for symbol in symbols:
+            col = self.resolve_column(df, symbol) if not df.empty else None
+            if col is None:
+                errors[symbol] = f"Column '{symbol}' not found in bond_zh_us_rate data"
+                continue
+            series_map[symbol] = self.to_series(df, col)
+        return self.align(series_map, errors)
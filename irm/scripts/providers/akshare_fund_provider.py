@@ -1,17 +1,20 @@
 import pandas as pd
 import logging
 from .base import BaseProvider
+from .transport import get_transport
 
 logger = logging.getLogger(__name__)
 
 class AkShareFundProvider(BaseProvider):
+    max_concurrency = 4
+
     def fetch(self, symbol: str, start_date: str) -> pd.DataFrame:
         """Fetch historical fund NAV from AkShare (currently supporting open funds)."""
         import akshare as ak
         try:
             # We use the fund_open_fund_info_em to get historical NAV
             # Indicator "单位净值走势" returns '净值日期' and '单位净值'
-            df = ak.fund_open_fund_info_em(symbol=symbol, indicator="单位净值走势")
+            df = get_transport('akshare_fund').call(ak.fund_open_fund_info_em, symbol=symbol, indicator="单位净值走势")
             
             # Filter data based on start_date
             if not df.empty:
@@ -0,0 +1,56 @@
+"""
+Asset change events on a Redis stream.
+
+Whenever a price writer (the streaming daemon or the batch price job) commits new
+`value` / percentile properties to Asset nodes, it appends one entry to
+`irm:stream:asset_changes` listing exactly the assets that changed, so consumers
+(portfolio PnL, gateway, caches) react to those tickers instead of polling the graph.
+
+Entry fields:
+    ts        epoch seconds of the write
+    source    writer name ("price_stream", "update_price_signals", ...)
+    changes   JSON list of {ticker, value, prev_value, percentile, percentile_<window>...}
+"""
+import os
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+ASSET_CHANGES_STREAM = "irm:stream:asset_changes"
+STREAM_MAXLEN = int(os.getenv("IRM_STREAM_MAXLEN", "10000"))
+
+
+def change_events(rows, stored, written=None):
+    """
+    Events for written node rows.
+    :param rows: rows as written (each with 'ticker' and 'value').
+    :param stored: {ticker: {'value': ...}} as stored before the write.
+    :param written: keys that actually matched (WriteResult.written); all rows when omitted.
+    """
+    ok = None if written is None else set(written)
+    events = []
+    for row in rows:
+        if ok is not None and row["ticker"] not in ok:
+            continue
+        events.append({**row, "prev_value": (stored.get(row["ticker"]) or {}).get("value")})
+    return events
+
+
+def publish_asset_changes(redis_client, events, source):
+    """XADD one entry for this batch of changes; never raises (the graph write already happened)."""
+    if not events or not redis_client:
+        return None
+    try:
+        return redis_client.xadd(ASSET_CHANGES_STREAM, {
+            "ts": f"{time.time():.3f}", "source": source, "changes": json.dumps(events, separators=(",", ":"))
+        }, maxlen=STREAM_MAXLEN, approximate=True)
+    except Exception as e:
+        logger.warning(f"Failed to publish {len(events)} asset change(s): {e}")
+        return None
+
+
+def parse_entry(fields):
+    """Stream entry fields -> (ts, source, [events])."""
+    return float(fields.get("ts", 0)), fields.get("source"), json.loads(fields.get("changes") or "[]")
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import logging
 
@@ -7,6 +8,9 @@ logger = logging.getLogger(__name__)
 class BaseProvider(ABC):
     """Unified interface for all data source providers."""
 
+    # Max parallel single-symbol fetches used by the default fetch_many
+    max_concurrency = 1
+
     @abstractmethod
     def fetch(self, symbol: str, start_date: str) -> pd.DataFrame:
         """
@@ -20,3 +24,57 @@ class BaseProvider(ABC):
     def get_value_column(self, df: pd.DataFrame) -> str:
         """Return the column name in the DataFrame that represents the 'price/value'."""
         pass
+
+    def fetch_many(self, symbols, start_date: str) -> pd.DataFrame:
+        """
+        Fetch several symbols at once and return an aligned frame:
+        DatetimeIndex named 'date', one float column per symbol that returned data.
+        - Symbols that failed or came back empty are left out; the reason is kept in
+          `df.attrs['errors']` ({symbol: message}) so callers can report per symbol.
+        - This default runs `fetch` with bounded parallelism (max_concurrency);
+          providers with a native batch endpoint override it.
+        """
+        symbols = list(dict.fromkeys(symbols))
+
+        def _one(symbol):
+            try:
+                df = self.fetch(symbol, start_date)
+                return symbol, self.to_series(df, self.get_value_column(df)), None
+            except Exception as e:
+                return symbol, None, str(e).split('\n')[0]
+
+        if self.max_concurrency > 1 and len(symbols) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(symbols))) as pool:
+                results = list(pool.map(_one, symbols))
+        else:
+            results = [_one(s) for s in symbols]
+
+        return self.align({s: series for s, series, _ in results if series is not None},
+                          {s: err for s, _, err in results if err is not None})
+
+    @staticmethod
+    def to_series(df: pd.DataFrame, value_col: str):
+        """Date-indexed float series of value_col, or None when the frame carries no data."""
+        from .returns import value_series
+        if df is None or df.empty or not value_col or value_col not in df.columns:
+            return None
+        series = value_series(df, value_col).dropna()
+        series.index = pd.to_datetime(series.index)
+        series = series[~series.index.duplicated(keep='last')].sort_index()
+        return series if len(series) else None
+
+    @staticmethod
+    def align(series_map, errors=None) -> pd.DataFrame:
+        """Outer-join {symbol: series} on date; symbols without data are recorded in attrs['errors']."""
+        errors = dict(errors or {})
+        for symbol, series in list(series_map.items()):
+            if series is None or not len(series):
+                errors.setdefault(symbol, "No valid data returned")
+                series_map.pop(symbol)
+        if series_map:
+            df = pd.concat(series_map, axis=1).sort_index()
+        else:
+            df = pd.DataFrame(index=pd.DatetimeIndex([]))
+        df.index.name = "date"
+        df.attrs['errors'] = errors
+        return df
@@ -0,0 +1,204 @@
+"""
+Online (streaming) regression state for edge betas.
+
+For every edge the sufficient statistics of y = beta * x + alpha are kept in Redis:
+observation count, sums, squares and cross-products, once for a rolling 3-year window
+and once exponentially weighted. A refresh only folds in the weekly bars that closed
+since the last run (and, for the rolling window, subtracts the bars that fell out of
+it), so an ordinary week costs O(1) per edge instead of three years of regressions.
+
+The newest weekly bar is still forming until Friday's close, so it is never written
+into the stored state; it is added provisionally when betas are read. A periodic full
+recompute from the panel guards against drift and upstream data revisions.
+
+Each edge's entry records the as-of bar and window start its moments were folded to.
+Runs that skip an edge (no data for one of its tickers) leave that entry behind the
+shared meta, so it is rebuilt from the panel instead of being advanced from stale sums.
+"""
+import json
+import time
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY = "irm:betas:state"
+META_FIELD = "_meta"
+
+# Order of the stored moment vector
+MOMENT_KEYS = ["count", "w", "w2", "x", "y", "xx", "yy", "xy"]
+
+WINDOW_DAYS = 3 * 365
+EWMA_HALFLIFE_WEEKS = 52
+FULL_RECOMPUTE_DAYS = 28
+# Calendar days of history the panel must cover: the window plus the bars that may slide
+# out of it before the next full recompute (and two weeks for resampling), so the
+# incremental path can still subtract them
+HISTORY_DAYS = WINDOW_DAYS + FULL_RECOMPUTE_DAYS + 14
+
+
+def edge_key(source, rel_type, target):
+    return f"{source}|{rel_type}|{target}"
+
+
+def moment_sums(values, src_idx, tgt_idx, weights=None):
+    """
+    Weighted moment sums over the rows of `values` for every (src, tgt) column pair.
+
+    :param values: array (T, N), NaN where a ticker has no bar.
+    :param weights: array (T,) row weights (default 1).
+    :return: array (E, len(MOMENT_KEYS)).
+    """
+    values = np.asarray(values, dtype=float).reshape(-1, np.shape(values)[-1])
+    x = values[:, src_idx]
+    y = values[:, tgt_idx]
+    mask = ~np.isnan(x) & ~np.isnan(y)
+    w = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+    wm = np.where(mask, w[:, None], 0.0)
+    x = np.where(mask, x, 0.0)
+    y = np.where(mask, y, 0.0)
+    return np.stack([
+        mask.sum(axis=0).astype(float),
+        wm.sum(axis=0),
+        (wm * wm).sum(axis=0),
+        (wm * x).sum(axis=0),
+        (wm * y).sum(axis=0),
+        (wm * x * x).sum(axis=0),
+        (wm * y * y).sum(axis=0),
+        (wm * x * y).sum(axis=0),
+    ], axis=1)
+
+
+def decay(moments, lam, steps):
+    """Age EWMA moments by `steps` bars: weights scale by lam, squared weights by lam^2."""
+    out = moments.copy()
+    out[:, 1:] *= lam ** steps
+    out[:, 2] *= lam ** steps   # w2 decays with lam^2
+    return out
+
+
+class EdgeBetaState:
+    def __init__(self, redis_client, window_days=WINDOW_DAYS, halflife_weeks=EWMA_HALFLIFE_WEEKS,
+                 full_every_days=FULL_RECOMPUTE_DAYS):
+        self.redis_client = redis_client
+        self.window_days = window_days
+        self.lam = 0.5 ** (1.0 / halflife_weeks)
+        self.full_every = full_every_days * 86400
+
+    def _load(self, keys):
+        if not self.redis_client:
+            return None, {}
+        raw = self.redis_client.hmget(STATE_KEY, [META_FIELD] + keys)
+        meta = json.loads(raw[0]) if raw[0] else None
+        states = {k: json.loads(v) for k, v in zip(keys, raw[1:]) if v}
+        return meta, states
+
+    def _save(self, meta, keys, rolling, ewma):
+        if not self.redis_client:
+            return
+        mapping = {META_FIELD: json.dumps(meta)}
+        for i, k in enumerate(keys):
+            mapping[k] = json.dumps({"r": rolling[i].tolist(), "e": ewma[i].tolist(), "asof": meta["asof"],
+                                     "window_start": meta["window_start"]}, separators=(",", ":"))
+        self.redis_client.hset(STATE_KEY, mapping=mapping)
+
+    def _full(self, values, dates, src, tgt, window_start, stable_end):
+        """Rolling and EWMA moments from scratch over rows <= stable_end."""
+        stable = dates <= stable_end
+        in_window = stable & (dates > window_start)
+        rolling = moment_sums(values[in_window], src, tgt)
+        n_stable = int(stable.sum())
+        weights = self.lam ** np.arange(n_stable - 1, -1, -1)   # newest stable bar weighs 1
+        ewma = moment_sums(values[stable], src, tgt, weights)
+        return rolling, ewma
+
+    def update(self, panel, edges, full=False):
+        """
+        Bring the stored state up to date with the panel and return current moments.
+
+        :param panel: DataFrame (dates x tickers) of weekly returns.
+        :param edges: list of (source, rel_type, target) with both tickers in panel.
+        :return: (rolling, ewma, info) where rolling/ewma are dicts of (E,) arrays
+                 keyed by MOMENT_KEYS, including the provisional newest bar.
+        """
+        col = {t: j for j, t in enumerate(panel.columns)}
+        src = np.array([col[e[0]] for e in edges], dtype=int)
+        tgt = np.array([col[e[2]] for e in edges], dtype=int)
+        keys = [edge_key(*e) for e in edges]
+        values = panel.to_numpy(dtype=float)
+        dates = panel.index.values
+        n_edges = len(edges)
+        now = time.time()
+        info = {"mode": "full", "added": 0, "evicted": 0, "rebuilt_edges": n_edges, "window_start": None}
+
+        if len(dates) < 2:
+            rolling = moment_sums(values, src, tgt)
+            return self._as_dict(rolling), self._as_dict(rolling.copy()), info
+
+        latest, stable_end = dates[-1], dates[-2]
+        window_start = latest - np.timedelta64(self.window_days, 'D')
+        meta, states = self._load(keys)
+
+        incremental = (
+            not full and meta is not None
+            and meta.get("lam") == self.lam and meta.get("window_days") == self.window_days
+            and now - meta.get("full_at", 0) < self.full_every
+        )
+        if incremental:
+            asof = np.datetime64(meta["asof"])
+            old_start = np.datetime64(meta["window_start"])
+            # Evicted bars must still be in the panel, and the stored as-of bar must exist
+            if not (dates == asof).any() or asof > stable_end or \
+                    old_start < dates[0] - np.timedelta64(7, 'D'):
+                incremental = False
+
+        if incremental:
+            # Only entries folded up to the shared as-of can be advanced; edges skipped by an
+            # earlier run (or stored before per-edge as-of dates) are rebuilt below
+            have = np.array([k in states and states[k].get("asof") == meta["asof"]
+                             and states[k].get("window_start") == meta["window_start"] for k in keys])
+            rolling = np.zeros((n_edges, len(MOMENT_KEYS)))
+            ewma = np.zeros((n_edges, len(MOMENT_KEYS)))
+            for i, k in enumerate(keys):
+                if have[i]:
+                    rolling[i] = states[k]["r"]
+                    ewma[i] = states[k]["e"]
+
+            added = (dates > asof) & (dates <= stable_end)
+            entered = added & (dates > window_start)
+            evicted = (dates > old_start) & (dates <= window_start) & (dates <= asof)
+            rolling += moment_sums(values[entered], src, tgt) - moment_sums(values[evicted], src, tgt)
+            k_new = int(added.sum())
+            if k_new:
+                ewma = decay(ewma, self.lam, k_new) + \
+                    moment_sums(values[added], src, tgt, self.lam ** np.arange(k_new - 1, -1, -1))
+
+            # Edges without current stored state (new or previously skipped) are built from scratch
+            if not have.all():
+                miss = ~have
+                r_new, e_new = self._full(values, dates, src[miss], tgt[miss], window_start, stable_end)
+                rolling[miss], ewma[miss] = r_new, e_new
+            full_at = meta["full_at"]
+            info.update(mode="incremental", added=k_new, evicted=int(evicted.sum()),
+                        rebuilt_edges=int((~have).sum()))
+        else:
+            rolling, ewma = self._full(values, dates, src, tgt, window_start, stable_end)
+            full_at = now
+
+        info["window_start"] = window_start
+        self._save({
+            "asof": str(pd.Timestamp(stable_end).date()),
+            "window_start": str(pd.Timestamp(window_start).date()),
+            "lam": self.lam, "window_days": self.window_days, "full_at": full_at
+        }, keys, rolling, ewma)
+
+        # Provisional newest bar (not persisted)
+        last = values[-1:]
+        rolling_now = rolling + moment_sums(last, src, tgt)
+        ewma_now = decay(ewma, self.lam, 1) + moment_sums(last, src, tgt)
+        return self._as_dict(rolling_now), self._as_dict(ewma_now), info
+
+    @staticmethod
+    def _as_dict(moments):
+        return {k: moments[:, j] for j, k in enumerate(MOMENT_KEYS)}
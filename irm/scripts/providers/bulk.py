@@ -0,0 +1,53 @@
+"""
+Process-wide memo for bulk upstream tables.
+
+Some endpoints (AkShare `bond_zh_us_rate`) return one wide multi-year table no matter
+which column the caller wants. Downloads are keyed by endpoint, shared by every
+provider instance in the process, and kept for a short TTL; concurrent requests for
+the same key wait on a single in-flight download instead of issuing their own.
+Column projection is left to the caller and done locally on a copy.
+"""
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+BULK_TABLE_TTL = int(os.getenv("IRM_BULK_TABLE_TTL", "600"))
+
+
+class BulkTableCache:
+    def __init__(self, ttl=BULK_TABLE_TTL):
+        self.ttl = ttl
+        self._tables = {}   # key -> (loaded_at, DataFrame)
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _lock(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, key, loader, ttl=None):
+        """Return the memoized table for key, calling loader() at most once per TTL window."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock(key):
+            hit = self._tables.get(key)
+            if hit and time.monotonic() - hit[0] < ttl:
+                return hit[1].copy()
+            t0 = time.perf_counter()
+            table = loader()
+            self._tables[key] = (time.monotonic(), table)
+            logger.info(f"[bulk] Loaded {key} ({len(table)} rows) in {time.perf_counter() - t0:.2f}s")
+            return table.copy()
+
+    def clear(self, key=None):
+        with self._guard:
+            if key is None:
+                self._tables.clear()
+            else:
+                self._tables.pop(key, None)
+
+
+# Shared by all providers in the process
+bulk_tables = BulkTableCache()
@@ -0,0 +1,207 @@
+"""
+Local incremental time-series cache wrapped around BaseProvider.fetch.
+
+Each (provider, symbol) series is stored as a Parquet file holding a date-indexed
+`value` column plus a small JSON sidecar (covered range, last refresh). A fetch only
+asks the upstream provider for the bars after the last cached date (with a short
+overlap to pick up revised or partial bars) once the entry is older than the
+provider's staleness rule; requests reaching further back than the cached range
+trigger a one-off backfill.
+"""
+import os
+import re
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+import pandas as pd
+from .base import BaseProvider
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("IRM_CACHE_DIR", "/home/pi-mono/.pi/agent/workspace/.irm/cache/series")
+
+# Seconds after which a cached series is refreshed from upstream, per provider
+STALENESS = {
+    "yfinance":     12 * 3600,
+    "fred":         24 * 3600,  # FRED publishes at most daily, often with a lag
+    "akshare_fund": 12 * 3600,
+    "akshare_bond": 12 * 3600,
+}
+DEFAULT_STALENESS = 12 * 3600
+
+# Days re-fetched before the last cached bar on incremental refresh
+OVERLAP_DAYS = 5
+
+VALUE_COLUMN = "value"
+
+
+class CachedProvider(BaseProvider):
+    """
+    Caching decorator for any provider. Returned frames are normalized to a
+    DatetimeIndex named 'date' and a single 'value' column.
+    """
+
+    def __init__(self, name: str, inner: BaseProvider, cache_dir: str = None):
+        self.name = name
+        self.inner = inner
+        self.cache_dir = os.path.join(cache_dir or CACHE_DIR, name)
+        self.staleness = STALENESS.get(name, DEFAULT_STALENESS)
+
+    def _paths(self, symbol):
+        safe = re.sub(r'[^\w.\-^=]', '_', symbol)
+        base = os.path.join(self.cache_dir, safe)
+        return base + ".parquet", base + ".meta.json"
+
+    def _load(self, symbol):
+        data_path, meta_path = self._paths(symbol)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, None
+        try:
+            df = pd.read_parquet(data_path)
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            return df, meta
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache for {self.name}:{symbol}: {e}")
+            return None, None
+
+    def _save(self, symbol, df, meta):
+        data_path, meta_path = self._paths(symbol)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write-then-rename so concurrent readers never see a partial file;
+        # per-thread temp names keep parallel prefetches of the same symbol apart
+        tmp = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_parquet(data_path + tmp)
+        os.replace(data_path + tmp, data_path)
+        with open(meta_path + tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + tmp, meta_path)
+
+    @staticmethod
+    def _as_frame(series):
+        if series is None or not len(series):
+            return pd.DataFrame(columns=[VALUE_COLUMN], index=pd.DatetimeIndex([], name="date"))
+        df = series.to_frame(VALUE_COLUMN).dropna()
+        df.index.name = "date"
+        return df
+
+    def _fetch_upstream(self, symbol, start_date):
+        raw = self.inner.fetch(symbol, start_date)
+        return self._as_frame(self.to_series(raw, self.inner.get_value_column(raw)))
+
+    def _plan(self, symbol, start_date, now):
+        """
+        Decide what a request needs from upstream.
+        :return: (action, fetch_from, cached, meta) with action in HIT / MISS / BACKFILL / REFRESH.
+        """
+        cached, meta = self._load(symbol)
+        if cached is None:
+            return "MISS", start_date, None, None
+        covered_from = meta.get("covered_from", start_date)
+        if pd.Timestamp(start_date) < pd.Timestamp(covered_from):
+            return "BACKFILL", start_date, cached, meta
+        if now.timestamp() - meta.get("fetched_at", 0) > self.staleness:
+            last = cached.index.max() if len(cached) else pd.Timestamp(covered_from)
+            since = max(last - timedelta(days=OVERLAP_DAYS), pd.Timestamp(covered_from))
+            return "REFRESH", since.strftime('%Y-%m-%d'), cached, meta
+        return "HIT", None, cached, meta
+
+    def _merge(self, symbol, action, fetch_from, cached, meta, fresh, start_date, now):
+        """Combine upstream bars with the cached entry, persist it and return the requested slice."""
+        if action == "MISS":
+            logger.info(f"[cache] MISS {self.name}:{symbol} -> full fetch from {start_date}")
+            merged, covered_from = fresh, start_date
+        elif action == "BACKFILL":
+            logger.info(f"[cache] BACKFILL {self.name}:{symbol} from {start_date} (cached from {meta.get('covered_from')})")
+            merged, covered_from = fresh.combine_first(cached), start_date
+        else:
+            since = pd.Timestamp(fetch_from)
+            covered_from = meta.get("covered_from", start_date)
+            # Fresh bars win on overlap (revisions / intraday partial bars)
+            merged = pd.concat([cached[cached.index < since], fresh]) if len(fresh) else cached
+            merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+            logger.info(f"[cache] REFRESH {self.name}:{symbol} +{max(len(merged) - len(cached), 0)} bar(s)")
+
+        try:
+            self._save(symbol, merged, {"covered_from": covered_from, "fetched_at": now.timestamp()})
+        except ImportError as e:
+            logger.warning(f"Parquet engine unavailable, cache disabled for this run: {e}")
+        except OSError as e:
+            logger.warning(f"Failed to persist cache for {self.name}:{symbol}: {e}")
+        return merged[merged.index >= pd.Timestamp(start_date)]
+
+    def fetch(self, symbol: str, start_date: str) -> pd.DataFrame:
+        now = datetime.now()
+        action, fetch_from, cached, meta = self._plan(symbol, start_date, now)
+        if action == "HIT":
+            return cached[cached.index >= pd.Timestamp(start_date)]
+        try:
+            fresh = self._fetch_upstream(symbol, fetch_from)
+        except Exception as e:
+            if action != "REFRESH":
+                raise
+            # Upstream hiccup: keep serving the stale entry, as fetch_many does
+            logger.warning(f"[cache] STALE {self.name}:{symbol} refresh failed: {e}")
+            return cached[cached.index >= pd.Timestamp(start_date)]
+        return self._merge(symbol, action, fetch_from, cached, meta, fresh, start_date, now)
+
+    def fetch_many(self, symbols, start_date: str) -> pd.DataFrame:
+        """
+        Serve cache hits locally and send everything else upstream through the inner
+        provider's batched fetch_many, one call per distinct fetch start (full history
+        for misses/backfills, the short overlap window for refreshes).
+        """
+        now = datetime.now()
+        symbols = list(dict.fromkeys(symbols))
+        plans = {s: self._plan(s, start_date, now) for s in symbols}
+
+        groups = {}
+        for symbol, (action, fetch_from, _, _) in plans.items():
+            if action != "HIT":
+                groups.setdefault(fetch_from, []).append(symbol)
+
+        series_map = {}
+        errors = {}
+        for fetch_from, group in groups.items():
+            wide = self.inner.fetch_many(group, fetch_from)
+            errors.update(wide.attrs.get('errors', {}))
+            for symbol in group:
+                action, _, cached, meta = plans[symbol]
+                if symbol in errors:
+                    if action == "REFRESH":
+                        # Upstream hiccup: keep serving the stale entry rather than dropping the symbol
+                        logger.warning(f"[cache] STALE {self.name}:{symbol} refresh failed: {errors.pop(symbol)}")
+                        series_map[symbol] = cached[cached.index >= pd.Timestamp(start_date)][VALUE_COLUMN]
+                    continue
+                fresh = self._as_frame(wide[symbol].dropna() if symbol in wide.columns else None)
+                merged = self._merge(symbol, action, fetch_from, cached, meta, fresh, start_date, now)
+                series_map[symbol] = merged[VALUE_COLUMN]
+
+        for symbol, (action, _, cached, _) in plans.items():
+            if action == "HIT":
+                series_map[symbol] = cached[cached.index >= pd.Timestamp(start_date)][VALUE_COLUMN]
+        return self.align(series_map, errors)
+
+    def fetch_latest(self, symbols, days=OVERLAP_DAYS):
+        """
+        Latest bars straight from upstream regardless of staleness (streaming daemon): one
+        batched inner fetch_many over the last `days`. The cache is not touched; persist
+        the bars with store_bars().
+        :return: aligned wide frame like fetch_many (failures in attrs['errors']).
+        """
+        start = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        return self.inner.fetch_many(list(dict.fromkeys(symbols)), start)
+
+    def store_bars(self, symbol, series):
+        """Merge streamed bars into the cached entry (fresh bars win); False when nothing is cached yet."""
+        cached, meta = self._load(symbol)
+        fresh = self._as_frame(series)
+        if cached is None or not len(fresh):
+            return False
+        self._merge(symbol, "REFRESH", fresh.index.min().strftime('%Y-%m-%d'), cached, meta, fresh,
+                    meta.get("covered_from", cached.index.min().strftime('%Y-%m-%d')), datetime.now())
+        return True
+
+    def get_value_column(self, df: pd.DataFrame) -> str:
+        return VALUE_COLUMN
@@ -1,68 +1,99 @@
 import os
 import json
+import argparse
 import logging
 import warnings
 from datetime import datetime, timedelta
-from urllib.parse import urlparse
-import pandas as pd
-import numpy as np
-from scipy import stats
-from falkordb import FalkorDB
-from openbb import obb
-import redis
+import sys
+from pathlib import Path
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.common.db import get_falkordb, get_redis, redis_address, TimedGraph
+from scripts.providers import get_provider
+from scripts.providers.fetcher import FetchRequest, prefetch
+from scripts.providers.graph_writes import unwind_write, split_changed
+# pandas / numpy / scipy (beta_state, edge_regression, returns) are imported where they are
+# used, so `calc_betas.py --help` and the job lock check stay light
 
 warnings.filterwarnings('ignore', category=FutureWarning)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 波动率状态分桶 (按当周收盘 VIX)：与 threshold_config 相同的 min/max 区间约定 [min, max)
+VIX_TICKER = "VIX"
+VIX_LEVEL_KEY = "VIX:level"
+REGIME_BUCKETS = [
+    {"min": 0, "max": 20},      # Calm
+    {"min": 20, "max": 40},     # Stressed
+    {"min": 40},                # Panic
+]
+MIN_REGIME_OBS = 12  # 每个分桶至少 ~一个季度的周线样本
+
+EDGE_MATCH = "MATCH (a:Asset {ticker: row.src})-[r]->(b:Asset {ticker: row.tgt}) WHERE type(r) = row.rel "
+
+
+def edge_key(source, target, rel_type):
+    return f"{source}-[{rel_type}]->{target}"
+
 class BetaCalculator:
-    def __init__(self, graph_name="Graph-001"):
+    def __init__(self, graph_name="Graph-001", mode=None, full=False, db=None, redis_client=None, sources=None):
+        """
+        :param mode: 'rolling' (3Y window OLS, default) or 'ewma' (exponentially weighted, 52w half-life).
+        :param full: ignore the stored online state and recompute every edge from history.
+        :param db / redis_client / sources: shared connections and preloaded `irm:config:sources` (e.g. from `irm refresh`).
+        """
         self.graph_name = graph_name
+        self.mode = mode or os.getenv("IRM_BETA_MODE", "rolling")
+        self.full = full
         self.data_cache = {}
+        self.vix_levels = None
+        from scripts.providers.beta_state import EdgeBetaState
+        from scripts.providers.returns import ReturnPanelCache
         
-        redis_url = os.getenv("REDIS_URL", "redis://127.0.0.1:6379")
-        parsed = urlparse(redis_url)
-        host = parsed.hostname or "127.0.0.1"
-        port = parsed.port or 6379
-        
-        self.fred_api_key = os.getenv("FRED_API_KEY")
+        host, port = redis_address()
         
         try:
-            self.db = FalkorDB(host=host, port=port)
-            self.graph = self.db.select_graph(graph_name)
+            self.db = db or get_falkordb()
+            self.graph = TimedGraph(self.db.select_graph(graph_name))
             logger.info(f"Connected to FalkorDB at {host}:{port}")
 
-            self.redis_client = redis.Redis(host=host, port=port, decode_responses=True)
+            self.redis_client = redis_client or get_redis()
+            self.returns_cache = ReturnPanelCache(self.redis_client, freq="W")
+            self.beta_state = EdgeBetaState(self.redis_client)
             logger.info("Connected to Redis for configuration.")
         except Exception as e:
             logger.error(f"Initialization Failed: {e}")
             self.graph = None
             self.redis_client = None
+            self.returns_cache = None
+            self.beta_state = EdgeBetaState(None)
 
-        self.asset_config = self._build_asset_config()
+        self.asset_config = self._build_asset_config(sources)
 
-    def _build_asset_config(self):
+    def _build_asset_config(self, sources=None):
         config = {}
         try:
-            if self.redis_client:
-                assets = self.redis_client.hgetall("irm:config:sources")
-                for ticker, data_str in assets.items():
-                    data = json.loads(data_str)
-                    config[ticker] = {
-                        'symbol': data.get('symbol'),
-                        'provider': data.get('provider')
-                    }
+            if sources is None and self.redis_client:
+                sources = {t: json.loads(s) for t, s in self.redis_client.hgetall("irm:config:sources").items()}
+            for ticker, data in (sources or {}).items():
+                config[ticker] = {
+                    'symbol': data.get('symbol'),
+                    'provider': data.get('provider')
+                }
         except Exception as e:
             logger.warning(f"Failed to fetch override config from Redis: {e}")
         return config
 
-    def query_falkor(self, cypher):
+    def query_falkor(self, cypher, params=None):
         if not self.graph:
             return None
-        return self.graph.query(cypher)
+        return self.graph.query(cypher, params)
 
-    def fetch_historical_data(self, ticker, metric_type):
+    def fetch_historical_data(self, ticker, metric_type, prefetched=None):
         if ticker in self.data_cache:
             return self.data_cache[ticker]
 
@@ -75,121 +106,258 @@ class BetaCalculator:
         provider = config['provider']
         asset_type = metric_type  # From Graph
 
-        start_date = (datetime.now() - timedelta(days=3*365)).strftime('%Y-%m-%d')
-        df = pd.DataFrame()
-
         try:
-            logger.info(f"Fetching 3Y historical data for {ticker} ({symbol} via {provider})")
-            if provider == 'yfinance':
-                res = obb.equity.price.historical(symbol=symbol, provider='yfinance', start_date=start_date)
-            elif provider == 'fred':
-                if not self.fred_api_key:
-                    logger.error(f"Missing FRED_API_KEY to fetch {ticker}")
+            if prefetched is not None:
+                if prefetched.error:
+                    # 记住失败，build_panel 不会再逐个串行回源重试
+                    self.data_cache[ticker] = None
                     return None
-                res = obb.economy.fred_series(symbol=symbol, provider='fred', start_date=start_date, api_key=self.fred_api_key)
-            else:
-                return None
-
-            df = res.to_dataframe()
-            if df.empty:
-                return None
-
-            # 探测数值列
-            if provider == 'yfinance':
-                value_col = 'close'
+                df, value_col = prefetched.df, prefetched.value_col
             else:
-                cols = [c for c in df.columns if c.lower() not in ['date', 'index']]
-                value_col = cols[0] if cols else None
+                logger.info(f"Fetching 3Y historical data for {ticker} ({symbol} via {provider})")
+                # Provider registry (with local incremental cache): only new bars hit the network
+                provider_inst = get_provider(provider)
+                df = provider_inst.fetch(symbol, self.start_date())
+                if df.empty:
+                    return None
 
-            if not value_col or value_col not in df.columns:
-                return None
+                value_col = provider_inst.get_value_column(df)
+                if not value_col or value_col not in df.columns:
+                    return None
 
-            # 清理和对齐索引为 DatetimeIndex
-            series = df[[value_col]].copy()
-            series.index = pd.to_datetime(series.index)
             # 降采样到周线周末收盘 (Weekly Returns)，平滑日常噪音
-            weekly_series = series.resample('W-FRI').last()
-            
-            # 区分计算方式
-            if asset_type in ['rate', 'volatility']:
-                # 收益率本身就是百分比，不需要再算百分比，计算绝对增量
-                returns = weekly_series[value_col].diff()
-            else:
-                # 股票/ETF/大宗/外汇 算对数收益率或百分比变化
-                returns = weekly_series[value_col].pct_change() * 100.0
-
-            returns = returns.dropna()
+            # Rate 类计算绝对增量 (diff)，其他资产计算百分比变化
+            from scripts.providers.returns import to_returns, return_unit
+            returns = to_returns(df[value_col], asset_type, freq="W")
             self.data_cache[ticker] = returns
+
+            # 共享给联合凯利/风险引擎，避免重复拉取多年历史
+            if self.returns_cache:
+                try:
+                    self.returns_cache.put(ticker, returns, unit=return_unit(asset_type))
+                except Exception as e:
+                    logger.warning(f"Failed to cache weekly returns for {ticker}: {e}")
             return returns
 
         except Exception as e:
             logger.error(f"Error fetching data for {ticker}: {e}")
             return None
 
-    def run(self):
+    @staticmethod
+    def start_date():
+        # 3Y window plus an eviction margin (see beta_state.HISTORY_DAYS)
+        from scripts.providers.beta_state import HISTORY_DAYS
+        return (datetime.now() - timedelta(days=HISTORY_DAYS)).strftime('%Y-%m-%d')
+
+    def prefetch_series(self, metric_types, known=None):
+        """
+        并发预取所有边端点的 3Y 历史并转换为周收益 (按 provider 限流)。
+        :param metric_types: {ticker: metric_type}
+        :param known: {ticker: FetchResult} 已由同进程其他阶段拉取的序列 (如价格信号的 10Y 历史)，截取 3Y 后复用
+        """
+        start_date = self.start_date()
+        known = {k: r._replace(df=r.df[r.df.index >= start_date])
+                 for k, r in (known or {}).items() if r.error is None}
+        requests = []
+        for ticker in sorted(metric_types):
+            config = self.asset_config.get(ticker)
+            if not config:
+                logger.warning(f"No configuration found in Redis for {ticker}")
+                continue
+            if ticker not in self.data_cache and ticker not in known:
+                requests.append(FetchRequest(ticker, config['provider'], config['symbol'], start_date))
+
+        # VIX 水平序列用于分状态 Beta (若 VIX 本身是边端点，同一 symbol 在批量请求中去重)
+        vix_config = self.asset_config.get(VIX_TICKER)
+        if vix_config and self.vix_levels is None and VIX_TICKER not in known:
+            requests.append(FetchRequest(VIX_LEVEL_KEY, vix_config['provider'], vix_config['symbol'], start_date))
+
+        summary = prefetch(requests)
+        summary.log("Beta prefetch" + (f" ({len(known)} series reused)" if known else ""))
+        vix_result = summary.results.pop(VIX_LEVEL_KEY, None) or known.get(VIX_TICKER)
+        if vix_result is not None and vix_result.error is None:
+            import pandas as pd
+            from scripts.providers.returns import RESAMPLE_RULES
+            levels = vix_result.df[vix_result.value_col].astype(float)
+            levels.index = pd.to_datetime(levels.index)
+            self.vix_levels = levels.resample(RESAMPLE_RULES["W"]).last()
+        for ticker in metric_types:
+            if ticker in known:
+                summary.results[ticker] = known[ticker]
+        for ticker, result in summary.results.items():
+            self.fetch_historical_data(ticker, metric_types[ticker], prefetched=result)
+        return summary
+
+    def regime_betas(self, panel, edges, window_start=None):
+        """
+        每条边在各 VIX 分桶内的 Beta (与基准 Beta 同一面板、同一窗口，每个分桶一次向量化 OLS)。
+        :return: list (per edge) of JSON strings like threshold_config, or None when no bucket has enough data.
+        """
+        if self.vix_levels is None or panel.empty:
+            return [None] * len(edges)
+        import numpy as np
+        from scripts.providers.edge_regression import pairwise_ols
+
+        rows = panel.index.values > window_start if window_start is not None else np.ones(len(panel), dtype=bool)
+        values = panel.to_numpy(dtype=float)[rows]
+        vix = self.vix_levels.reindex(panel.index).to_numpy(dtype=float)[rows]
+        col = {t: j for j, t in enumerate(panel.columns)}
+        src = [col[e[0]] for e in edges]
+        tgt = [col[e[1]] for e in edges]
+
+        buckets = [[] for _ in edges]
+        for bucket in REGIME_BUCKETS:
+            in_bucket = (vix >= bucket.get("min", -np.inf)) & (vix < bucket.get("max", np.inf))
+            if in_bucket.sum() < MIN_REGIME_OBS:
+                continue
+            fit = pairwise_ols(values[in_bucket], src, tgt, min_obs=MIN_REGIME_OBS)
+            for i in np.nonzero(fit["valid"])[0]:
+                buckets[i].append({**bucket, "beta": round(float(fit["slope"][i]), 3),
+                                   "n": int(fit["n"][i]), "p": round(float(fit["pvalue"][i]), 4)})
+        return [json.dumps(b) if b else None for b in buckets]
+
+    def build_panel(self, metric_types):
+        """Aligned weekly return panel (dates x tickers) for every ticker with data."""
+        import pandas as pd
+        series = {}
+        for ticker, metric_type in metric_types.items():
+            returns = self.fetch_historical_data(ticker, metric_type)
+            if returns is not None and len(returns):
+                series[ticker] = returns
+        if not series:
+            return pd.DataFrame()
+        return pd.concat(series, axis=1).sort_index()
+
+    def run(self, prefetched=None):
+        """:param prefetched: {ticker: FetchResult} of 3Y series already fetched in this process."""
         if not self.graph:
             return
+        from scripts.providers.edge_regression import pairwise_ols, ols_from_moments
 
         # 获取所有两端都是 Asset 且包含基准贝塔的宏观传导边
         cypher = """
         MATCH (a:Asset)-[r]->(b:Asset)
         WHERE type(r) IN ['PRICES', 'DRIVES', 'SPILLS_TO', 'CORRELATES_WITH'] 
           AND r.base_beta IS NOT NULL
-        RETURN a.ticker, b.ticker, type(r), r.base_beta, a.metric_type, b.metric_type
+        RETURN a.ticker, b.ticker, type(r), r.base_beta, a.metric_type, b.metric_type, r.regime_betas
         """
         res = self.query_falkor(cypher)
         if not res or not res.result_set:
             logger.info("No eligible edges found to calc beta.")
             return
 
-        updates = []
+        # 边上当前存储的 Beta，用于跳过未变化的写入
+        stored = {edge_key(row[0], row[1], row[2]): {"beta": row[3], "regime": row[6]} for row in res.result_set}
+
+        # 先并发拉取所有端点的序列，回归阶段只读内存
+        metric_types = {}
         for row in res.result_set:
-            source, target, rel_type, current_beta, source_type, target_type = row[0], row[1], row[2], row[3], row[4], row[5]
+            metric_types.setdefault(row[0], row[4])
+            metric_types.setdefault(row[1], row[5])
+        summary = self.prefetch_series(metric_types, known=prefetched)
 
-            # 读取时间序列
-            x_series = self.fetch_historical_data(source, source_type)
-            y_series = self.fetch_historical_data(target, target_type)
+        # 一次性构建所有端点的对齐周收益面板 (日期外连接，缺失为 NaN)
+        panel = self.build_panel(metric_types)
 
-            if x_series is None or y_series is None:
+        edges = []
+        skipped = []
+        for row in res.result_set:
+            source, target, rel_type, current_beta = row[0], row[1], row[2], row[3]
+            missing = [t for t in (source, target) if t not in panel.columns]
+            if missing:
+                skipped.append(f"{source}->{target} (no data: {', '.join(missing)})")
                 continue
+            edges.append((source, target, rel_type, current_beta))
 
-            # 对齐数据（按日期交集）
-            aligned_df = pd.concat([x_series, y_series], axis=1, join='inner').dropna()
-            if len(aligned_df) < 50:  # 至少需要约1年的周线数据 (~50周)
-                logger.warning(f"Not enough overlapping data points for {source} -> {target} ({len(aligned_df)})")
-                continue
+        if not edges:
+            logger.warning("No edge has return data on both ends.")
+            return
 
-            # X 为自变量, Y 为因变量
-            x_vals = aligned_df.iloc[:, 0].values
-            y_vals = aligned_df.iloc[:, 1].values
+        # 在线回归: Redis 中保存每条边的充分统计量，平常周只折叠新收盘的周线 (O(1)/边)
+        # Y(target) = beta * X(source) + alpha；至少需要约1年的周线数据 (~50周)
+        rolling, ewma, info = self.beta_state.update(panel, [(e[0], e[2], e[1]) for e in edges], full=self.full)
+        if info["mode"] == "incremental":
+            logger.info(f"Online beta state: +{info['added']} / -{info['evicted']} weekly bar(s), "
+                        f"{info['rebuilt_edges']} new edge(s) built from history.")
+        else:
+            logger.info(f"Online beta state: full recompute for {len(edges)} edge(s).")
 
-            # 使用 scipy 计算线性回归 OLS 
-            # Y = beta*X + alpha
-            slope, intercept, r_value, p_value, std_err = stats.linregress(x_vals, y_vals)
+        if self.mode == "ewma":
+            fit = ols_from_moments(ewma, min_obs=50)
+        elif info["mode"] == "full":
+            # 全量重算时直接在窗口内做中心化 OLS (与 linregress 一致)
+            col = {t: j for j, t in enumerate(panel.columns)}
+            in_window = panel.index.values > info["window_start"] if info["window_start"] is not None else slice(None)
+            fit = pairwise_ols(panel.to_numpy(dtype=float)[in_window],
+                               [col[e[0]] for e in edges], [col[e[1]] for e in edges], min_obs=50)
+        else:
+            fit = ols_from_moments(rolling, min_obs=50)
+
+        # 分状态 Beta：同一面板/窗口按 VIX 分桶，供 tracer 替代合成的 Gamma 放大曲线
+        regimes = self.regime_betas(panel, edges, info["window_start"])
+        regime_rows = [
+            {"key": edge_key(e[0], e[1], e[2]), "src": e[0], "tgt": e[1], "rel": e[2], "regime": regimes[i]}
+            for i, e in enumerate(edges) if regimes[i] is not None
+        ]
+
+        updates = []
+        for i, (source, target, rel_type, current_beta) in enumerate(edges):
+            if not fit["valid"][i]:
+                logger.warning(f"Not enough overlapping data points for {source} -> {target} ({fit['n'][i]})")
+                skipped.append(f"{source}->{target} (overlap {fit['n'][i]})")
+                continue
+
+            slope, r_value, p_value = fit["slope"][i], fit["rvalue"][i], fit["pvalue"][i]
 
             # 更新策略
             # P值 < 0.1 代表统计学显著。如果完全不相关，这根边在宏观上可能没有纯线性意义，但可能存在非线性意义
             is_significant = p_value < 0.1
             
             logger.info(f"Edge: {source} -> {target} ({rel_type}) | Old Beta: {current_beta:.2f} | "
-                        f"New Calc Beta: {slope:.3f} | R2: {r_value**2:.3f} | P-val: {p_value:.4f}")
+                        f"New Calc Beta ({self.mode}): {slope:.3f} | R2: {r_value**2:.3f} | P-val: {p_value:.4f} | "
+                        f"SE: {fit['stderr'][i]:.3f}")
             
             if is_significant:
-                updates.append((source, target, rel_type, slope))
+                updates.append({"key": edge_key(source, target, rel_type), "src": source, "tgt": target,
+                                "rel": rel_type, "beta": round(float(slope), 3)})
             else:
                 logger.warning(f"  -> Skipping update for {source}->{target}: Regression not statistically significant (p={p_value:.4f})")
 
-        # 批量写回核心数据库
+        # 只写回超出 IRM_CHANGE_EPSILON 的变化 (未收盘周内的重复运行通常是空操作)
+        updates, unchanged = split_changed(updates, stored, ["beta"])
+        regime_rows, regime_unchanged = split_changed(regime_rows, stored, ["regime"])
+        logger.info(f"Edge betas: {len(updates)} changed, {len(unchanged)} unchanged; "
+                    f"regime betas: {len(regime_rows)} changed, {len(regime_unchanged)} unchanged.")
+
+        # 批量写回核心数据库 (分块 UNWIND，RETURN 回报每条边的写入结果)
         if updates:
             logger.info("Committing updated betas to FalkorDB...")
-            for src, tgt, rtype, new_beta in updates:
-                update_cypher = f"""
-                MATCH (a:Asset {{ticker: '{src}'}})-[r:{rtype}]->(b:Asset {{ticker: '{tgt}'}})
-                SET r.base_beta = {new_beta:.3f}
-                """
-                self.query_falkor(update_cypher)
-            logger.info(f"Successfully updated {len(updates)} edge(s)!")
+            result = unwind_write(self.graph, EDGE_MATCH + "SET r.base_beta = row.beta", updates)
+            result.log("Base beta write")
+            logger.info(f"Successfully updated {len(result.written)} edge(s)!")
+        if regime_rows:
+            result = unwind_write(self.graph, EDGE_MATCH + "SET r.regime_betas = row.regime", regime_rows)
+            result.log("Regime beta write")
+            logger.info(f"Stored VIX regime betas on {len(result.written)} edge(s).")
+        elif self.vix_levels is None:
+            logger.warning(f"No {VIX_TICKER} source configured or fetched; regime betas not computed.")
+        if skipped:
+            logger.warning(f"Skipped {len(skipped)} edge(s): {'; '.join(skipped)}")
+        if summary.failed:
+            logger.warning(f"Series unavailable: {sorted(summary.failed)}")
 
 if __name__ == "__main__":
-    calculator = BetaCalculator()
-    calculator.run()
+    parser = argparse.ArgumentParser(description="IRM Edge Beta Calculator")
+    parser.add_argument("--mode", choices=["rolling", "ewma"], default=None,
+                        help="Beta estimator: rolling 3Y window OLS or EWMA (default: IRM_BETA_MODE or rolling)")
+    parser.add_argument("--full", action="store_true", help="Force a full recompute of the online regression state")
+    parser.add_argument("--coalesce", action="store_true",
+                        help="If the job is already running, request one more run from it instead of skipping")
+    args = parser.parse_args()
+
+    from scripts.providers.job_lock import run_exclusive, BUSY
+
+    calculator = BetaCalculator(mode=args.mode, full=args.full)
+    status = run_exclusive("calc-betas", calculator.run, resources=["betas"],
+                           coalesce=args.coalesce, redis_client=calculator.redis_client)
+    sys.exit(1 if status == BUSY else 0)
@@ -0,0 +1,102 @@
+"""
+Concurrent prefetch stage for update jobs.
+
+All series a job needs are requested up front. Requests are grouped per provider and
+handed to that provider's batched `fetch_many` (one multi-ticker download for
+yfinance, one table pull for AkShare bonds, bounded parallel requests for FRED and
+fund NAVs), while the provider groups themselves run concurrently. Failures are
+isolated per request and collected into a summary, so wall time approaches the
+slowest single fetch rather than the sum of all round trips.
+"""
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+from .transport import log_transport_metrics
+
+logger = logging.getLogger(__name__)
+
+# Transport rate limits bound upstream load, so provider groups can all run at once
+MAX_WORKERS = int(os.getenv("IRM_FETCH_WORKERS", "16"))
+
+VALUE_COLUMN = "value"
+
+
+class FetchRequest(NamedTuple):
+    key: str          # caller's identifier, usually the graph ticker
+    provider: str
+    symbol: str
+    start_date: str
+
+
+class FetchResult(NamedTuple):
+    key: str
+    df: object        # DataFrame with a single 'value' column, or None
+    value_col: str
+    error: str
+    elapsed: float
+
+
+class FetchSummary:
+    def __init__(self, results, wall_time, calls=0):
+        self.results = results
+        self.wall_time = wall_time
+        self.calls = calls
+
+    @property
+    def ok(self):
+        return {k: r for k, r in self.results.items() if r.error is None}
+
+    @property
+    def failed(self):
+        return {k: r for k, r in self.results.items() if r.error is not None}
+
+    def log(self, label="Prefetch"):
+        slowest = max((r.elapsed for r in self.results.values()), default=0.0)
+        logger.info(f"{label}: {len(self.ok)}/{len(self.results)} series fetched in {self.wall_time:.2f}s "
+                    f"({self.calls} batched provider call(s), slowest {slowest:.2f}s)")
+        for key, r in sorted(self.failed.items()):
+            logger.warning(f"  [FAILED] {key}: {r.error}")
+        log_transport_metrics()
+
+
+def prefetch(requests, max_workers=None):
+    """
+    Fetch every request and return a FetchSummary keyed by request.key.
+    One batched fetch_many call per (provider, start_date) group; groups run in parallel.
+    """
+    from scripts.providers import get_provider
+
+    groups = {}
+    for req in requests:
+        groups.setdefault((req.provider, req.start_date), []).append(req)
+
+    def _run(item):
+        (provider, start_date), reqs = item
+        t0 = time.perf_counter()
+        try:
+            wide = get_provider(provider).fetch_many([r.symbol for r in reqs], start_date)
+            errors = wide.attrs.get('errors', {})
+        except Exception as e:
+            wide, errors = None, {r.symbol: str(e).split('\n')[0] for r in reqs}
+        elapsed = time.perf_counter() - t0
+
+        out = []
+        for r in reqs:
+            if wide is not None and r.symbol in wide.columns:
+                df = wide[[r.symbol]].dropna().rename(columns={r.symbol: VALUE_COLUMN})
+                if len(df):
+                    out.append(FetchResult(r.key, df, VALUE_COLUMN, None, elapsed))
+                    continue
+            out.append(FetchResult(r.key, None, None, errors.get(r.symbol, "No valid data returned"), elapsed))
+        return out
+
+    t0 = time.perf_counter()
+    results = {}
+    if groups:
+        with ThreadPoolExecutor(max_workers=max_workers or min(MAX_WORKERS, len(groups))) as pool:
+            for batch in pool.map(_run, groups.items()):
+                for res in batch:
+                    results[res.key] = res
+    return FetchSummary(results, time.perf_counter() - t0, calls=len(groups))
@@ -2,10 +2,14 @@ import os
 import pandas as pd
 import logging
 from .base import BaseProvider
+from .transport import get_transport
 
 logger = logging.getLogger(__name__)
 
 class FredProvider(BaseProvider):
+    # No multi-series endpoint: fetch_many runs single-series requests in parallel
+    max_concurrency = 8
+
     def __init__(self):
         # FRED provider requires an API key
         self.api_key = os.getenv("FRED_API_KEY")
@@ -18,7 +22,8 @@ class FredProvider(BaseProvider):
         from openbb import obb
         try:
             # Use api_key passed to fred_series directly
-            res = obb.economy.fred_series(symbol=symbol, provider='fred', start_date=start_date, api_key=self.api_key)
+            res = get_transport('fred').call(obb.economy.fred_series, symbol=symbol, provider='fred',
+                                             start_date=start_date, api_key=self.api_key)
             return res.to_dataframe()
         except Exception as e:
             raise RuntimeError(f"Failed to fetch data from Fred for symbol {symbol}: {e}")
@@ -0,0 +1,130 @@
+"""
+Per-trading-day fundamentals snapshot shared by the earnings and PE updaters.
+
+`obb.equity.fundamental.metrics` returns a one-row frame per ticker (P/E, earnings
+growth, ...). Both Hub updaters need it for overlapping tickers, so the metrics are
+fetched once per trading day, concurrently, and persisted as one JSON file per day.
+A file lock makes the jobs that Dkron fires at the same minute share one download:
+the second waits for the first and then only fetches tickers still missing.
+"""
+import os
+import json
+import math
+import fcntl
+import logging
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from .transport import get_transport
+
+logger = logging.getLogger(__name__)
+
+# Sibling of the series cache; resolved here so reading a snapshot never imports pandas
+FUNDAMENTALS_DIR = os.getenv("IRM_FUNDAMENTALS_DIR", os.path.join(
+    os.path.dirname(os.getenv("IRM_CACHE_DIR", "/home/pi-mono/.pi/agent/workspace/.irm/cache/series")), "fundamentals"))
+FETCH_CONCURRENCY = 4
+KEEP_DAYS = 7
+
+
+def trading_day(now=None):
+    """Latest weekday (US session date); weekend runs reuse Friday's snapshot."""
+    day = (now or datetime.now()).date()
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day.isoformat()
+
+
+def _scalar(value):
+    """JSON-safe scalar: NaN/NaT -> None, numpy types -> Python."""
+    if value is None:
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, (int, float, str, bool)):
+        return value
+    return str(value)
+
+
+def fetch_metrics(ticker):
+    """Latest yfinance fundamental metrics of one ticker as a flat dict (replay fixtures when overridden)."""
+    if os.getenv("IRM_PROVIDER_OVERRIDE", "").lower() == "replay":
+        from .replay_provider import ReplayProvider
+        return ReplayProvider("fundamentals").metrics(ticker, _fetch_live)
+    return _fetch_live(ticker)
+
+
+def _fetch_live(ticker):
+    from openbb import obb
+    data = get_transport('yfinance').call(obb.equity.fundamental.metrics, ticker, provider="yfinance")
+    df = data.to_dataframe()
+    if df.empty:
+        raise ValueError(f"No metrics data returned for {ticker}")
+    return {str(k): _scalar(v) for k, v in df.iloc[-1].items()}
+
+
+class FundamentalsSnapshot:
+    def __init__(self, day=None, directory=None):
+        self.day = day or trading_day()
+        self.directory = directory or FUNDAMENTALS_DIR
+        self.path = os.path.join(self.directory, f"{self.day}.json")
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("metrics", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, metrics):
+        tmp = self.path + f".{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"date": self.day, "updated_at": datetime.now().isoformat(timespec="seconds"),
+                       "metrics": metrics}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def _prune(self):
+        cutoff = (datetime.now() - timedelta(days=KEEP_DAYS)).date().isoformat()
+        for name in os.listdir(self.directory):
+            # {day}.json and its {day}.json.lock
+            if name.startswith("20") and name.split(".")[0] < cutoff:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def get(self, tickers):
+        """
+        Metrics for every ticker, fetching only the ones missing from today's snapshot.
+        :return: ({ticker: metrics_dict}, {ticker: error}) for the requested tickers.
+        """
+        tickers = sorted(set(t for t in tickers if t))
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            metrics = self._read()
+            missing = [t for t in tickers if t not in metrics]
+            errors = {}
+            if missing:
+                logger.info(f"Fundamentals snapshot {self.day}: fetching {len(missing)} ticker(s) "
+                            f"({len(tickers) - len(missing)} already cached).")
+
+                def _one(ticker):
+                    try:
+                        return ticker, fetch_metrics(ticker), None
+                    except Exception as e:
+                        return ticker, None, str(e).split('\n')[0]
+
+                with ThreadPoolExecutor(max_workers=min(FETCH_CONCURRENCY, len(missing))) as pool:
+                    for ticker, row, err in pool.map(_one, missing):
+                        if row is not None:
+                            metrics[ticker] = row
+                        else:
+                            errors[ticker] = err
+                            logger.warning(f"Failed to fetch fundamentals for {ticker}: {err}")
+                self._write(metrics)
+                self._prune()
+            else:
+                logger.info(f"Fundamentals snapshot {self.day}: all {len(tickers)} ticker(s) served from cache.")
+        return {t: metrics[t] for t in tickers if t in metrics}, errors
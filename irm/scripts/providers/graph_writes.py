@@ -0,0 +1,94 @@
+"""
+Batched graph writes for the update jobs.
+
+Instead of one `MATCH ... SET` round trip (and graph write lock) per node, a job
+collects its rows and commits them with a parameterized
+`UNWIND $rows AS row <MATCH ... SET ...> RETURN DISTINCT row.<key>` in chunks.
+The RETURN clause reports which rows actually matched, so per-row success or
+failure is still available: unmatched rows and rows of a chunk whose query raised
+are returned as failures with a reason.
+
+`split_changed` compares freshly computed rows with the values currently stored in
+the graph, so jobs only write rows that actually moved (weekends, holidays and
+unchanged fundamentals become no-op runs).
+"""
+import os
+import logging
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = int(os.getenv("IRM_WRITE_CHUNK", "500"))
+# Absolute tolerance for "unchanged" numeric properties; a negative value disables the guard
+CHANGE_EPSILON = float(os.getenv("IRM_CHANGE_EPSILON", "1e-6"))
+
+
+class WriteResult(NamedTuple):
+    written: list     # row keys that matched and were SET
+    failed: dict      # row key -> reason
+    queries: int      # round trips issued
+
+    def log(self, label="Graph write"):
+        total = len(self.written) + len(self.failed)
+        logger.info(f"{label}: {len(self.written)}/{total} row(s) written in {self.queries} batched query(ies).")
+        for key, reason in sorted(self.failed.items(), key=lambda kv: str(kv[0])):
+            logger.warning(f"  [WRITE FAILED] {key}: {reason}")
+
+
+def unwind_write(graph, body, rows, key="key", chunk_size=None):
+    """
+    Apply `body` (a MATCH ... SET ... clause over `row`) to every row via chunked UNWIND.
+    :param graph: FalkorDB graph handle.
+    :param rows: list of dicts, each carrying a unique `key` field.
+    :return: WriteResult
+    """
+    chunk_size = max(1, chunk_size or CHUNK_SIZE)
+    cypher = f"UNWIND $rows AS row {body} RETURN DISTINCT row.{key}"
+    written, failed, queries = [], {}, 0
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        queries += 1
+        try:
+            result = graph.query(cypher, {"rows": chunk})
+        except Exception as e:
+            reason = str(e).split('\n')[0]
+            logger.error(f"Batched write of {len(chunk)} row(s) failed: {reason}")
+            failed.update({row[key]: reason for row in chunk})
+            continue
+        matched = {r[0] for r in result.result_set}
+        for row in chunk:
+            if row[key] in matched:
+                written.append(row[key])
+            else:
+                failed[row[key]] = "no matching node/edge"
+    return WriteResult(written, failed, queries)
+
+
+def _same(new, old, epsilon):
+    if old is None or new is None:
+        return new is None and old is None
+    if isinstance(new, (int, float)) and isinstance(old, (int, float)) \
+            and not isinstance(new, bool) and not isinstance(old, bool):
+        return abs(float(new) - float(old)) <= epsilon
+    return new == old
+
+
+def split_changed(rows, stored, fields, key="key", epsilon=None):
+    """
+    Partition rows into (changed, unchanged_keys) against the stored state.
+    :param stored: {row key: {field: current value}}; rows whose key is missing count as changed.
+    :param fields: row fields mapped to properties; a row is unchanged when all are within epsilon
+                   (numbers) or equal (other values).
+    """
+    epsilon = CHANGE_EPSILON if epsilon is None else epsilon
+    if epsilon < 0:
+        return list(rows), []
+    changed, unchanged = [], []
+    for row in rows:
+        current = stored.get(row[key])
+        if current is not None and all(_same(row[f], current.get(f), epsilon) for f in fields):
+            unchanged.append(row[key])
+        else:
+            changed.append(row)
+    return changed, unchanged
+
@@ -0,0 +1,385 @@
+"""
+Redis lease locks for the scheduled update jobs (`irm jobs`).
+
+A run leases every resource it writes (the refresh stage names: prices, betas,
+weights, ...) with one atomic all-or-nothing SET NX PX, so an overrunning Dkron
+run and its next trigger, or `irm refresh` and a manual update_price_signals,
+never fetch the same data twice or race on graph writes.
+
+* heartbeat: a daemon thread renews the lease every lease/3 while the job runs and
+  gives up after IRM_JOB_MAX_RUNTIME_S, so a hung run eventually loses its lease.
+* stale takeover: a lease expires when its holder stops renewing (crash, kill -9,
+  hang); a holder on this host whose pid is gone is taken over immediately.
+* coalesce: a trigger that finds the same job running marks a rerun instead of
+  starting a parallel run; the holder repeats its run once before releasing.
+  The rerun flag is checked and the lease released in one script, so no trigger is lost.
+
+    irm:jobs:lock:{resource}   string "job|host|pid|token" with PX lease
+    irm:jobs:job:{job}         hash: current holder, heartbeat, rerun flag, last run
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import logging
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import redis
+
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.common.db import get_redis
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = "irm:jobs:lock:{resource}"
+JOB_KEY = "irm:jobs:job:{job}"
+LEASE_S = float(os.getenv("IRM_JOB_LEASE_S", "60"))
+MAX_RUNTIME_S = float(os.getenv("IRM_JOB_MAX_RUNTIME_S", str(6 * 3600)))
+# Seconds a job waits for busy resources before giving up (short holders such as price-stream ticks)
+WAIT_S = float(os.getenv("IRM_JOB_WAIT_S", "120"))
+# IRM_JOB_LOCK=0 runs jobs without leases (single-host debugging)
+LOCKING = os.getenv("IRM_JOB_LOCK", "1") != "0"
+
+DONE, FAILED, BUSY, COALESCED = "done", "failed", "busy", "coalesced"
+
+# KEYS: lock keys; ARGV: value, lease ms. Returns {} or the first busy {key, value}.
+ACQUIRE = """
+for _, k in ipairs(KEYS) do
+  local v = redis.call('GET', k)
+  if v then return {k, v} end
+end
+for _, k in ipairs(KEYS) do redis.call('SET', k, ARGV[1], 'PX', ARGV[2]) end
+return {}
+"""
+
+# KEYS: lock keys; ARGV: value, lease ms. Returns how many leases are still ours.
+RENEW = """
+local n = 0
+for _, k in ipairs(KEYS) do
+  if redis.call('GET', k) == ARGV[1] then redis.call('PEXPIRE', k, ARGV[2]); n = n + 1 end
+end
+return n
+"""
+
+# KEYS: job hash, lock keys; ARGV: value, '1' to honour a pending rerun. Returns 0 to rerun, 1 when released.
+# A pending rerun is cleared either way, so a failed run does not leave the request behind.
+RELEASE = """
+if redis.call('HGET', KEYS[1], 'rerun') == '1' then
+  redis.call('HSET', KEYS[1], 'rerun', '0')
+  if ARGV[2] == '1' then return 0 end
+end
+for i = 2, #KEYS do
+  if redis.call('GET', KEYS[i]) == ARGV[1] then redis.call('DEL', KEYS[i]) end
+end
+return 1
+"""
+
+# KEYS: job hash, lock keys; ARGV: 'job|' prefix. Flags a rerun if the same job holds any of the leases.
+REQUEST_RERUN = """
+for i = 2, #KEYS do
+  local v = redis.call('GET', KEYS[i])
+  if v and string.sub(v, 1, #ARGV[1]) == ARGV[1] then
+    redis.call('HSET', KEYS[1], 'rerun', '1')
+    redis.call('HINCRBY', KEYS[1], 'coalesced', 1)
+    return 1
+  end
+end
+return 0
+"""
+
+# KEYS: lock keys; ARGV: value. Deletes the leases that still carry exactly this value.
+TAKEOVER = """
+local n = 0
+for _, k in ipairs(KEYS) do
+  if redis.call('GET', k) == ARGV[1] then redis.call('DEL', k); n = n + 1 end
+end
+return n
+"""
+
+
+def get_redis_client():
+    """Process-wide Redis client (scripts.common.db)."""
+    return get_redis()
+
+
+def parse_holder(value):
+    """'job|host|pid|token' -> dict (None for foreign values)."""
+    parts = (value or "").split("|")
+    if len(parts) != 4:
+        return None
+    return {"job": parts[0], "host": parts[1], "pid": parts[2], "token": parts[3]}
+
+
+def holder_dead(value):
+    """True when the lease belongs to a process on this host that no longer exists."""
+    holder = parse_holder(value)
+    if not holder or holder["host"] != socket.gethostname() or not holder["pid"].isdigit():
+        return False
+    pid = int(holder["pid"])
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+class JobLock:
+    def __init__(self, job, resources=None, redis_client=None, lease_s=None, max_runtime_s=None):
+        """
+        :param job: job name shown by `irm jobs` and used for coalescing (e.g. 'refresh').
+        :param resources: leased resources, defaults to [job]; jobs writing the same data must share one.
+        """
+        self.job = job
+        self.resources = sorted(set(resources or [job]))
+        self.keys = [LOCK_KEY.format(resource=r) for r in self.resources]
+        self.job_key = JOB_KEY.format(job=job)
+        self.client = redis_client or get_redis_client()
+        self.lease_ms = int(1000 * (lease_s or LEASE_S))
+        self.max_runtime = max_runtime_s or MAX_RUNTIME_S
+        self.value = f"{job}|{socket.gethostname()}|{os.getpid()}|{uuid.uuid4().hex}"
+        self.holder = None       # (resource, value) of the lease that blocked acquire()
+        self.lost = False        # a heartbeat found the lease gone
+        self.started = None
+        self._scripts = {name: self.client.register_script(src) for name, src in [
+            ("acquire", ACQUIRE), ("renew", RENEW), ("release", RELEASE),
+            ("rerun", REQUEST_RERUN), ("takeover", TAKEOVER)]}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def acquire(self):
+        """Lease all resources at once; dead holders on this host are taken over. False when busy."""
+        for _ in range(len(self.keys) + 1):
+            busy = self._scripts["acquire"](keys=self.keys, args=[self.value, self.lease_ms])
+            if not busy:
+                self.holder = None
+                self._on_acquired()
+                return True
+            key, value = busy
+            self.holder = (key[len(LOCK_KEY.format(resource="")):], value)
+            if not holder_dead(value):
+                return False
+            logger.warning(f"Taking over stale lease on {self.holder[0]} from dead process {value}")
+            self._scripts["takeover"](keys=[key], args=[value])
+        return False
+
+    def request_rerun(self):
+        """Ask the running instance of this job to run once more; False if another job holds the lease."""
+        return bool(self._scripts["rerun"](keys=[self.job_key] + self.keys, args=[f"{self.job}|"]))
+
+    def release(self, rerun=True):
+        """Release the leases, unless a coalesced trigger is pending (then True: run again, still leased)."""
+        again = self._scripts["release"](keys=[self.job_key] + self.keys,
+                                         args=[self.value, "1" if rerun else "0"]) == 0
+        if not again:
+            self._stop_heartbeat()
+        return again
+
+    def restart(self):
+        """Start another pass under the same leases (coalesced rerun): fresh runtime budget and start time."""
+        self.started = time.time()
+        self.client.hset(self.job_key, mapping={"started": f"{self.started:.0f}",
+                                                "heartbeat": f"{self.started:.0f}"})
+
+    def record(self, status, seconds, error=None):
+        self.client.hset(self.job_key, mapping={
+            "last_status": status, "last_finished": f"{time.time():.0f}", "last_seconds": f"{seconds:.1f}",
+            "last_error": (error or "")[:200]})
+
+    # ---- heartbeat ----
+    def _on_acquired(self):
+        self.started = time.time()
+        holder = parse_holder(self.value)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hset(self.job_key, mapping={
+            "holder": self.value, "host": holder["host"], "pid": holder["pid"], "resources": ",".join(self.resources),
+            "started": f"{self.started:.0f}", "heartbeat": f"{self.started:.0f}", "rerun": "0"})
+        pipe.hincrby(self.job_key, "runs", 1)
+        pipe.execute()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._heartbeat, name=f"lease-{self.job}", daemon=True)
+        self._thread.start()
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.lease_ms / 3000.0):
+            if time.time() - self.started > self.max_runtime:
+                logger.error(f"Job {self.job} exceeded {self.max_runtime:.0f}s; no longer renewing its lease.")
+                return
+            try:
+                held = self._scripts["renew"](keys=self.keys, args=[self.value, self.lease_ms])
+                self.client.hset(self.job_key, "heartbeat", f"{time.time():.0f}")
+            except redis.RedisError as e:
+                logger.warning(f"Lease heartbeat of {self.job} failed: {e}")
+                continue
+            if held < len(self.keys):
+                self.lost = True
+                logger.error(f"Job {self.job} lost its lease on {self.resources}; another run may start.")
+                return
+
+    def _stop_heartbeat(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+        self.client.hset(self.job_key, "holder", "")
+
+
+def run_exclusive(job, fn, resources=None, coalesce=False, redis_client=None, wait=None):
+    """
+    Run fn() under the job's lease; exceptions from fn propagate after the lease is released.
+    :param coalesce: if the same job is already running, flag a rerun for it instead of skipping.
+    :param wait: seconds to wait for busy resources (default IRM_JOB_WAIT_S); 0 gives up at once.
+    :return: DONE (fn ran, repeated once per coalesced trigger), COALESCED or BUSY (fn did not run).
+    """
+    if not LOCKING:
+        fn()
+        return DONE
+
+    lock = JobLock(job, resources, redis_client)
+    deadline = time.monotonic() + (WAIT_S if wait is None else wait)
+    acquired = lock.acquire()
+    while not acquired:
+        if coalesce and lock.request_rerun():
+            logger.info(f"Job {job} is already running ({lock.holder[1]}); a rerun was requested instead.")
+            return COALESCED
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+        acquired = lock.acquire()     # the holder may have finished in between
+    if not acquired:
+        resource, value = lock.holder
+        logger.warning(f"Job {job} skipped: '{resource}' is leased by {value}.")
+        return BUSY
+
+    try:
+        while True:
+            t0 = time.time()
+            try:
+                fn()
+            except Exception as e:
+                lock.record(FAILED, time.time() - t0, str(e).split('\n')[0])
+                lock.release(rerun=False)
+                raise
+            lock.record(DONE, time.time() - t0)
+            if not lock.release():
+                return DONE
+            logger.info(f"Job {job}: trigger(s) arrived during the run; running again.")
+            lock.restart()
+    finally:
+        lock._stop_heartbeat()
+
+
+# ---- irm jobs ----
+def _fmt_time(epoch):
+    return datetime.fromtimestamp(float(epoch)).strftime('%m-%d %H:%M:%S') if epoch else "-"
+
+
+def job_status(client):
+    """[{job, state, holder, resources, ...}] for every job that has run under a lease."""
+    now = time.time()
+    rows = []
+    for key in sorted(client.scan_iter(JOB_KEY.format(job="*"))):
+        info = client.hgetall(key)
+        job = key[len(JOB_KEY.format(job="")):]
+        resources = [r for r in info.get("resources", "").split(",") if r]
+        leases = client.mget([LOCK_KEY.format(resource=r) for r in resources]) if resources else []
+        held = bool(info.get("holder")) and info.get("holder") in leases
+        if held:
+            state = "stale" if holder_dead(info["holder"]) else "running"
+        else:
+            # A holder that never released: its lease expired after a crash / kill
+            state = "expired" if info.get("holder") else "idle"
+        rows.append({
+            "job": job, "state": state, "resources": resources,
+            "holder": f"{info.get('host')}:{info.get('pid')}" if held else None,
+            "started": info.get("started") if held else None,
+            "heartbeat_age_s": round(now - float(info["heartbeat"]), 1) if held and info.get("heartbeat") else None,
+            "rerun": info.get("rerun") == "1",
+            "runs": int(info.get("runs", 0)), "coalesced": int(info.get("coalesced", 0)),
+            "last_status": info.get("last_status"), "last_finished": info.get("last_finished"),
+            "last_seconds": float(info["last_seconds"]) if info.get("last_seconds") else None,
+            "last_error": info.get("last_error") or None,
+        })
+    return rows
+
+
+def lease_status(client):
+    """{resource: {holder, ttl_s}} for every active lease."""
+    leases = {}
+    for key in sorted(client.scan_iter(LOCK_KEY.format(resource="*"))):
+        value, ttl = client.get(key), client.pttl(key)
+        if value:
+            leases[key[len(LOCK_KEY.format(resource="")):]] = {"holder": value, "ttl_s": round(ttl / 1000.0, 1)}
+    return leases
+
+
+def print_status(jobs, leases):
+    print("\n" + "=" * 110)
+    print(" IRM JOBS")
+    print("=" * 110)
+    print(f"{'Job':<22} | {'State':<8} | {'Holder':<18} | {'Started':<14} | {'HB age':>7} | {'Rerun':<5} | "
+          f"{'Last':<7} | {'Finished':<14} | {'Took':>7}")
+    print("-" * 110)
+    for j in jobs:
+        hb = f"{j['heartbeat_age_s']:.0f}s" if j["heartbeat_age_s"] is not None else "-"
+        took = f"{j['last_seconds']:.0f}s" if j["last_seconds"] is not None else "-"
+        print(f"{j['job']:<22} | {j['state']:<8} | {j['holder'] or '-':<18} | {_fmt_time(j['started']):<14} | "
+              f"{hb:>7} | {'yes' if j['rerun'] else '-':<5} | {j['last_status'] or '-':<7} | "
+              f"{_fmt_time(j['last_finished']):<14} | {took:>7}")
+        if j["last_error"]:
+            print(f"{'':<22}   last error: {j['last_error']}")
+    if leases:
+        print("-" * 110)
+        for resource, lease in leases.items():
+            print(f"  lease {resource:<16} held by {lease['holder']} (expires in {lease['ttl_s']:.0f}s)")
+    print("=" * 110 + "\n")
+
+
+def unlock(client, job):
+    """Drop every lease held by `job` and its pending rerun (manual recovery)."""
+    removed = 0
+    for key in client.scan_iter(LOCK_KEY.format(resource="*")):
+        holder = parse_holder(client.get(key))
+        if holder and holder["job"] == job:
+            removed += client.delete(key)
+    client.hset(JOB_KEY.format(job=job), mapping={"holder": "", "rerun": "0"})
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IRM job leases: status and manual unlock")
+    subparsers = parser.add_subparsers(dest="command")
+    status_parser = subparsers.add_parser("status", help="Show job states, holders and active leases (default)")
+    status_parser.add_argument("--json", action="store_true", help="Print as JSON")
+    unlock_parser = subparsers.add_parser("unlock", help="Force-release the leases of a job")
+    unlock_parser.add_argument("job", help="Job name, e.g. refresh")
+    args = parser.parse_args()
+
+    client = get_redis_client()
+    try:
+        if args.command == "unlock":
+            count = unlock(client, args.job)
+            print(f"[*] Released {count} lease(s) of {args.job}.")
+        else:
+            jobs, leases = job_status(client), lease_status(client)
+            if getattr(args, "json", False):
+                print(json.dumps({"jobs": jobs, "leases": leases}, ensure_ascii=False, indent=2))
+            elif not jobs and not leases:
+                print("[*] No job has run under a lease yet.")
+            else:
+                print_status(jobs, leases)
+    except redis.RedisError as e:
+        print(f"[!] Redis unavailable: {e}")
+        sys.exit(1)
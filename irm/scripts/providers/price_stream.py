@@ -0,0 +1,247 @@
+"""
+Near-real-time price streaming daemon (`irm stream prices`).
+
+Between the scheduled refreshes, Asset `value` / percentiles would only change once a
+day. This daemon polls the configured sources at a short cadence with cheap
+latest-bar requests (one batched upstream call per provider over the last few days,
+bypassing the series cache's staleness rule) and keeps everything else in memory:
+
+* one RollingPercentiles engine per asset, loaded once from the state the batch job
+  persisted (or seeded from the cached history); a tick folds the fresh tail in with
+  a few bisections instead of re-ranking years of bars,
+* the node properties currently stored in the graph, so only assets whose value or
+  percentiles actually moved are written, in one batched UNWIND per tick,
+* one `irm:stream:asset_changes` entry per tick listing exactly the changed assets
+  (see asset_events), for the portfolio PnL stream and other consumers.
+
+Percentile state and the streamed bars are checkpointed to disk every
+IRM_STREAM_CHECKPOINT_S (and on shutdown), when sources and graph state are also
+re-read. Each tick leases the `prices` resource (job_lock), so it yields to a
+running `irm refresh` / update_price_signals instead of racing it.
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.providers import get_provider
+from scripts.providers.asset_events import change_events, publish_asset_changes
+from scripts.providers.graph_writes import split_changed
+from scripts.providers.job_lock import run_exclusive
+from scripts.providers.rolling_percentile import RollingPercentiles, PRIMARY_WINDOW, history_start
+from scripts.providers.update_price_signals import PriceSignalUpdater, PERCENTILE_FIELDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TICK_S = float(os.getenv("IRM_STREAM_INTERVAL_S", "60"))
+CHECKPOINT_S = float(os.getenv("IRM_STREAM_CHECKPOINT_S", "300"))
+# Minimum seconds between polls of one provider (daily macro series need not be polled every tick)
+POLL_INTERVAL = {
+    "yfinance":     60,
+    "fred":         3600,
+    "akshare_fund": 600,
+    "akshare_bond": 600,
+}
+DEFAULT_POLL_INTERVAL = 300
+# Calendar days requested per poll: covers weekends / holidays and late revisions
+LATEST_DAYS = 5
+
+NODE_FIELDS = ["value"] + PERCENTILE_FIELDS
+
+
+class PriceStream:
+    def __init__(self, graph_name="Graph-001", tickers=None, interval=None, checkpoint=None):
+        """:param tickers: stream only these graph tickers (default: every configured source)."""
+        # Reuses the batch job's connections, stored-state query, row format and batched write
+        self.updater = PriceSignalUpdater(graph_name)
+        self.redis_client = self.updater.redis_client
+        self.only = set(tickers) if tickers else None
+        self.interval = interval or TICK_S
+        self.checkpoint_every = checkpoint or CHECKPOINT_S
+        self.config = {}
+        self.engines = {}           # ticker -> in-memory RollingPercentiles
+        self.pending = {}           # ticker -> latest streamed bars not yet merged into the series cache
+        self.last_poll = {}         # provider -> monotonic time of its last poll
+        self.last_checkpoint = time.monotonic()
+        self.ticks = 0
+        self._stop = threading.Event()
+
+    def load(self):
+        """(Re)read the source config and the node properties currently stored in the graph."""
+        config = self.updater.get_price_signal_config()
+        if self.only:
+            config = {t: c for t, c in config.items() if t in self.only}
+        self.updater.node_state.clear()
+        tickers = self.updater.get_price_signal_assets(list(config))
+        self.config = {t: config[t] for t in tickers}
+        for ticker in list(self.engines):
+            if ticker not in self.config:
+                del self.engines[ticker]
+        logger.info(f"Streaming {len(self.config)} asset(s).")
+
+    # ---- percentile engines ----
+    def _seed(self, ticker, fresh=False):
+        """Engine for ticker: persisted state, or a full rebuild from the cached history."""
+        src = self.config[ticker]
+        engine = RollingPercentiles(src["provider"], src["symbol"])
+        if not fresh and engine.load():
+            return engine
+        provider = get_provider(src["provider"])
+        df = provider.fetch(src["symbol"], history_start())
+        value_col = provider.get_value_column(df)
+        if df.empty or not value_col:
+            raise ValueError(f"no history for {src['provider']}:{src['symbol']}")
+        engine.update(df[value_col])
+        logger.info(f"Seeded percentile windows of {ticker} from {len(df)} cached bar(s).")
+        return engine
+
+    def rank(self, ticker, bars):
+        """Fold the latest bars into the ticker's windows; returns a node row or None."""
+        engine = self.engines.get(ticker) or self._seed(ticker)
+        self.engines[ticker] = engine
+        value, windows = engine.update(bars, persist=False)
+        if engine.mode == "rebuild":
+            # The stored bars disagree with the stream (gap, revision beyond the overlap): the
+            # rebuild only saw the short tail, so re-seed from the full history and fold in again
+            logger.warning(f"Percentile state of {ticker} out of sync with the stream; re-seeding.")
+            engine = self.engines[ticker] = self._seed(ticker, fresh=True)
+            value, windows = engine.update(bars, persist=False)
+            if engine.mode == "rebuild":
+                return None
+        if value is None or windows.get(PRIMARY_WINDOW) is None:
+            return None
+        return PriceSignalUpdater.node_row(ticker, value, windows)
+
+    # ---- polling ----
+    def due(self, now):
+        """{provider: [tickers]} whose poll interval has elapsed."""
+        groups = {}
+        for ticker, src in self.config.items():
+            groups.setdefault(src["provider"], []).append(ticker)
+        return {p: tickers for p, tickers in groups.items()
+                if now - self.last_poll.get(p, float("-inf")) >= POLL_INTERVAL.get(p, DEFAULT_POLL_INTERVAL)}
+
+    def poll(self, provider_name, tickers):
+        """{ticker: latest bars} from one batched upstream request for the provider."""
+        provider = get_provider(provider_name)
+        by_symbol = {}
+        for ticker in tickers:
+            by_symbol.setdefault(self.config[ticker]["symbol"], []).append(ticker)
+        if hasattr(provider, "fetch_latest"):
+            wide = provider.fetch_latest(list(by_symbol), days=LATEST_DAYS)
+        else:
+            # Series cache disabled (IRM_PROVIDER_CACHE=0): plain batched fetch of the same window
+            wide = provider.fetch_many(list(by_symbol), (datetime.now() - timedelta(days=LATEST_DAYS)).strftime('%Y-%m-%d'))
+        for symbol, reason in wide.attrs.get("errors", {}).items():
+            logger.warning(f"Latest bars of {provider_name}:{symbol} unavailable: {reason}")
+        bars = {}
+        for symbol, symbol_tickers in by_symbol.items():
+            if symbol in wide.columns:
+                series = wide[symbol].dropna()
+                if len(series):
+                    bars.update({t: series for t in symbol_tickers})
+        return bars
+
+    def tick(self):
+        """Poll due providers, write changed nodes in one batch and publish the changes."""
+        now = time.monotonic()
+        rows = []
+        for provider_name, tickers in self.due(now).items():
+            self.last_poll[provider_name] = now
+            try:
+                bars = self.poll(provider_name, tickers)
+            except Exception as e:
+                logger.warning(f"Polling {provider_name} failed: {str(e).splitlines()[0]}")
+                continue
+            for ticker, series in bars.items():
+                try:
+                    row = self.rank(ticker, series)
+                except Exception as e:
+                    logger.warning(f"Skipping {ticker}: {e}")
+                    continue
+                if row:
+                    rows.append(row)
+                    self.pending[ticker] = series
+
+        changed, unchanged = split_changed(rows, self.updater.node_state, NODE_FIELDS, key="ticker")
+        if changed:
+            written = self.updater.update_node_states(changed)
+            events = change_events(changed, self.updater.node_state, written.written)
+            for row in changed:
+                if row["ticker"] in written.written:
+                    self.updater.node_state[row["ticker"]] = {f: row[f] for f in NODE_FIELDS}
+            publish_asset_changes(self.redis_client, events, source="price_stream")
+            logger.info(f"Tick {self.ticks}: {len(events)} asset(s) changed, {len(unchanged)} unchanged"
+                        + (f", write failed: {sorted(written.failed)}" if written.failed else "."))
+        self.ticks += 1
+
+        if time.monotonic() - self.last_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+            self.load()
+        return len(changed)
+
+    def checkpoint(self):
+        """Persist percentile windows and merge the streamed bars into the series cache."""
+        for ticker, series in list(self.pending.items()):
+            src = self.config.get(ticker)
+            engine = self.engines.get(ticker)
+            if engine:
+                engine.save()
+            if src:
+                provider = get_provider(src["provider"])
+                try:
+                    if hasattr(provider, "store_bars"):
+                        provider.store_bars(src["symbol"], series)
+                except Exception as e:
+                    logger.warning(f"Failed to merge streamed bars of {ticker} into the cache: {e}")
+        logger.info(f"Checkpointed {len(self.pending)} asset(s).")
+        self.pending.clear()
+        self.last_checkpoint = time.monotonic()
+
+    def stop(self, *_):
+        self._stop.set()
+
+    def run(self, once=False):
+        if not self.updater.graph or not self.redis_client:
+            logger.error("FalkorDB / Redis unavailable; not streaming.")
+            return
+        self.load()
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                # Skips the tick (logged) while a batch price job holds the `prices` lease
+                run_exclusive("price-stream", self.tick, resources=["prices"], redis_client=self.redis_client, wait=0)
+            except Exception as e:
+                logger.error(f"Tick failed: {e}")
+            if once:
+                break
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+        self.checkpoint()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream latest prices into Asset nodes and irm:stream:asset_changes")
+    parser.add_argument("--interval", type=float, default=TICK_S,
+                        help=f"Seconds between ticks (default IRM_STREAM_INTERVAL_S or {TICK_S:.0f}); "
+                             f"providers are polled at most every {POLL_INTERVAL['yfinance']}s (yfinance) "
+                             f"to {POLL_INTERVAL['fred']}s (fred)")
+    parser.add_argument("--checkpoint", type=float, default=CHECKPOINT_S,
+                        help=f"Seconds between state checkpoints / config reloads (default {CHECKPOINT_S:.0f})")
+    parser.add_argument("--tickers", nargs="+", default=None, help="Stream only these graph tickers")
+    parser.add_argument("--once", action="store_true", help="Run a single tick and exit")
+    args = parser.parse_args()
+
+    PriceStream(tickers=args.tickers, interval=args.interval, checkpoint=args.checkpoint).run(once=args.once)
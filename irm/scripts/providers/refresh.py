@@ -0,0 +1,219 @@
+"""
+Single-process refresh pipeline (`irm refresh`).
+
+Runs the periodic update jobs as one dependency DAG instead of separate processes:
+
+    prices ─────┬──> betas
+                └──> weights
+    fundamentals ┬─> earnings
+                 └─> valuation
+
+Every stage shares one FalkorDB / Redis connection, the `irm:config:sources` mapping,
+the provider transports and series cache, and the in-memory results of its parents
+(betas reuse the 3Y series fetched for price signals, both Hub updaters read the same
+fundamentals snapshot). Stages whose dependencies are done run in parallel; a failed
+stage skips its dependents only. The standalone update_*.py scripts stay as thin
+entry points for running a single job.
+"""
+import sys
+import json
+import time
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.common.db import get_falkordb, get_redis, redis_address, TimedGraph
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DONE, FAILED, SKIPPED = "done", "failed", "skipped"
+
+
+class Stage:
+    def __init__(self, name, fn, deps=()):
+        self.name = name
+        self.fn = fn            # fn(ctx) -> result stored in ctx.results[name]
+        self.deps = tuple(deps)
+
+
+class RefreshContext:
+    """Connections and intermediate results shared by every stage of one refresh."""
+
+    def __init__(self, graph_name="Graph-001", beta_mode=None, full_betas=False):
+        self.graph_name = graph_name
+        self.beta_mode = beta_mode
+        self.full_betas = full_betas
+        self.results = {}
+        self.moved_assets = None     # set by the prices stage; [] lets the weights stage skip
+
+        # Process-wide clients on the shared (thread-safe) connection pool, so stages share them
+        self.db = get_falkordb()
+        self.redis_client = get_redis()
+        self.redis_client.ping()
+        host, port = redis_address()
+        logger.info(f"Connected to FalkorDB and Redis at {host}:{port}")
+
+        self.sources = {t: json.loads(s) for t, s in self.redis_client.hgetall("irm:config:sources").items()}
+        logger.info(f"Loaded {len(self.sources)} configured source(s).")
+
+
+def stage_prices(ctx):
+    from scripts.providers.update_price_signals import PriceSignalUpdater
+    updater = PriceSignalUpdater(ctx.graph_name, db=ctx.db, redis_client=ctx.redis_client)
+    summary = updater.run(config=ctx.sources, sync_weights=False)
+    ctx.moved_assets = updater.moved_assets
+    return summary.results if summary else {}
+
+
+def stage_fundamentals(ctx):
+    from scripts.providers.fundamentals import FundamentalsSnapshot
+    graph = TimedGraph(ctx.db.select_graph(ctx.graph_name))
+    res = graph.query("MATCH (h:Hub) WHERE h.target IS NOT NULL RETURN DISTINCT h.target")
+    targets = [row[0] for row in res.result_set if row[0]]
+    metrics, errors = FundamentalsSnapshot().get(targets)
+    if errors:
+        logger.warning(f"Fundamentals unavailable for: {sorted(errors)}")
+    return metrics
+
+
+def stage_betas(ctx):
+    from scripts.providers.calc_betas import BetaCalculator
+    calculator = BetaCalculator(ctx.graph_name, mode=ctx.beta_mode, full=ctx.full_betas,
+                                db=ctx.db, redis_client=ctx.redis_client, sources=ctx.sources)
+    calculator.run(prefetched=ctx.results.get("prices"))
+
+
+def stage_earnings(ctx):
+    from scripts.providers.update_earnings import EPSGrowthUpdater
+    EPSGrowthUpdater(ctx.graph_name, db=ctx.db).run(snapshot=ctx.results["fundamentals"])
+
+
+def stage_valuation(ctx):
+    from scripts.providers.update_percentiles import PEPercentileUpdater
+    PEPercentileUpdater(ctx.graph_name, db=ctx.db).run(snapshot=ctx.results["fundamentals"])
+
+
+def stage_weights(ctx):
+    if ctx.moved_assets == []:
+        logger.info("No asset value changed in this refresh; portfolio weights are already current.")
+        return
+    from scripts.analyzer.update_weights import PortfolioWeightUpdater
+    PortfolioWeightUpdater(ctx.graph_name, db=ctx.db, redis_client=ctx.redis_client).update_all_portfolios()
+
+
+STAGES = [
+    Stage("prices", stage_prices),
+    Stage("fundamentals", stage_fundamentals),
+    Stage("betas", stage_betas, deps=["prices"]),
+    Stage("earnings", stage_earnings, deps=["fundamentals"]),
+    Stage("valuation", stage_valuation, deps=["fundamentals"]),
+    Stage("weights", stage_weights, deps=["prices"]),
+]
+
+
+def run_dag(ctx, stages, max_workers=None):
+    """
+    Run stages as soon as all their dependencies are done; dependents of a failed stage are skipped.
+    :return: {name: {"status", "seconds", "error"}} in completion order.
+    """
+    names = {s.name for s in stages}
+    pending = {s.name: s for s in stages}
+    report = {}
+    running = {}
+
+    def _timed(stage):
+        t0 = time.perf_counter()
+        logger.info(f"[refresh] >>> {stage.name}")
+        result = stage.fn(ctx)
+        return result, time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                # Dependencies outside this run (e.g. --skip) count as satisfied
+                deps = [d for d in stage.deps if d in names]
+                if any(report.get(d, {}).get("status") in (FAILED, SKIPPED) for d in deps):
+                    blocked = [d for d in deps if report[d]["status"] != DONE]
+                    report[name] = {"status": SKIPPED, "seconds": 0.0, "error": f"upstream {blocked} not done"}
+                    del pending[name]
+                    logger.warning(f"[refresh] --- {name} skipped (upstream {blocked} not done)")
+                elif all(report.get(d, {}).get("status") == DONE for d in deps):
+                    running[pool.submit(_timed, stage)] = name
+                    del pending[name]
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Unsatisfiable stage dependencies: {sorted(pending)}")
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    result, seconds = future.result()
+                    ctx.results[name] = result
+                    report[name] = {"status": DONE, "seconds": seconds, "error": None}
+                    logger.info(f"[refresh] <<< {name} done in {seconds:.2f}s")
+                except Exception as e:
+                    report[name] = {"status": FAILED, "seconds": 0.0, "error": str(e).split('\n')[0]}
+                    logger.error(f"[refresh] !!! {name} failed: {e}")
+    return report
+
+
+def print_report(report, wall_time):
+    print("\n" + "=" * 60)
+    print(f" IRM REFRESH ({wall_time:.2f}s wall)")
+    print("=" * 60)
+    print(f"{'Stage':<14} | {'Status':<8} | {'Time':>8} | Note")
+    print("-" * 60)
+    for name, r in report.items():
+        print(f"{name:<14} | {r['status']:<8} | {r['seconds']:>7.2f}s | {r['error'] or ''}")
+    print("=" * 60 + "\n")
+
+
+if __name__ == "__main__":
+    stage_names = [s.name for s in STAGES]
+    parser = argparse.ArgumentParser(description="Run all IRM update jobs as one dependency DAG in a single process")
+    parser.add_argument("--skip", nargs="+", choices=stage_names, default=[], help="Stages to leave out")
+    parser.add_argument("--only", nargs="+", choices=stage_names, default=None,
+                        help="Run only these stages (dependencies not listed are assumed fresh)")
+    parser.add_argument("--beta-mode", choices=["rolling", "ewma"], default=None, help="Estimator for the betas stage")
+    parser.add_argument("--full-betas", action="store_true", help="Force a full recompute of the online beta state")
+    parser.add_argument("--json", action="store_true", help="Print the stage report as JSON")
+    parser.add_argument("--coalesce", action="store_true",
+                        help="If a refresh is already running, request one more run from it instead of skipping")
+    args = parser.parse_args()
+
+    from scripts.providers.job_lock import run_exclusive, DONE as LOCK_DONE, COALESCED
+
+    selected = [s for s in STAGES if (args.only is None or s.name in args.only) and s.name not in args.skip]
+    outcome = {}
+
+    def _refresh():
+        # A coalesced rerun starts from a fresh context (sources may have changed meanwhile)
+        t0 = time.perf_counter()
+        context = RefreshContext(beta_mode=args.beta_mode, full_betas=args.full_betas)
+        outcome["report"] = run_dag(context, selected)
+        outcome["wall"] = time.perf_counter() - t0
+
+    try:
+        # Leases every selected stage, so standalone update jobs on the same data wait their turn
+        status = run_exclusive("refresh", _refresh, resources=[s.name for s in selected], coalesce=args.coalesce)
+    except Exception as e:
+        logger.error(f"Initialization Failed: {e}")
+        sys.exit(1)
+    if status != LOCK_DONE:
+        sys.exit(0 if status == COALESCED else 1)
+    stage_report, wall = outcome["report"], outcome["wall"]
+
+    if args.json:
+        print(json.dumps({"wall_seconds": round(wall, 3), "stages": stage_report}, indent=2))
+    else:
+        print_report(stage_report, wall)
+    sys.exit(0 if all(r["status"] == DONE for r in stage_report.values()) else 1)
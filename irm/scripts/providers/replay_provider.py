@@ -0,0 +1,189 @@
+"""
+File-backed replay provider for offline runs, regression tests and benchmarks.
+
+Serves recorded series from `{IRM_REPLAY_DIR}/{source}/{symbol}.parquet` (or `.csv`)
+and fundamentals metrics from `{IRM_REPLAY_DIR}/fundamentals/{ticker}.json` instead of
+the network. With `IRM_PROVIDER_OVERRIDE=replay`, `get_provider()` swaps
+every registered provider for a ReplayProvider reading that provider's fixtures, so
+the update jobs, `irm refresh` and the tracer pipelines run unchanged in air-gapped CI.
+
+Calls go through a provider transport (retries, circuit breaker), and latency /
+failures can be injected deterministically:
+
+    IRM_REPLAY_MODE         replay (default) | record  (record: fetch via the real provider and merge into the fixture)
+    IRM_REPLAY_THROTTLE     1: use the emulated provider's transport and rate limit (default: unthrottled)
+    IRM_REPLAY_LATENCY_MS   mean simulated latency per call (default 0)
+    IRM_REPLAY_JITTER_MS    uniform +/- jitter around the mean (default 0)
+    IRM_REPLAY_ERROR_RATE   probability that a call fails with a retryable 429 (default 0)
+    IRM_REPLAY_SEED         seed; draws depend only on (seed, source, symbol, attempt), not thread timing
+"""
+import os
+import re
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+import pandas as pd
+from .base import BaseProvider
+from .transport import get_transport
+
+logger = logging.getLogger(__name__)
+
+REPLAY_DIR = os.getenv("IRM_REPLAY_DIR", os.path.join(os.path.dirname(os.path.dirname(
+    os.getenv("IRM_CACHE_DIR", "/home/pi-mono/.pi/agent/workspace/.irm/cache/series"))), "replay"))
+
+VALUE_COLUMN = "value"
+
+
+class ReplayError(RuntimeError):
+    pass
+
+
+class ReplayProvider(BaseProvider):
+    # Fixtures are local files; parallelism only matters when latency is simulated
+    max_concurrency = 8
+
+    def __init__(self, source=None, directory=None):
+        """
+        :param source: provider whose fixtures / transport are emulated (e.g. 'yfinance');
+                       None when registered directly as the 'replay' provider.
+        """
+        self.source = source
+        self.directory = os.path.join(directory or REPLAY_DIR, source) if source else (directory or REPLAY_DIR)
+        self.mode = os.getenv("IRM_REPLAY_MODE", "replay").lower()
+        self.latency = float(os.getenv("IRM_REPLAY_LATENCY_MS", "0")) / 1000.0
+        self.jitter = float(os.getenv("IRM_REPLAY_JITTER_MS", "0")) / 1000.0
+        self.error_rate = float(os.getenv("IRM_REPLAY_ERROR_RATE", "0"))
+        self.seed = os.getenv("IRM_REPLAY_SEED", "0")
+        throttle = os.getenv("IRM_REPLAY_THROTTLE", "0") == "1"
+        self.transport = source if (throttle and source) else "replay"
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol, ext):
+        safe = re.sub(r'[^\w.\-^=]', '_', symbol)
+        return os.path.join(self.directory, f"{safe}.{ext}")
+
+    def _read_fixture(self, symbol):
+        parquet, csv = self._path(symbol, "parquet"), self._path(symbol, "csv")
+        if os.path.exists(parquet):
+            df = pd.read_parquet(parquet)
+        elif os.path.exists(csv):
+            df = pd.read_csv(csv)
+        else:
+            raise ReplayError(f"Replay fixture not found for {self.source or 'replay'}:{symbol} in {self.directory}")
+        if "date" in df.columns:
+            df = df.set_index("date")
+        df.index = pd.to_datetime(df.index)
+        df.index.name = "date"
+        return df.sort_index()
+
+    def _simulate(self, symbol):
+        """Deterministic latency / failure draw for this call."""
+        with self._lock:
+            attempt = self._attempts.get(symbol, 0)
+            self._attempts[symbol] = attempt + 1
+        rng = random.Random(f"{self.seed}:{self.source}:{symbol}:{attempt}")
+        delay = self.latency + (rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        if self.error_rate and rng.random() < self.error_rate:
+            raise ReplayError(f"429 Too Many Requests (injected, {symbol} attempt {attempt + 1})")
+
+    def _load(self, symbol, start_date):
+        self._simulate(symbol)
+        df = self._read_fixture(symbol)
+        return df[df.index >= pd.Timestamp(start_date)] if start_date else df
+
+    def record(self, symbol, start_date):
+        """
+        Fetch through the real provider and merge the bars into the symbol's fixture (fresh
+        bars win on overlap). Under the series cache a refresh only asks for the last few
+        days, so the recorded history must never be replaced by that tail.
+        """
+        from scripts.providers import load_provider_class
+        if not self.source:
+            raise ReplayError("Recording needs the emulated provider name (source).")
+        real = load_provider_class(self.source)()
+        df = real.fetch(symbol, start_date)
+        series = self.to_series(df, real.get_value_column(df))
+        if series is None:
+            raise ReplayError(f"Nothing to record for {self.source}:{symbol}")
+        frame = series.to_frame(VALUE_COLUMN)
+        frame.index = pd.to_datetime(frame.index)
+        frame.index.name = "date"
+        try:
+            existing = self._read_fixture(symbol)
+        except ReplayError:
+            existing = None
+        if existing is not None and len(existing):
+            value_col = self.get_value_column(existing)
+            if value_col:
+                old = existing[[value_col]].rename(columns={value_col: VALUE_COLUMN})
+                frame = frame.combine_first(old).sort_index()
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            frame.to_parquet(self._path(symbol, "parquet"))
+        except ImportError:
+            frame.to_csv(self._path(symbol, "csv"))
+        logger.info(f"Recorded {len(series)} bar(s) of {self.source}:{symbol} ({len(frame)} in fixture)")
+        return frame
+
+    def fetch(self, symbol: str, start_date: str) -> pd.DataFrame:
+        if self.mode == "record":
+            frame = self.record(symbol, start_date)
+            return frame[frame.index >= pd.Timestamp(start_date)] if start_date else frame
+        # Injected 429s go through the transport's retry / breaker path like real upstream errors
+        return get_transport(self.transport).call(self._load, symbol, start_date)
+
+    def metrics(self, ticker, live_fetch):
+        """Fundamentals metrics dict from `{dir}/{ticker}.json` (record mode: live_fetch(ticker) and save)."""
+        path = self._path(ticker, "json")
+        if self.mode == "record":
+            data = live_fetch(ticker)
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            return data
+
+        def _read():
+            self._simulate(ticker)
+            if not os.path.exists(path):
+                raise ReplayError(f"Replay fixture not found for fundamentals:{ticker} in {self.directory}")
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return get_transport(self.transport).call(_read)
+
+    def get_value_column(self, df: pd.DataFrame) -> str:
+        """'value' for recorded fixtures; hand-written ones may use 'close' or any numeric column."""
+        for col in (VALUE_COLUMN, "close"):
+            if col in df.columns:
+                return col
+        numeric = df.select_dtypes("number").columns
+        return numeric[0] if len(numeric) else None
+
+
+if __name__ == "__main__":
+    # Run as a module from /app (python3 -m scripts.providers.replay_provider), see `irm replay record`
+    from scripts.common.db import get_redis
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Record replay fixtures for the configured data sources")
+    parser.add_argument("--tickers", nargs="+", default=None, help="Only these graph tickers (default: all sources)")
+    parser.add_argument("--start", default="2015-01-01", help="History start date (default 2015-01-01)")
+    parser.add_argument("--dir", default=REPLAY_DIR, help=f"Fixture root (default {REPLAY_DIR})")
+    args = parser.parse_args()
+
+    sources = {t: json.loads(s) for t, s in get_redis().hgetall("irm:config:sources").items()}
+    failed = []
+    for ticker, src in sorted(sources.items()):
+        if args.tickers and ticker not in args.tickers:
+            continue
+        try:
+            ReplayProvider(src["provider"], directory=args.dir).record(src["symbol"], args.start)
+        except Exception as e:
+            failed.append(ticker)
+            print(f"[!] {ticker} ({src.get('provider')}:{src.get('symbol')}): {str(e).splitlines()[0]}")
+    print(f"[*] Fixtures under {args.dir}; failed: {failed or 'none'}")
@@ -0,0 +1,192 @@
+"""
+Shared return-series builder and Redis-backed return panel cache.
+
+calc_betas.py produces weekly return series for every ticker it regresses; they are
+cached here so downstream consumers (joint Kelly allocation, risk engines) can load a
+whole aligned panel with a single round trip instead of refetching years of history.
+Daily panels (portfolio risk) are extended incrementally as new bars arrive.
+"""
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RETURNS_CACHE_KEY = "irm:cache:returns:{freq}:{ticker}"
+
+# Resample rule per frequency. Daily series are used as delivered by the provider.
+RESAMPLE_RULES = {"W": "W-FRI", "D": None}
+
+# Rate-like series move in absolute points, everything else in percent.
+ABSOLUTE_METRICS = ['rate', 'volatility']
+
+
+def return_unit(metric_type):
+    """'abs' (point changes) or 'pct' (percent changes): what to_returns produces for metric_type."""
+    return "abs" if metric_type in ABSOLUTE_METRICS else "pct"
+
+# Date columns used by providers that do not return a DatetimeIndex (AkShare).
+DATE_COLUMNS = ['date', '日期', '净值日期']
+
+
+def value_series(df: pd.DataFrame, value_col: str) -> pd.Series:
+    """Extract the value column as a date-indexed series (index or known date column)."""
+    series = df[value_col]
+    if not isinstance(df.index, pd.DatetimeIndex):
+        date_col = next((c for c in DATE_COLUMNS if c in df.columns), None)
+        if date_col:
+            series = pd.Series(series.values, index=pd.to_datetime(df[date_col]).values)
+    return series.astype(float)
+
+
+def to_returns(series: pd.Series, metric_type: str = None, freq: str = "W") -> pd.Series:
+    """
+    Convert a raw value series into a return series.
+    - freq 'W' downsamples to Friday closes to smooth daily noise, 'D' keeps provider bars.
+    - `rate`/`volatility` metrics use absolute changes (diff), others percent change * 100.
+    """
+    series = series.copy()
+    series.index = pd.to_datetime(series.index)
+    series = series[~series.index.duplicated(keep='last')].sort_index()
+
+    rule = RESAMPLE_RULES[freq]
+    if rule:
+        series = series.resample(rule).last()
+
+    if metric_type in ABSOLUTE_METRICS:
+        returns = series.diff()
+    else:
+        returns = series.pct_change() * 100.0
+    return returns.dropna()
+
+
+class ReturnPanelCache:
+    """
+    Per-ticker return series cached in Redis as compact JSON.
+
+    Besides the returns, each entry keeps the last raw level and the time it was
+    refreshed, so daily panels can be extended incrementally with only the new bars.
+    ttl=0 disables expiry (used for incrementally maintained panels).
+    """
+
+    def __init__(self, redis_client, freq="W", ttl=None):
+        self.redis_client = redis_client
+        self.freq = freq
+        default_ttl = 7 * 86400 if freq == "W" else 0
+        self.ttl = ttl if ttl is not None else int(os.getenv("IRM_RETURNS_CACHE_TTL", default_ttl))
+
+    def _key(self, ticker):
+        return RETURNS_CACHE_KEY.format(freq=self.freq, ticker=ticker)
+
+    def put(self, ticker, returns: pd.Series, last_level=None, unit=None):
+        """:param unit: return_unit() of the series, so readers asking for another unit refetch."""
+        payload = {
+            "d": [d.strftime('%Y-%m-%d') for d in returns.index],
+            "r": [round(float(v), 8) for v in returns.values],
+            "l": None if last_level is None else float(last_level),
+            "u": datetime.now().timestamp(),
+            "k": unit
+        }
+        self.redis_client.set(self._key(ticker), json.dumps(payload, separators=(",", ":")), ex=self.ttl or None)
+
+    def get_entries(self, tickers):
+        """Return {ticker: (Series, last_level, updated_ts, unit or None)} for cached tickers (single MGET)."""
+        tickers = list(tickers)
+        if not tickers:
+            return {}
+        raw = self.redis_client.mget([self._key(t) for t in tickers])
+        found = {}
+        for ticker, payload in zip(tickers, raw):
+            if not payload:
+                continue
+            data = json.loads(payload)
+            series = pd.Series(data["r"], index=pd.to_datetime(data["d"]), name=ticker, dtype=float)
+            found[ticker] = (series, data.get("l"), data.get("u", 0.0), data.get("k"))
+        return found
+
+    def get_many(self, tickers):
+        """Return {ticker: Series} for cached tickers (single MGET round trip)."""
+        return {t: entry[0] for t, entry in self.get_entries(tickers).items()}
+
+
+def _fetch_levels(ticker, asset_config, start_date):
+    from scripts.providers import get_provider
+
+    config = asset_config.get(ticker)
+    if not config:
+        logger.warning(f"No source configuration for {ticker}; excluded from return panel.")
+        return None
+    provider_inst = get_provider(config['provider'])
+    df = provider_inst.fetch(config['symbol'], start_date)
+    value_col = provider_inst.get_value_column(df)
+    if df.empty or not value_col or value_col not in df.columns:
+        return None
+    levels = value_series(df, value_col).dropna()
+    levels.index = pd.to_datetime(levels.index)
+    return levels[~levels.index.duplicated(keep='last')].sort_index()
+
+
+def load_return_panel(tickers, metric_types, asset_config, cache, years=3, refresh_after=None, percent=False):
+    """
+    Build an aligned (dates x tickers) return panel, serving from cache and
+    fetching only the misses through the provider registry.
+
+    :param metric_types: {ticker: metric_type} from the graph.
+    :param percent: percent changes for every ticker regardless of metric type (position P&L).
+    :param asset_config: {ticker: {"symbol", "provider"}} from irm:config:sources.
+    :param refresh_after: seconds; daily cached series older than this are extended
+                          with only the bars after their last cached date.
+    """
+    entries = cache.get_entries(tickers)
+    series = {}
+    now = datetime.now()
+    window_start = pd.Timestamp(now - timedelta(days=years * 365))
+
+    for ticker in tickers:
+        metric_type = None if percent else metric_types.get(ticker)
+        entry = entries.get(ticker)
+        # Entries written before units were recorded follow the graph metric type
+        if entry is not None and (entry[3] or return_unit(metric_types.get(ticker))) != return_unit(metric_type):
+            entry = None
+        try:
+            if entry is not None:
+                cached, last_level, updated, _ = entry
+                stale = refresh_after is not None and now.timestamp() - updated > refresh_after
+                if not stale:
+                    series[ticker] = cached
+                    continue
+                if cache.freq == "D" and last_level is not None and len(cached):
+                    # Incremental: fetch from the last cached bar and append only new returns
+                    last_date = cached.index[-1]
+                    levels = _fetch_levels(ticker, asset_config, last_date.strftime('%Y-%m-%d'))
+                    if levels is None:
+                        series[ticker] = cached
+                        continue
+                    new_levels = levels[levels.index > last_date]
+                    anchor = pd.Series([last_level], index=[last_date])
+                    new_returns = to_returns(pd.concat([anchor, new_levels]), metric_type, "D")
+                    merged = pd.concat([cached, new_returns])
+                    merged = merged[merged.index >= window_start]
+                    tip = float(new_levels.iloc[-1]) if len(new_levels) else last_level
+                    cache.put(ticker, merged, last_level=tip, unit=return_unit(metric_type))
+                    series[ticker] = merged
+                    continue
+
+            # Cold (or non-incremental) load of the whole window
+            levels = _fetch_levels(ticker, asset_config, window_start.strftime('%Y-%m-%d'))
+            if levels is None or levels.empty:
+                continue
+            returns = to_returns(levels, metric_type, cache.freq)
+            cache.put(ticker, returns, last_level=float(levels.iloc[-1]), unit=return_unit(metric_type))
+            series[ticker] = returns
+        except Exception as e:
+            logger.warning(f"Failed to load returns for {ticker}: {e}")
+            if entry is not None:
+                series[ticker] = entry[0]
+
+    if not series:
+        return pd.DataFrame()
+    panel = pd.concat({t: s for t, s in series.items()}, axis=1).sort_index()
+    return panel
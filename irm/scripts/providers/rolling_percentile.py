@@ -0,0 +1,228 @@
+"""
+Incremental rolling-percentile engine for price signals.
+
+Ranking the latest bar with `rank(pct=True)` re-sorts the whole multi-year frame on
+every run. Instead, each (provider, symbol) keeps its bars in chronological order
+plus one sorted copy per lookback window (1Y / 3Y / 10Y), persisted next to the
+series cache. A run only touches the tail: the last few bars (which the series cache
+may still revise) are taken out again, new bars are inserted with `bisect.insort`,
+bars that slid out of a window are removed by binary search, and the percentile of
+the latest value is two bisections away. Ties use pandas' average-rank semantics,
+so results equal `rank(pct=True).iloc[-1]` over the same window.
+
+The state is self-healing: if the stored bars disagree with the series (backfill,
+gaps, a changed window set) it is rebuilt from the series in one pass.
+"""
+import os
+import re
+import json
+import logging
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta, date
+
+logger = logging.getLogger(__name__)
+
+# Sibling of the series cache (same root resolution as the fundamentals snapshot)
+PERCENTILE_DIR = os.getenv("IRM_PERCENTILE_DIR", os.path.join(
+    os.path.dirname(os.getenv("IRM_CACHE_DIR", "/home/pi-mono/.pi/agent/workspace/.irm/cache/series")), "percentiles"))
+
+# Lookback windows in calendar days; each is written to the node as percentile_<name>
+WINDOWS = {"1y": 365, "3y": 3 * 365, "10y": 10 * 365}
+# The window mirrored into the legacy `percentile` property read by the tracer
+PRIMARY_WINDOW = "3y"
+# Recent bars that may still be revised upstream (matches the series cache overlap)
+REVISION_DAYS = 5
+
+
+def window_property(name):
+    return f"percentile_{name}"
+
+
+def history_start(now=None):
+    """Fetch start covering the longest window."""
+    return ((now or datetime.now()) - timedelta(days=max(WINDOWS.values()))).strftime('%Y-%m-%d')
+
+
+def average_rank_pct(sorted_values, value):
+    """Percentile of `value` (a member of sorted_values) with pandas rank(pct=True, method='average')."""
+    lo = bisect_left(sorted_values, value)
+    hi = bisect_right(sorted_values, value)
+    return (lo + (hi - lo + 1) / 2.0) / len(sorted_values)
+
+
+def _normalize(series):
+    """Float series on a sorted daily DatetimeIndex, NaNs dropped, last bar per day (vectorized)."""
+    import pandas as pd
+    s = series.astype(float).dropna()
+    index = s.index if isinstance(s.index, pd.DatetimeIndex) else pd.to_datetime(s.index)
+    s.index = index.normalize()
+    if not s.index.is_monotonic_increasing:
+        s = s.sort_index()
+    if s.index.has_duplicates:
+        s = s[~s.index.duplicated(keep="last")]
+    return s
+
+
+def _days(index):
+    return index.strftime('%Y-%m-%d').tolist()
+
+
+class RollingPercentiles:
+    def __init__(self, provider, symbol, windows=None, directory=None):
+        self.windows = dict(windows or WINDOWS)
+        safe = re.sub(r'[^\w.\-^=]', '_', symbol)
+        self.path = os.path.join(directory or PERCENTILE_DIR, provider, safe + ".json")
+        self.mode = None        # "incremental" or "rebuild" after update()
+        self._loaded = False    # long-lived instances (streaming daemon) keep the state in memory
+        self._reset()
+
+    def _reset(self):
+        self.dates = []                                   # chronological, covers the longest window
+        self.values = []
+        self.sorted = {w: [] for w in self.windows}       # sorted values of each window
+        self.starts = {w: 0 for w in self.windows}        # index of each window's oldest bar
+
+    # ---- persistence ----
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get("windows") != self.windows:
+            return False
+        self.dates, self.values = state["dates"], state["values"]
+        self.sorted, self.starts = state["sorted"], state["starts"]
+        return True
+
+    def load(self):
+        """Load the persisted state into memory once (long-lived callers); False when there is none."""
+        self._loaded = self._loaded or self._load()
+        return self._loaded
+
+    def save(self):
+        try:
+            self._save()
+        except OSError as e:
+            logger.warning(f"Failed to persist percentile state {self.path}: {e}")
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        payload = json.dumps({"windows": self.windows, "dates": self.dates, "values": self.values,
+                              "sorted": self.sorted, "starts": self.starts})
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp, self.path)
+
+    # ---- O(log n) maintenance ----
+    def _remove(self, window, value):
+        s = self.sorted[window]
+        i = bisect_left(s, value)
+        if i == len(s) or s[i] != value:
+            raise ValueError(f"value {value} missing from {window} window")
+        del s[i]
+
+    def _drop_tail(self, i0):
+        """Take bars i0.. back out of every window (they are re-added from the fresh series)."""
+        for j in range(len(self.values) - 1, i0 - 1, -1):
+            for w in self.windows:
+                if self.starts[w] <= j:
+                    self._remove(w, self.values[j])
+        del self.dates[i0:], self.values[i0:]
+        for w in self.windows:
+            self.starts[w] = min(self.starts[w], i0)
+
+    def _append(self, day, value):
+        self.dates.append(day)
+        self.values.append(value)
+        for w in self.windows:
+            insort(self.sorted[w], value)
+
+    def _evict(self, today):
+        for w, days in self.windows.items():
+            cutoff = (today - timedelta(days=days)).isoformat()
+            while self.starts[w] < len(self.dates) and self.dates[self.starts[w]] < cutoff:
+                self._remove(w, self.values[self.starts[w]])
+                self.starts[w] += 1
+        k = min(self.starts.values()) if self.starts else 0
+        if k:
+            del self.dates[:k], self.values[:k]
+            for w in self.windows:
+                self.starts[w] -= k
+
+    def _rebuild(self, s, today):
+        self._reset()
+        self.dates, self.values = _days(s.index), s.tolist()
+        for w, n in self.windows.items():
+            cutoff = (today - timedelta(days=n)).isoformat()
+            self.starts[w] = bisect_left(self.dates, cutoff)
+            self.sorted[w] = sorted(self.values[self.starts[w]:])
+        k = min(self.starts.values()) if self.starts else 0
+        if k:
+            del self.dates[:k], self.values[:k]
+            for w in self.windows:
+                self.starts[w] -= k
+
+    def _sync(self, s):
+        """Fold the series tail into the loaded state; False when it cannot be done incrementally."""
+        if not self.dates:
+            return False
+        # A short tail (streaming daemon) must reach back to the stored last bar; otherwise
+        # the bars in between are unknown and folding the tail in would silently drop them
+        if s.index[0].strftime('%Y-%m-%d') > self.dates[-1]:
+            return False
+        # Span both sides cover; the state has already evicted bars older than the longest window
+        first = max(s.index[0].strftime('%Y-%m-%d'), self.dates[0])
+        last = date.fromisoformat(self.dates[-1])
+        cutoff = max((last - timedelta(days=REVISION_DAYS)).isoformat(), first)
+        i0 = bisect_left(self.dates, cutoff)
+        j0 = int(s.index.searchsorted(cutoff))
+        # The settled part of the state must hold exactly the series' bars of the same span
+        settled_state = i0 - bisect_left(self.dates, first)
+        settled_series = j0 - int(s.index.searchsorted(first))
+        if settled_state != settled_series or (j0 and i0 and (
+                self.dates[i0 - 1] != s.index[j0 - 1].strftime('%Y-%m-%d')
+                or self.values[i0 - 1] != float(s.iloc[j0 - 1]))):
+            return False
+        self._drop_tail(i0)
+        tail = s.iloc[j0:]
+        for day, value in zip(_days(tail.index), tail.tolist()):
+            self._append(day, value)
+        return True
+
+    def update(self, series, today=None, persist=True):
+        """
+        Bring the windows up to date with `series` (date-indexed values) and rank its latest bar.
+        Only the bars from REVISION_DAYS before the last known bar are read from `series`.
+        :param persist: write the state back to disk (long-lived callers may checkpoint less often via save()).
+        :return: (latest value, {window: percentile or None when the bar is older than the window})
+        """
+        s = _normalize(series)
+        if s.empty:
+            return None, {}
+        today = today or datetime.now().date()
+
+        try:
+            incremental = (self._loaded or self._load()) and self._sync(s)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Rebuilding percentile state {self.path}: {e}")
+            incremental = False
+        if incremental:
+            self._evict(today)
+            self.mode = "incremental"
+        else:
+            self._rebuild(s, today)
+            self.mode = "rebuild"
+        self._loaded = True
+
+        if persist:
+            self.save()
+
+        latest = self.values[-1] if self.values else float(s.iloc[-1])
+        result = {}
+        for w in self.windows:
+            in_window = self.starts[w] < len(self.values)
+            result[w] = average_rank_pct(self.sorted[w], latest) if in_window else None
+        return latest, result
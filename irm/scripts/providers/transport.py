@@ -0,0 +1,216 @@
+"""
+Shared transport for upstream provider calls.
+
+Every network call made by a provider goes through `get_transport(name).call(...)`:
+- token-bucket rate limit per provider (shared by all threads in the process),
+- jittered exponential retry for transient failures,
+- a circuit breaker that fails fast once a provider keeps failing, then lets a single
+  caller probe again after a cool-down (everyone else keeps failing fast meanwhile),
+- latency / retry / throttle counters, logged at the end of a prefetch.
+"""
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# rate: sustained requests/second, burst: bucket size
+TRANSPORT_POLICIES = {
+    "yfinance":     {"rate": 2.0, "burst": 4},
+    "fred":         {"rate": 2.0, "burst": 4},   # FRED allows 120 requests/minute per key
+    "akshare_fund": {"rate": 1.0, "burst": 2},
+    "akshare_bond": {"rate": 0.5, "burst": 1},
+    "replay":       {"rate": 1000.0, "burst": 1000},   # local fixtures (IRM_REPLAY_THROTTLE=1 emulates the source's limits)
+}
+DEFAULT_POLICY = {"rate": 1.0, "burst": 2}
+
+MAX_RETRIES = int(os.getenv("IRM_TRANSPORT_RETRIES", "3"))
+BACKOFF_BASE = 1.0       # seconds
+BACKOFF_MAX = 30.0
+BREAKER_THRESHOLD = 5    # consecutive failed calls before opening
+BREAKER_COOLDOWN = 120.0 # seconds before a half-open probe
+
+THROTTLE_MARKERS = ("429", "too many requests", "rate limit", "ratelimit")
+# Errors that a retry cannot fix (bad symbol, bad key); they do not count against the breaker
+PERMANENT_MARKERS = ("no results", "not found", "invalid", "api key", "api_key")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without touching the network while a provider's breaker is open."""
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available; return the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                delay = (1.0 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probe = None       # (started, thread id) of the in-flight half-open probe
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        """Closed: every caller. Half-open: one probe at a time; the others fail fast until it reports."""
+        with self._lock:
+            state = self.state
+            if state != "half-open":
+                return state == "closed"
+            now = time.monotonic()
+            # A probe that never reported back (interrupted caller) expires after another cool-down
+            if self.probe is not None and now - self.probe[0] < self.cooldown:
+                return False
+            self.probe = (now, threading.get_ident())
+            return True
+
+    def release(self):
+        """End this thread's probe without a verdict (the call failed for a reason retries cannot fix)."""
+        with self._lock:
+            if self.probe is not None and self.probe[1] == threading.get_ident():
+                self.probe = None
+
+    def record(self, ok):
+        with self._lock:
+            self.probe = None
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                # A failed half-open probe re-opens for another cool-down
+                if self.failures >= self.threshold or self.opened_at is not None:
+                    self.opened_at = time.monotonic()
+
+
+class ProviderTransport:
+    def __init__(self, name, rate, burst, retries=MAX_RETRIES):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker()
+        self.retries = retries
+        self._lock = threading.Lock()
+        self.metrics = {"requests": 0, "failures": 0, "retries": 0, "throttled": 0,
+                        "short_circuited": 0, "rate_wait": 0.0, "latencies": deque(maxlen=2048)}
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.metrics[key] += value
+
+    @staticmethod
+    def is_throttle(exc):
+        msg = str(exc).lower()
+        return any(marker in msg for marker in THROTTLE_MARKERS)
+
+    @staticmethod
+    def is_permanent(exc):
+        msg = str(exc).lower()
+        return any(marker in msg for marker in PERMANENT_MARKERS)
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) under the provider's rate limit, retry policy and breaker."""
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count("short_circuited")
+                raise CircuitOpenError(f"{self.name} circuit open after repeated failures; skipping call")
+
+            self._count("rate_wait", self.bucket.acquire())
+            t0 = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._count("requests")
+                self._count("failures")
+                throttled = self.is_throttle(e)
+                if throttled:
+                    self._count("throttled")
+                elif self.is_permanent(e):
+                    self.breaker.release()
+                    raise
+                self.breaker.record(False)
+                if attempt >= self.retries:
+                    raise
+                # Full jitter; throttling backs off one step further
+                delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt + (1 if throttled else 0))))
+                logger.warning(f"[transport] {self.name} attempt {attempt + 1} failed "
+                               f"({'throttled' if throttled else str(e).splitlines()[0][:80]}); retrying in {delay:.1f}s")
+                self._count("retries")
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            with self._lock:
+                self.metrics["requests"] += 1
+                self.metrics["latencies"].append(time.perf_counter() - t0)
+            self.breaker.record(True)
+            return result
+
+    def snapshot(self):
+        with self._lock:
+            m = dict(self.metrics)
+            lat = sorted(m.pop("latencies"))
+        m["state"] = self.breaker.state
+        m["latency_p50"] = lat[len(lat) // 2] if lat else None
+        m["latency_p95"] = lat[min(len(lat) - 1, int(len(lat) * 0.95))] if lat else None
+        return m
+
+
+_transports = {}
+_registry_lock = threading.Lock()
+
+
+def get_transport(name):
+    """Process-wide transport for a provider (created on first use)."""
+    with _registry_lock:
+        if name not in _transports:
+            policy = TRANSPORT_POLICIES.get(name, DEFAULT_POLICY)
+            _transports[name] = ProviderTransport(name, policy["rate"], policy["burst"])
+        return _transports[name]
+
+
+def transport_metrics():
+    with _registry_lock:
+        items = list(_transports.items())
+    return {name: t.snapshot() for name, t in items}
+
+
+def log_transport_metrics():
+    for name, m in sorted(transport_metrics().items()):
+        if not m["requests"] and not m["short_circuited"]:
+            continue
+        p50 = f"{m['latency_p50']:.2f}s" if m['latency_p50'] is not None else "-"
+        p95 = f"{m['latency_p95']:.2f}s" if m['latency_p95'] is not None else "-"
+        logger.info(f"[transport] {name}: {m['requests']} req, p50 {p50}, p95 {p95}, "
+                    f"{m['retries']} retries, {m['throttled']} throttled, {m['failures']} failed, "
+                    f"{m['short_circuited']} short-circuited, rate wait {m['rate_wait']:.1f}s, breaker {m['state']}")
@@ -1,45 +1,48 @@
-import os
 import json
+import argparse
 import logging
-import redis
-from urllib.parse import urlparse
-from falkordb import FalkorDB
-from openbb import obb
+import sys
+from pathlib import Path
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.common.db import get_falkordb, redis_address, TimedGraph
+from scripts.providers.fundamentals import FundamentalsSnapshot
+from scripts.providers.graph_writes import unwind_write, split_changed
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class EPSGrowthUpdater:
-    def __init__(self, graph_name="Graph-001"):
+    def __init__(self, graph_name="Graph-001", db=None):
         self.graph_name = graph_name
         
-        redis_url = os.getenv("REDIS_URL", "redis://redis:6379")
-        parsed = urlparse(redis_url)
-        host = parsed.hostname or "localhost"
-        port = parsed.port or 6379
+        host, port = redis_address()
         
         try:
-            # Initialize FalkorDB connection
-            self.db = FalkorDB(host=host, port=port)
-            self.graph = self.db.select_graph(graph_name)
+            # Shared pool unless the caller (refresh) hands over its own FalkorDB
+            self.db = db or get_falkordb()
+            self.graph = TimedGraph(self.db.select_graph(graph_name))
             logger.info(f"Connected to FalkorDB at {host}:{port}")
         except Exception as e:
             logger.error(f"Initialization Failed: {e}")
             self.graph = None
 
-    def query_falkor(self, cypher):
+    def query_falkor(self, cypher, params=None):
         if not self.graph:
             return None
         try:
-            return self.graph.query(cypher)
+            return self.graph.query(cypher, params)
         except Exception as e:
             logger.error(f"Cypher Query Error: {e}")
             return None
 
     def get_earnings_hubs(self):
         """Retrieve all Earnings Hub nodes with their bands"""
-        cypher = "MATCH (h:Hub:Earnings) RETURN h.target, id(h), h.name, h.eps_min, h.eps_max"
+        cypher = "MATCH (h:Hub:Earnings) RETURN h.target, id(h), h.name, h.eps_min, h.eps_max, h.percentile, h.value"
         result = self.query_falkor(cypher)
         hubs = []
         if not result or not result.result_set:
@@ -51,28 +54,26 @@ class EPSGrowthUpdater:
                 "node_id": row[1],
                 "name": row[2],
                 "eps_min": row[3],
-                "eps_max": row[4]
+                "eps_max": row[4],
+                "stored": {"percentile": row[5], "value": row[6]}
             })
         return hubs
 
-    def calculate_eps_percentile(self, ticker, val_min=None, val_max=None):
-        """Fetch forward growth and map to 0.0 - 1.0 based on Graph bands"""
+    def calculate_eps_percentile(self, ticker, val_min=None, val_max=None, metrics=None):
+        """Map forward growth (from the daily fundamentals snapshot) to 0.0 - 1.0 based on Graph bands"""
         try:
-            logger.info(f"Fetching fundamental metrics for {ticker}...")
-            # Fetch metrics via OpenBB (yfinance provider)
-            data = obb.equity.fundamental.metrics(ticker, provider="yfinance")
-            df = data.to_dataframe()
-            
-            if df.empty:
+            if metrics is None:
+                metrics = FundamentalsSnapshot().get([ticker])[0].get(ticker)
+            if not metrics:
                 logger.warning(f"No metrics data returned for {ticker}")
                 return None, None
             
             # Use 'earnings_growth' as the primary forward-looking indicator
-            if 'earnings_growth' not in df.columns:
+            if metrics.get('earnings_growth') is None:
                 logger.warning(f"earnings_growth column not found for {ticker}")
                 return None, None
                 
-            current_growth = float(df['earnings_growth'].iloc[0])
+            current_growth = float(metrics['earnings_growth'])
             logger.info(f"Target {ticker} Analyst Forward Earnings Growth: {current_growth:.2%}")
             
             # Use provided bands or defaults
@@ -96,7 +97,8 @@ class EPSGrowthUpdater:
             logger.error(f"Failed to calculate EPS percentile for {ticker}: {e}")
             return None, None
 
-    def run(self):
+    def run(self, snapshot=None):
+        """:param snapshot: {ticker: metrics} already loaded by the caller (e.g. `irm refresh`)."""
         if not self.graph:
             logger.error("Clients not initialized properly. Aborting.")
             return
@@ -104,20 +106,39 @@ class EPSGrowthUpdater:
         hubs = self.get_earnings_hubs()
         logger.info(f"Found {len(hubs)} Earnings Hubs to update.")
 
+        # Daily fundamentals snapshot, shared with the PE updater (missing tickers fetched concurrently)
+        if snapshot is None:
+            snapshot, _ = FundamentalsSnapshot().get([hub['target'] for hub in hubs])
+
+        rows = []
         for hub in hubs:
             target = hub['target']
-            node_id = hub['node_id']
-            eps_min = hub['eps_min']
-            eps_max = hub['eps_max']
-            
-            percentile, current_growth = self.calculate_eps_percentile(target, eps_min, eps_max)
-            
+            percentile, current_growth = self.calculate_eps_percentile(
+                target, hub['eps_min'], hub['eps_max'], metrics=snapshot.get(target, {})
+            )
             if percentile is not None:
-                # Update the hub node in FalkorDB
-                cypher = f"MATCH (h:Hub) WHERE id(h) = {node_id} SET h.percentile = {percentile:.4f}, h.value = {current_growth:.4f}"
-                self.query_falkor(cypher)
-                logger.info(f"Successfully updated {target} EPS Percentile: {percentile:.4f} (Growth: {current_growth:.4f})")
+                rows.append({"id": hub['node_id'], "percentile": round(percentile, 4), "value": round(current_growth, 4)})
+                logger.info(f"Computed {target} EPS Percentile: {percentile:.4f} (Growth: {current_growth:.4f})")
+
+        # Only hubs whose percentile/value moved beyond IRM_CHANGE_EPSILON are written
+        rows, unchanged = split_changed(rows, {hub['node_id']: hub['stored'] for hub in hubs},
+                                        ["percentile", "value"], key="id")
+        logger.info(f"Earnings Hubs: {len(rows)} changed, {len(unchanged)} unchanged.")
+
+        # Update all hub nodes in FalkorDB with chunked UNWINDs (per-hub result via RETURN)
+        if rows:
+            result = unwind_write(
+                self.graph, "MATCH (h:Hub:Earnings) WHERE id(h) = row.id "
+                            "SET h.percentile = row.percentile, h.value = row.value", rows, key="id"
+            )
+            result.log("Earnings Hub write")
+            logger.info(f"Successfully updated {len(result.written)}/{len(hubs)} Earnings Hub(s).")
 
 if __name__ == "__main__":
+    argparse.ArgumentParser(description="Refresh Hub EPS growth from the fundamentals snapshot").parse_args()
+
+    from scripts.providers.job_lock import run_exclusive, BUSY
+
     updater = EPSGrowthUpdater()
-    updater.run()
+    status = run_exclusive("update-earnings", updater.run, resources=["earnings"])
+    sys.exit(1 if status == BUSY else 0)
@@ -1,45 +1,49 @@
-import os
 import json
+import argparse
 import logging
-import redis
-from urllib.parse import urlparse
-from falkordb import FalkorDB
-from openbb import obb
+import sys
+from pathlib import Path
+# Ensure /app is in sys.path so 'scripts' package can be found
+app_root = str(Path(__file__).resolve().parent.parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.common.db import get_falkordb, redis_address, TimedGraph
+from scripts.providers.fundamentals import FundamentalsSnapshot
+from scripts.providers.graph_writes import unwind_write, split_changed
 
 # 初始化日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class PEPercentileUpdater:
-    def __init__(self, graph_name="Graph-001"):
+    def __init__(self, graph_name="Graph-001", db=None):
         self.graph_name = graph_name
         
-        redis_url = os.getenv("REDIS_URL", "redis://127.0.0.1:6379")
-        parsed = urlparse(redis_url)
-        host = parsed.hostname or "127.0.0.1"
-        port = parsed.port or 6379
+        host, port = redis_address()
         
         try:
-            # 初始化数据库连接
-            self.db = FalkorDB(host=host, port=port)
-            self.graph = self.db.select_graph(graph_name)
+            # Shared pool unless the caller (refresh) hands over its own FalkorDB
+            self.db = db or get_falkordb()
+            self.graph = TimedGraph(self.db.select_graph(graph_name))
             logger.info(f"Connected to FalkorDB at {host}:{port}")
         except Exception as e:
             logger.error(f"Initialization Failed: {e}")
             self.graph = None
 
-    def query_falkor(self, cypher):
+    def query_falkor(self, cypher, params=None):
         if not self.graph:
             return None
         try:
-            return self.graph.query(cypher)
+            return self.graph.query(cypher, params)
         except Exception as e:
             logger.error(f"Cypher Query Error: {e}")
             return None
 
     def get_valuation_hubs(self):
         """获取所有 PE 枢纽节点及其自有的经验区间和 ERP 状态"""
-        cypher = "MATCH (h:Hub:Valuation) RETURN h.target, id(h), h.name, h.pe_min, h.pe_max, h.erp_percentile"
+        cypher = ("MATCH (h:Hub:Valuation) RETURN h.target, id(h), h.name, h.pe_min, h.pe_max, h.erp_percentile, "
+                  "h.pe_percentile, h.percentile, h.value")
         result = self.query_falkor(cypher)
         hubs = []
         if not result or not result.result_set:
@@ -52,29 +56,29 @@ class PEPercentileUpdater:
                 "name": row[2],
                 "pe_min": row[3],
                 "pe_max": row[4],
-                "erp_percentile": row[5]
+                "erp_percentile": row[5],
+                "stored": {"pe_percentile": row[6], "percentile": row[7], "value": row[8]}
             })
         return hubs
 
-    def calculate_pe_percentile(self, ticker, val_min=None, val_max=None):
-        """拉取实时 PE 并利用节点自带的估值带计算百分位"""
+    def calculate_pe_percentile(self, ticker, val_min=None, val_max=None, metrics=None):
+        """读取当日基本面快照中的 PE 并利用节点自带的估值带计算百分位"""
         try:
-            logger.info(f"Fetching fundamental metrics for {ticker} via yfinance...")
-            # 获取最新基本面指标
-            fund_data = obb.equity.fundamental.metrics(ticker, provider="yfinance")
-            df_metrics = fund_data.to_dataframe()
-            
-            if df_metrics.empty:
+            # 获取最新基本面指标 (当日快照，缺失时才拉取)
+            if metrics is None:
+                metrics = FundamentalsSnapshot().get([ticker])[0].get(ticker)
+            if not metrics:
                 logger.warning(f"No metrics data returned for {ticker}")
                 return None, None
             
-            # yfinance 的 metrics 返回通常包含 pe_ratio 列
-            pe_col = [c for c in df_metrics.columns if 'pe' in c.lower() and 'ratio' in c.lower()]
-            if not pe_col:
-                logger.warning(f"PE ratio column not found for {ticker}")
+            # yfinance 的 metrics 返回通常包含 pe_ratio 列；只认该列 (不可回落到 peg_ratio 等)
+            pe_value = next((metrics[c] for c in metrics if c.lower() == 'pe_ratio'), None)
+            if pe_value is None:
+                # 亏损公司 PE 为空: 跳过该 Hub，保留图中原值
+                logger.warning(f"PE ratio missing for {ticker}, skipping")
                 return None, None
-                
-            current_pe = float(df_metrics[pe_col[0]].iloc[-1])
+
+            current_pe = float(pe_value)
             logger.info(f"Target {ticker} Current P/E: {current_pe:.2f}")
             
             # 优先使用传入的 Bands，如果没有则使用硬编码默认值
@@ -98,22 +102,27 @@ class PEPercentileUpdater:
             logger.error(f"Failed to calculate percentile for {ticker}: {e}")
             return None, None
 
-    def run(self):
+    def run(self, snapshot=None):
+        """:param snapshot: 调用方已加载的 {ticker: metrics} (如 `irm refresh`)，为空时读取当日快照"""
         if not self.graph:
             return
 
         hubs = self.get_valuation_hubs()
         logger.info(f"Found {len(hubs)} Valuation Hubs to update.")
 
+        # 当日基本面快照 (与 EPS 更新任务共享，并发拉取缺失的 ticker)
+        if snapshot is None:
+            snapshot, _ = FundamentalsSnapshot().get([hub['target'] for hub in hubs])
+
+        rows = []
         for hub in hubs:
             target = hub['target']
-            node_id = hub['node_id']
-            pe_min = hub['pe_min']
-            pe_max = hub['pe_max']
             erp_pct = hub['erp_percentile']
             
             # 1. 计算原始 PE 分位
-            pe_percentile, current_pe = self.calculate_pe_percentile(target, pe_min, pe_max)
+            pe_percentile, current_pe = self.calculate_pe_percentile(
+                target, hub['pe_min'], hub['pe_max'], metrics=snapshot.get(target, {})
+            )
             
             if pe_percentile is not None:
                 # 2. 引入复合逻辑: percentile = max(pe_percentile, 1.0 - erp_percentile)
@@ -121,16 +130,34 @@ class PEPercentileUpdater:
                 erp_pressure = (1.0 - float(erp_pct)) if erp_pct is not None else 0.0
                 composite_percentile = max(pe_percentile, erp_pressure)
                 
-                # 3. 更新节点
-                cypher = (
-                    f"MATCH (h:Hub) WHERE id(h) = {node_id} "
-                    f"SET h.pe_percentile = {pe_percentile:.4f}, "
-                    f"    h.percentile = {composite_percentile:.4f}, "
-                    f"    h.value = {current_pe:.2f}"
-                )
-                self.query_falkor(cypher)
-                logger.info(f"Updated {target}: PE_Pct={pe_percentile:.4f}, ERP_Pressure={erp_pressure:.4f}, Value={current_pe:.2f} -> Final_Pct={composite_percentile:.4f}")
+                rows.append({
+                    "id": hub['node_id'],
+                    "pe_percentile": round(pe_percentile, 4),
+                    "percentile": round(composite_percentile, 4),
+                    "value": round(current_pe, 2)
+                })
+                logger.info(f"Computed {target}: PE_Pct={pe_percentile:.4f}, ERP_Pressure={erp_pressure:.4f}, Value={current_pe:.2f} -> Final_Pct={composite_percentile:.4f}")
+
+        # 3. 仅写回变化超过 IRM_CHANGE_EPSILON 的 Hub
+        rows, unchanged = split_changed(rows, {hub['node_id']: hub['stored'] for hub in hubs},
+                                        ["pe_percentile", "percentile", "value"], key="id")
+        logger.info(f"Valuation Hubs: {len(rows)} changed, {len(unchanged)} unchanged.")
+
+        # 4. 分块 UNWIND 批量更新节点 (RETURN 回报每个 Hub 的写入结果)
+        if rows:
+            result = unwind_write(
+                self.graph, "MATCH (h:Hub:Valuation) WHERE id(h) = row.id "
+                            "SET h.pe_percentile = row.pe_percentile, h.percentile = row.percentile, h.value = row.value",
+                rows, key="id"
+            )
+            result.log("Valuation Hub write")
+            logger.info(f"Updated {len(result.written)}/{len(hubs)} Valuation Hub(s).")
 
 if __name__ == "__main__":
+    argparse.ArgumentParser(description="Refresh Hub PE-ratio percentiles from the fundamentals snapshot").parse_args()
+
+    from scripts.providers.job_lock import run_exclusive, BUSY
+
     updater = PEPercentileUpdater()
-    updater.run()
+    status = run_exclusive("update-percentiles", updater.run, resources=["valuation"])
+    sys.exit(1 if status == BUSY else 0)
@@ -2,10 +2,6 @@ import os
 import json
 import logging
 from datetime import datetime, timedelta
-from urllib.parse import urlparse
-from falkordb import FalkorDB
-import pandas as pd
-import redis
 import sys
 from pathlib import Path
 # Ensure /app is in sys.path so 'scripts' package can be found
@@ -13,40 +9,55 @@ app_root = str(Path(__file__).resolve().parent.parent.parent)
 if app_root not in sys.path:
     sys.path.append(app_root)
 
+from scripts.common.db import get_falkordb, get_redis, redis_address, TimedGraph
 from scripts.analyzer.update_weights import PortfolioWeightUpdater
 from scripts.providers import get_provider
+from scripts.providers.fetcher import FetchRequest, prefetch
+from scripts.providers.asset_events import change_events, publish_asset_changes
+from scripts.providers.graph_writes import unwind_write, split_changed
+from scripts.providers.rolling_percentile import (
+    RollingPercentiles, WINDOWS, PRIMARY_WINDOW, window_property, history_start
+)
+
+# 节点上写回的分位属性: percentile (= 3Y 窗口，tracer 读取) + 每个回看窗口一个 percentile_<window>
+PERCENTILE_FIELDS = ["percentile"] + [window_property(w) for w in WINDOWS]
 
 # 初始化日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class PriceSignalUpdater:
-    def __init__(self, graph_name="Graph-001"):
+    def __init__(self, graph_name="Graph-001", db=None, redis_client=None):
+        """:param db / redis_client: shared connections (e.g. from `irm refresh`); created here when omitted."""
         self.graph_name = graph_name
         
-        redis_url = os.getenv("REDIS_URL", "redis://127.0.0.1:6379")
-        parsed = urlparse(redis_url)
-        host = parsed.hostname or "127.0.0.1"
-        port = parsed.port or 6379
-        
+        host, port = redis_address()
+
         # 获取 FRED API KEY (Moved into FredProvider but kept for legacy log if needed)
         self.fred_api_key = os.getenv("FRED_API_KEY")
         if self.fred_api_key:
             logger.info("FRED_API_KEY detected in environment.")
         
         try:
-            self.db = FalkorDB(host=host, port=port)
-            self.graph = self.db.select_graph(graph_name)
+            self.db = db or get_falkordb()
+            self.graph = TimedGraph(self.db.select_graph(graph_name))
             logger.info(f"Connected to FalkorDB at {host}:{port}")
 
             # 初始化 Redis 用于读取配置
-            self.redis_client = redis.Redis(host=host, port=port, decode_responses=True)
+            self.redis_client = redis_client or get_redis()
             logger.info(f"Connected to Redis for configuration: {host}:{port}")
         except Exception as e:
             logger.error(f"Initialization Failed: {e}")
             self.graph = None
             self.redis_client = None
 
+        # 图中当前存储的 {ticker: {value, percentile, percentile_<window>...}}，用于跳过未变化的写入
+        self.node_state = {}
+        # 最近一次计算的多窗口分位 {ticker: {window: percentile}}
+        self.window_percentiles = {}
+        # 本次 value 实际变化的资产 (None 表示尚未运行)，为空时无需重算组合权重
+        self.moved_assets = None
+
     def get_price_signal_config(self):
         """从 Redis 获取资产价格源配置"""
         if not self.redis_client:
@@ -72,18 +83,23 @@ class PriceSignalUpdater:
             return None
 
     def get_price_signal_assets(self, tickers):
-        """获取图中的资产节点"""
-        cypher = f"MATCH (a:Asset) WHERE a.ticker IN {json.dumps(tickers)} RETURN a.ticker"
+        """获取图中的资产节点 (同时记录当前存储的 value 与各分位属性)"""
+        props = ", ".join(f"a.{f}" for f in ["value"] + PERCENTILE_FIELDS)
+        cypher = f"MATCH (a:Asset) WHERE a.ticker IN {json.dumps(tickers)} RETURN a.ticker, {props}"
         result = self.query_falkor(cypher)
         assets = []
         if not result or not result.result_set:
             return assets
         for row in result.result_set:
             assets.append(row[0])
+            self.node_state[row[0]] = dict(zip(["value"] + PERCENTILE_FIELDS, row[1:]))
         return assets
 
-    def calculate_price_percentile(self, asset_ticker, config):
-        """计算资产的历史价格分位点及当前值"""
+    def calculate_price_percentile(self, asset_ticker, config, prefetched=None):
+        """
+        计算资产的历史价格分位点及当前值 (prefetched: fetcher.FetchResult，已预取时不再访问网络)。
+        分位由增量滚动窗口引擎给出 (1Y/3Y/10Y 一次完成，结果存于 self.window_percentiles)；返回值为 3Y 分位。
+        """
         asset_config = config.get(asset_ticker)
         if not asset_config:
             logger.warning(f"No config found for {asset_ticker}")
@@ -93,65 +109,142 @@ class PriceSignalUpdater:
         provider = asset_config['provider']
 
         try:
-            # Get provider from registry
-            provider_inst = get_provider(provider)
-            
-            # 拉取历史数据
-            start_date = (datetime.now() - timedelta(days=3*365)).strftime('%Y-%m-%d')
-            df = provider_inst.fetch(symbol, start_date)
-            
-            # 获取数值列名
-            value_col = provider_inst.get_value_column(df)
-            
+            if prefetched is not None:
+                if prefetched.error:
+                    logger.warning(f"Skipping {asset_ticker} ({symbol} via {provider}): {prefetched.error}")
+                    return None, None
+                df, value_col = prefetched.df, prefetched.value_col
+            else:
+                # Get provider from registry
+                provider_inst = get_provider(provider)
+
+                # 拉取历史数据
+                df = provider_inst.fetch(symbol, self.start_date())
+
+                # 获取数值列名
+                value_col = provider_inst.get_value_column(df)
+
             if df.empty or not value_col or value_col not in df.columns:
                 logger.warning(f"No valid data returned for {symbol} ({provider}). Columns: {df.columns.tolist() if not df.empty else 'EMPTY'}")
                 return None, None
             
-            # 计算分位点和当前值
-            current_value = float(df[value_col].iloc[-1])
-            percentile = float(df[value_col].rank(pct=True).iloc[-1])
-            
-            logger.info(f"Asset {asset_ticker} ({symbol} via {provider}) Value: {current_value:.4f}, Percentile: {percentile:.4f}")
+            # 增量更新排序窗口 (只处理新 K 线与可能修订的尾部)，再以二分查找得到各窗口分位
+            engine = RollingPercentiles(provider, symbol)
+            current_value, windows = engine.update(df[value_col])
+            percentile = windows.get(PRIMARY_WINDOW)
+            if current_value is None or percentile is None:
+                logger.warning(f"No bar of {symbol} ({provider}) inside the {PRIMARY_WINDOW} window.")
+                return None, None
+            self.window_percentiles[asset_ticker] = windows
+
+            detail = ", ".join(f"{w}={p:.4f}" for w, p in windows.items() if p is not None)
+            logger.info(f"Asset {asset_ticker} ({symbol} via {provider}) Value: {current_value:.4f}, "
+                        f"Percentile: {percentile:.4f} ({detail}; {engine.mode})")
             return percentile, current_value
         except Exception as e:
             logger.error(f"Failed to calculate percentile for {asset_ticker} via {provider}: {e}")
             return None, None
 
-    def update_node_state(self, ticker, percentile, value):
-        """同步回 FalkorDB (百分位与物理值)"""
-        cypher = f"MATCH (a:Asset {{ticker: '{ticker}'}}) SET a.percentile = {percentile:.4f}, a.value = {value:.4f}"
-        self.query_falkor(cypher)
+    @staticmethod
+    def start_date():
+        # 覆盖最长的回看窗口 (10Y)；增量缓存下只有首次需要回补
+        return history_start()
+
+    def prefetch_series(self, tickers, config):
+        """并发预取所有资产的 10Y 历史 (按 provider 限流)，单个失败不影响其他资产"""
+        start_date = self.start_date()
+        requests = [
+            FetchRequest(t, config[t]['provider'], config[t]['symbol'], start_date)
+            for t in tickers if t in config
+        ]
+        summary = prefetch(requests)
+        summary.log("Price signal prefetch")
+        return summary
+
+    @staticmethod
+    def node_row(ticker, value, windows):
+        """写回行：value 与各分位属性 (4 位小数；窗口内无数据时为 null)"""
+        row = {"ticker": ticker, "value": round(value, 4), "percentile": round(windows[PRIMARY_WINDOW], 4)}
+        for w in WINDOWS:
+            p = windows.get(w)
+            row[window_property(w)] = round(p, 4) if p is not None else None
+        return row
 
-    def run(self):
+    def update_node_states(self, rows):
+        """批量同步回 FalkorDB (百分位与物理值)，rows: node_row() 的结果；返回 WriteResult"""
+        sets = ", ".join(f"a.{f} = row.{f}" for f in ["value"] + PERCENTILE_FIELDS)
+        return unwind_write(self.graph, f"MATCH (a:Asset {{ticker: row.ticker}}) SET {sets}", rows, key="ticker")
+
+    def run(self, config=None, sync_weights=True):
+        """
+        :param config: preloaded `irm:config:sources` mapping (read from Redis when omitted).
+        :param sync_weights: trigger the portfolio weight sync afterwards (`irm refresh` runs it as its own stage).
+        :return: the prefetch FetchSummary, so later stages can reuse the fetched series.
+        """
         if not self.graph:
-            return
+            return None
         
         # 1. 从 Redis 加载配置
-        config = self.get_price_signal_config()
+        config = config if config is not None else self.get_price_signal_config()
         if not config:
             logger.warning("No price signals configured in Redis. Skipping update.")
-            return
+            return None
 
         # 2. 交叉验证图中存在的资产
         tickers = self.get_price_signal_assets(list(config.keys()))
         logger.info(f"Found assets in DB to update: {tickers}")
         
-        # 3. 逐个更新
+        # 3. 并发预取，逐个计算分位点，再批量写回
+        summary = self.prefetch_series(tickers, config)
+        failed = []
+        rows = []
         for ticker in tickers:
-            percentile, value = self.calculate_price_percentile(ticker, config)
+            percentile, value = self.calculate_price_percentile(ticker, config, summary.results.get(ticker))
             if percentile is not None and value is not None:
-                self.update_node_state(ticker, percentile, value)
-                logger.info(f"Successfully updated {ticker} (p={percentile:.4f}, v={value:.4f}) in DB.")
+                rows.append(self.node_row(ticker, value, self.window_percentiles[ticker]))
+            else:
+                failed.append(ticker)
 
-        # 4. Trigger Portfolio weight sync immediately after price update
-        logger.info("Triggering automatic portfolio weight sync...")
-        try:
-            weight_updater = PortfolioWeightUpdater(graph_name=self.graph_name)
-            weight_updater.update_all_portfolios()
-            logger.info("Portfolio weight sync completed successfully.")
-        except Exception as e:
-            logger.error(f"Failed to sync portfolio weights: {e}")
+        # 只写回与图中存储值不同 (超出 IRM_CHANGE_EPSILON) 的资产
+        changed, unchanged = split_changed(rows, self.node_state, ["value"] + PERCENTILE_FIELDS, key="ticker")
+        self.moved_assets = [r["ticker"] for r in split_changed(changed, self.node_state, ["value"], key="ticker")[0]]
+        if changed:
+            written = self.update_node_states(changed)
+            written.log("Price signal write")
+            failed.extend(written.failed)
+            self.moved_assets = [t for t in self.moved_assets if t not in written.failed]
+            # 与流式守护进程相同的变更事件 (irm:stream:asset_changes)
+            publish_asset_changes(self.redis_client, change_events(changed, self.node_state, written.written),
+                                  source="update_price_signals")
+        logger.info(f"Price signals: {len(tickers) - len(failed)}/{len(tickers)} ok "
+                    f"({len(changed)} changed, {len(unchanged)} unchanged, {len(self.moved_assets)} price move(s))"
+                    + (f", failed: {failed}" if failed else "."))
+
+        # 4. Trigger Portfolio weight sync immediately after price update (only when a price moved)
+        if sync_weights and not self.moved_assets:
+            logger.info("No asset value changed; skipping portfolio weight sync.")
+        elif sync_weights:
+            logger.info("Triggering automatic portfolio weight sync...")
+            try:
+                weight_updater = PortfolioWeightUpdater(graph_name=self.graph_name, db=self.db,
+                                                        redis_client=self.redis_client)
+                weight_updater.update_all_portfolios()
+                logger.info("Portfolio weight sync completed successfully.")
+            except Exception as e:
+                logger.error(f"Failed to sync portfolio weights: {e}")
+        return summary
 
 if __name__ == "__main__":
+    import argparse
+    from scripts.providers.job_lock import run_exclusive, BUSY
+
+    parser = argparse.ArgumentParser(description="IRM price signal updater")
+    parser.add_argument("--coalesce", action="store_true",
+                        help="If the job is already running, request one more run from it instead of skipping")
+    args = parser.parse_args()
+
     updater = PriceSignalUpdater()
-    updater.run()
+    # Writes Asset prices and triggers the weight sync: same resources as the refresh stages
+    status = run_exclusive("update-price-signals", updater.run, resources=["prices", "weights"],
+                           coalesce=args.coalesce, redis_client=updater.redis_client)
+    sys.exit(1 if status == BUSY else 0)
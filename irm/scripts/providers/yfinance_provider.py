@@ -1,12 +1,16 @@
+import logging
 import pandas as pd
 from .base import BaseProvider
+from .transport import get_transport
+
+logger = logging.getLogger(__name__)
 
 class YFinanceProvider(BaseProvider):
     def fetch(self, symbol: str, start_date: str) -> pd.DataFrame:
         """Fetch historical data from yfinance via OpenBB."""
         from openbb import obb
         try:
-            res = obb.equity.price.historical(symbol=symbol, provider='yfinance', start_date=start_date)
+            res = get_transport('yfinance').call(obb.equity.price.historical, symbol=symbol, provider='yfinance', start_date=start_date)
             return res.to_dataframe()
         except Exception as e:
             raise RuntimeError(f"Failed to fetch data from yfinance for symbol {symbol}: {e}")
@@ -14,3 +18,26 @@ class YFinanceProvider(BaseProvider):
     def get_value_column(self, df: pd.DataFrame) -> str:
         """yfinance (OpenBB) typically returns 'close' for historical prices."""
         return 'close'
+
+    def fetch_many(self, symbols, start_date: str) -> pd.DataFrame:
+        """One multi-ticker download; falls back to per-symbol fetches if the batch call fails."""
+        symbols = list(dict.fromkeys(symbols))
+        if len(symbols) < 2:
+            return super().fetch_many(symbols, start_date)
+
+        from openbb import obb
+        try:
+            res = get_transport('yfinance').call(obb.equity.price.historical, symbol=",".join(symbols),
+                                                 provider='yfinance', start_date=start_date)
+            df = res.to_dataframe()
+        except Exception as e:
+            logger.warning(f"yfinance batch download failed ({e}); fetching {len(symbols)} symbols one by one.")
+            return super().fetch_many(symbols, start_date)
+
+        if 'symbol' not in df.columns:
+            # A single symbol survived the batch: OpenBB drops the symbol column
+            return super().fetch_many(symbols, start_date)
+
+        df = df.reset_index()
+        wide = df.pivot_table(index='date', columns='symbol', values='close', aggfunc='last')
+        return self.align({s: self.to_series(wide, s) if s in wide.columns else None for s in symbols})
@@ -0,0 +1,91 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+# Ensure the irm root is in sys.path so 'scripts' package can be found (as /app in the container)
+app_root = str(Path(__file__).resolve().parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from scripts.providers.beta_state import EdgeBetaState, HISTORY_DAYS
+from scripts.providers.edge_regression import ols_from_moments, pairwise_ols
+from scripts.providers.returns import to_returns
+
+EDGES = [("SPY", "DRIVES", "QQQ"), ("US10Y", "PRICES", "SPY")]
+METRICS = {"SPY": "equity", "QQQ": "equity", "US10Y": "rate"}
+
+
+@pytest.fixture
+def daily():
+    """Correlated synthetic daily levels over ~5 years of business days."""
+    rng = np.random.default_rng(7)
+    index = pd.bdate_range("2020-01-01", "2025-06-30")
+    rates = 4 + np.cumsum(rng.normal(0, 0.03, len(index)))
+    spy_r = rng.normal(0.0004, 0.01, len(index)) - 0.02 * np.diff(rates, prepend=rates[0])
+    qqq_r = 1.3 * spy_r + rng.normal(0, 0.006, len(index))
+    return pd.DataFrame({"SPY": 100 * np.exp(np.cumsum(spy_r)), "QQQ": 100 * np.exp(np.cumsum(qqq_r)),
+                         "US10Y": rates}, index=index)
+
+
+def panel_as_of(daily, day):
+    """Weekly return panel as calc_betas builds it on `day` (fetch from HISTORY_DAYS back)."""
+    day = pd.Timestamp(day)
+    window = daily[(daily.index >= day - pd.Timedelta(days=HISTORY_DAYS)) & (daily.index <= day)]
+    return pd.concat({t: to_returns(window[t], METRICS[t], freq="W") for t in window}, axis=1).sort_index()
+
+
+def linregress_in_window(panel, window_start):
+    rows = panel[panel.index.values > window_start]
+    return [stats.linregress(rows[s].to_numpy(), rows[t].to_numpy()).slope for s, _, t in EDGES]
+
+
+def test_consecutive_weekly_runs_are_incremental(daily):
+    state = EdgeBetaState(fakeredis.FakeRedis(decode_responses=True))
+    _, _, first = state.update(panel_as_of(daily, "2025-05-02"), EDGES)
+    assert first["mode"] == "full"
+
+    modes = []
+    for day in ("2025-05-09", "2025-05-16", "2025-05-19", "2025-05-23"):
+        _, _, info = state.update(panel_as_of(daily, day), EDGES)
+        modes.append(info["mode"])
+    assert modes == ["incremental"] * 4
+
+
+def test_full_and_incremental_slopes_match_linregress(daily):
+    state = EdgeBetaState(fakeredis.FakeRedis(decode_responses=True))
+    panel = panel_as_of(daily, "2025-05-02")
+    _, _, info = state.update(panel, EDGES)
+    col = {t: j for j, t in enumerate(panel.columns)}
+    rows = panel.index.values > info["window_start"]
+    full = pairwise_ols(panel.to_numpy(dtype=float)[rows], [col[e[0]] for e in EDGES],
+                        [col[e[2]] for e in EDGES], min_obs=50)
+    np.testing.assert_allclose(full["slope"], linregress_in_window(panel, info["window_start"]), rtol=1e-9)
+
+    for day in ("2025-05-09", "2025-05-16", "2025-06-06"):
+        panel = panel_as_of(daily, day)
+        rolling, _, info = state.update(panel, EDGES)
+        assert info["mode"] == "incremental"
+        fit = ols_from_moments(rolling, min_obs=50)
+        np.testing.assert_allclose(fit["slope"], linregress_in_window(panel, info["window_start"]), rtol=1e-8)
+
+
+def test_edge_skipped_by_a_run_is_rebuilt_when_it_returns(daily):
+    state = EdgeBetaState(fakeredis.FakeRedis(decode_responses=True))
+    state.update(panel_as_of(daily, "2025-05-02"), EDGES)
+    # calc_betas drops edges whose tickers had no data in a run
+    state.update(panel_as_of(daily, "2025-05-09"), EDGES[:1])
+
+    for day in ("2025-05-16", "2025-06-06"):
+        panel = panel_as_of(daily, day)
+        rolling, _, info = state.update(panel, EDGES)
+        assert info["mode"] == "incremental"
+        fit = ols_from_moments(rolling, min_obs=50)
+        np.testing.assert_allclose(fit["slope"], linregress_in_window(panel, info["window_start"]), rtol=1e-8)
+        if day == "2025-05-16":
+            assert info["rebuilt_edges"] == 1
@@ -0,0 +1,34 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Ensure the irm root is in sys.path so 'scripts' package can be found (as /app in the container)
+app_root = str(Path(__file__).resolve().parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from scripts.analyzer.portfolio_history import PortfolioHistoryStore
+
+DAY = 86400
+
+
+def test_append_trims_snapshots_past_retention():
+    store = PortfolioHistoryStore(fakeredis.FakeRedis(decode_responses=True), retention_days=30)
+    now = time.time()
+    for age in (45, 30, 10, 0):
+        store.append("Admin", 1000.0 + age, "USD", {"SPY": 1.0}, ts=now - age * DAY)
+
+    # The 45-day snapshot is gone; the one exactly on the cutoff is kept
+    assert [round((now - r["ts"]) / DAY) for r in store.range("Admin")] == [30, 10, 0]
+
+
+def test_zero_retention_keeps_everything():
+    store = PortfolioHistoryStore(fakeredis.FakeRedis(decode_responses=True), retention_days=0)
+    now = time.time()
+    for age in (3650, 1):
+        store.append("Admin", 1.0, "USD", {}, ts=now - age * DAY)
+    assert store.count("Admin") == 2
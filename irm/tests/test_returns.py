@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Ensure the irm root is in sys.path so 'scripts' package can be found (as /app in the container)
+app_root = str(Path(__file__).resolve().parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from scripts.providers import returns
+from scripts.providers.returns import ReturnPanelCache, load_return_panel
+
+METRICS = {"SPY": "equity", "US10Y": "rate"}
+
+
+@pytest.fixture
+def levels(monkeypatch):
+    index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=30)
+    data = {"SPY": pd.Series(range(100, 130), index=index, dtype=float),
+            "US10Y": pd.Series([4.0 + 0.01 * i for i in range(30)], index=index)}
+    fetched = []
+
+    def fake_fetch(ticker, asset_config, start_date):
+        fetched.append(ticker)
+        s = data[ticker]
+        return s[s.index >= pd.Timestamp(start_date)]
+
+    monkeypatch.setattr(returns, "_fetch_levels", fake_fetch)
+    return data, fetched
+
+
+def test_percent_panel_prices_rate_holdings_in_percent(levels):
+    data, _ = levels
+    cache = ReturnPanelCache(fakeredis.FakeRedis(decode_responses=True), freq="D")
+    panel = load_return_panel(["SPY", "US10Y"], METRICS, {}, cache, percent=True)
+    expected = data["US10Y"].pct_change().dropna() * 100.0
+    pd.testing.assert_series_equal(panel["US10Y"].dropna(), expected, check_names=False, check_freq=False)
+
+
+def test_cached_entry_in_another_unit_is_refetched(levels):
+    data, fetched = levels
+    cache = ReturnPanelCache(fakeredis.FakeRedis(decode_responses=True), freq="D")
+    # Entry written before units were recorded: point changes for the rate ticker
+    cache.put("US10Y", data["US10Y"].diff().dropna(), last_level=float(data["US10Y"].iloc[-1]))
+
+    panel = load_return_panel(["US10Y"], METRICS, {}, cache, percent=True)
+    assert fetched == ["US10Y"]
+    assert panel["US10Y"].abs().max() > 0.2      # percent, not 0.01-point steps
+
+    fetched.clear()
+    load_return_panel(["US10Y"], METRICS, {}, cache, percent=True)
+    assert fetched == []
@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Ensure the irm root is in sys.path so 'scripts' package can be found (as /app in the container)
+app_root = str(Path(__file__).resolve().parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.providers.rolling_percentile import RollingPercentiles
+
+
+def series(start, end, seed=3):
+    index = pd.bdate_range(start, end)
+    return pd.Series(100 + np.random.default_rng(seed).normal(0, 1, len(index)).cumsum(), index=index)
+
+
+def test_short_tail_after_gap_rebuilds(tmp_path):
+    full = series("2022-01-03", "2025-06-30")
+    today = pd.Timestamp("2025-06-30").date()
+    engine = RollingPercentiles("yfinance", "SPY", directory=str(tmp_path))
+    engine.update(full[full.index < "2025-06-01"], today=today, persist=False)
+
+    # Streamed 5-day tail that does not reach back to the stored last bar (2025-05-30)
+    engine.update(full[full.index >= "2025-06-24"], today=today, persist=False)
+    assert engine.mode == "rebuild"
+
+
+def test_overlapping_tail_matches_pandas_rank(tmp_path):
+    full = series("2022-01-03", "2025-06-30")
+    today = pd.Timestamp("2025-06-30").date()
+    engine = RollingPercentiles("yfinance", "SPY", directory=str(tmp_path))
+    engine.update(full[full.index < "2025-06-25"], today=today, persist=False)
+
+    value, windows = engine.update(full[full.index >= "2025-06-20"], today=today, persist=False)
+    assert engine.mode == "incremental"
+    window = full[full.index > pd.Timestamp(today) - pd.Timedelta(days=365)]
+    assert value == full.iloc[-1]
+    assert abs(windows["1y"] - window.rank(pct=True).iloc[-1]) < 1e-12
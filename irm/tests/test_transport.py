@@ -0,0 +1,69 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Ensure the irm root is in sys.path so 'scripts' package can be found (as /app in the container)
+app_root = str(Path(__file__).resolve().parent.parent)
+if app_root not in sys.path:
+    sys.path.append(app_root)
+
+from scripts.providers.transport import CircuitBreaker, CircuitOpenError, ProviderTransport
+
+
+def half_open_breaker(cooldown=60.0):
+    """Breaker that tripped one cool-down ago."""
+    breaker = CircuitBreaker(threshold=1, cooldown=cooldown)
+    breaker.record(False)
+    breaker.opened_at -= cooldown
+    assert breaker.state == "half-open"
+    return breaker
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = half_open_breaker()
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_concurrent_callers_fail_fast_while_the_probe_is_in_flight():
+    transport = ProviderTransport("test", rate=1000, burst=1000, retries=0)
+    transport.breaker = half_open_breaker()
+
+    started, finish = threading.Event(), threading.Event()
+
+    def probe():
+        started.set()
+        finish.wait(5)
+        return "ok"
+
+    results = []
+    prober = threading.Thread(target=lambda: results.append(transport.call(probe)))
+    prober.start()
+    assert started.wait(5)
+
+    with pytest.raises(CircuitOpenError):
+        transport.call(lambda: "should not run")
+
+    finish.set()
+    prober.join(5)
+    assert results == ["ok"]
+    assert transport.breaker.state == "closed"
+    assert transport.call(lambda: "next") == "next"
+
+
+def test_permanent_error_releases_the_probe():
+    transport = ProviderTransport("test", rate=1000, burst=1000, retries=0)
+    transport.breaker = half_open_breaker()
+
+    def missing():
+        raise ValueError("symbol not found")
+
+    with pytest.raises(ValueError):
+        transport.call(missing)
+    assert transport.breaker.allow()